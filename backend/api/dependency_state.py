@@ -0,0 +1,73 @@
+from collections import OrderedDict
+
+from .symbol_index import SymbolIndex
+
+
+class DependencyState:
+    """
+    File and function dependency maps of the repository at one commit, and the
+    symbol index of its functions, kept up to date as files change
+    """
+
+    def __init__(
+        self, file_dependencies=None, function_dependencies=None, symbol_index=None
+    ):
+        self.file_dependencies = file_dependencies or {}
+        self.function_dependencies = function_dependencies or {}
+        if symbol_index is None:
+            symbol_index = SymbolIndex.from_function_dependencies(
+                self.function_dependencies
+            )
+        self.symbol_index = symbol_index
+
+    def copy(self):
+        """Copy the maps; the per-file entries are shared since they are never mutated"""
+        return DependencyState(
+            dict(self.file_dependencies),
+            dict(self.function_dependencies),
+            self.symbol_index.copy(),
+        )
+
+    def set_function_dependencies(self, file_path, function_dependencies):
+        self.function_dependencies[file_path] = function_dependencies
+        self.symbol_index.add_file(file_path, function_dependencies["functions"])
+
+    def remove(self, file_path):
+        """Forget a file, e.g. because it was deleted or is about to be re-extracted"""
+        self.file_dependencies.pop(file_path, None)
+        self.function_dependencies.pop(file_path, None)
+        self.symbol_index.remove_file(file_path)
+
+    def graph_inputs(self):
+        """
+        Return fresh file and function dependency maps for graph building
+        The graph builders fill in `imported_by`, so they get their own copies
+        """
+        file_dependencies = {
+            file_path: {**deps, "imported_by": []}
+            for file_path, deps in self.file_dependencies.items()
+        }
+        return file_dependencies, dict(self.function_dependencies)
+
+
+class DependencyStateCache:
+    """
+    Keeps the dependency state of recently processed commits so a child commit
+    can start from its first parent's state and only re-extract changed files
+    """
+
+    def __init__(self, max_states=32):
+        self.max_states = max(1, max_states)
+        self._states = OrderedDict()
+
+    def get(self, commit_hash):
+        state = self._states.get(commit_hash)
+        if state is not None:
+            self._states.move_to_end(commit_hash)
+        return state
+
+    def put(self, commit_hash, state):
+        self._states[commit_hash] = state
+        self._states.move_to_end(commit_hash)
+        while len(self._states) > self.max_states:
+            self._states.popitem(last=False)
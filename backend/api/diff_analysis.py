@@ -0,0 +1,239 @@
+import re
+
+# Declarations recognized on added and removed lines (the +/- prefix is
+# stripped first). Simple pattern matching for Python functions, classes
+# and imports, one alternative each
+DECLARATION_PATTERN = re.compile(
+    r"\s*(?:def\s+([a-zA-Z0-9_]+)\s*\("
+    r"|class\s+([a-zA-Z0-9_]+)"
+    r"|(?:import|from)\s+([^\s]+))"
+)
+
+# "@@ -<old start>[,<old lines>] +<new start>[,<new lines>] @@ [section heading]"
+HUNK_HEADER_PATTERN = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)")
+
+# Function and class declarations across common languages, used to find the
+# symbol enclosing each changed line (Go receivers and modifiers are skipped)
+SYMBOL_PATTERN = re.compile(
+    r"\s*(?=[acdefimopst])(?:(?:export|default|public|private|protected|static|async|abstract"
+    r"|final|override|pub)\s+)*"
+    r"(def|class|function|func|fn|sub|interface|struct|trait|impl|module)"
+    r"\s*\*?\s+(?:\([^)]*\)\s*)?([A-Za-z_$][\w$]*)"
+)
+# C-like headings such as "static int parse_args(int argc, char **argv)"
+C_FUNCTION_PATTERN = re.compile(r"[\w\s\*&:<>,]*?\b([A-Za-z_]\w*)\s*\(")
+FUNCTION_KEYWORDS = frozenset(("def", "function", "func", "fn", "sub"))
+
+# First characters of lines that can not end the enclosing symbol: blank or
+# indented lines, closing brackets, decorators and comments
+SYMBOL_BODY_PREFIXES = frozenset(("", " ", "\t", "}", ")", "]", "@", "#", "/", "*"))
+
+
+def _symbol_from_match(match):
+    keyword, name = match.groups()
+    return name, "function" if keyword in FUNCTION_KEYWORDS else "class"
+
+
+def parse_symbol(text):
+    """Return (name, kind) of a function or class declaration line, or None"""
+    match = SYMBOL_PATTERN.match(text)
+    return _symbol_from_match(match) if match is not None else None
+
+
+def parse_section_symbol(section):
+    """Return (name, kind) of the symbol named by a hunk header's section heading"""
+    if not section:
+        return None
+    symbol = parse_symbol(section)
+    if symbol is None:
+        match = C_FUNCTION_PATTERN.match(section)
+        if match is not None:
+            symbol = match.group(1), "function"
+    return symbol
+
+
+def _parse_hunk_header(line):
+    """Return the metadata of a hunk header line, or None if it is not one"""
+    match = HUNK_HEADER_PATTERN.match(line)
+    if match is None:
+        return None
+    old_start, old_lines, new_start, new_lines, section = match.groups()
+    return {
+        "old_start": int(old_start),
+        "old_lines": int(old_lines) if old_lines is not None else 1,
+        "new_start": int(new_start),
+        "new_lines": int(new_lines) if new_lines is not None else 1,
+        "section": section.strip(),
+        "symbol": None,
+        "lines_added": 0,
+        "lines_removed": 0,
+    }
+
+
+def analyze_diff_content(diff_text):
+    """
+    Analyzes diff content to extract meaningful change information
+    Every line is classified once: added and removed lines are counted and
+    checked for function, class and import declarations, and hunk headers
+    are recorded with their line ranges and per-hunk counts
+    Changed lines are attributed to their enclosing symbol, starting from the
+    hunk header's section heading and following declarations inside the hunk
+    Returns a structured summary of changes
+    """
+    additions = []
+    deletions = []
+    added_functions = []
+    removed_functions = []
+    added_classes = []
+    removed_classes = []
+    added_imports = []
+    removed_imports = []
+    hunks = []
+    hunk = None
+    symbol = None
+    symbol_changes = {}
+    match_declaration = DECLARATION_PATTERN.match
+    match_symbol = SYMBOL_PATTERN.match
+
+    for line in diff_text.split("\n"):
+        if not line:
+            continue
+        marker = line[0]
+
+        if marker == "+":
+            if line.startswith("+++"):
+                continue  # File header
+            content = line[1:]
+            additions.append(content.strip())
+            change_index = 1
+            if hunk is not None:
+                hunk["lines_added"] += 1
+            functions, classes, imports = (
+                added_functions,
+                added_classes,
+                added_imports,
+            )
+        elif marker == "-":
+            if line.startswith("---"):
+                continue  # File header
+            content = line[1:]
+            deletions.append(content.strip())
+            change_index = 2
+            if hunk is not None:
+                hunk["lines_removed"] += 1
+            functions, classes, imports = (
+                removed_functions,
+                removed_classes,
+                removed_imports,
+            )
+        else:
+            if marker == "@":
+                new_hunk = _parse_hunk_header(line)
+                if new_hunk is not None:
+                    hunk = new_hunk
+                    hunks.append(hunk)
+                    symbol = parse_section_symbol(hunk["section"])
+                    hunk["symbol"] = symbol[0] if symbol else None
+            elif marker == " " and hunk is not None:
+                # Context lines move the enclosing symbol along; a declaration
+                # starts a new symbol and any other top-level statement ends it
+                declared = match_symbol(line, 1)
+                if declared is not None:
+                    symbol = _symbol_from_match(declared)
+                elif line[1:2] not in SYMBOL_BODY_PREFIXES:
+                    symbol = None
+            continue
+
+        if hunk is not None:
+            declared = match_symbol(content)
+            if declared is not None:
+                symbol = _symbol_from_match(declared)
+            elif content[:1] not in SYMBOL_BODY_PREFIXES:
+                symbol = None
+            if symbol is not None:
+                counts = symbol_changes.get(symbol)
+                if counts is None:
+                    counts = symbol_changes[symbol] = [0, 0, 0]
+                counts[change_index] += 1
+
+        declaration = match_declaration(content)
+        if declaration is not None:
+            function_name, class_name, module_name = declaration.groups()
+            if function_name is not None:
+                functions.append(function_name)
+            elif class_name is not None:
+                classes.append(class_name)
+            else:
+                imports.append(module_name)
+
+    # Functions that appear in both added and removed are likely modifications
+    modified_functions = set(added_functions) & set(removed_functions)
+
+    # Functions whose body changed without touching the def line are modified too
+    body_modified_functions = [
+        name
+        for (name, kind) in symbol_changes
+        if kind == "function"
+        and name not in added_functions
+        and name not in removed_functions
+    ]
+
+    # Determine overall change type
+    change_type = "unknown"
+    if additions and not deletions:
+        change_type = "addition"
+    elif deletions and not additions:
+        change_type = "deletion"
+    elif additions and deletions:
+        change_type = "modification"
+
+    return {
+        "lines_added": len(additions),
+        "lines_removed": len(deletions),
+        "additions": additions,
+        "deletions": deletions,
+        "modifications": [],
+        "functions_added": [
+            name
+            for name in dict.fromkeys(added_functions)
+            if name not in modified_functions
+        ],
+        "functions_modified": [
+            name
+            for name in dict.fromkeys(added_functions)
+            if name in modified_functions
+        ]
+        + list(dict.fromkeys(body_modified_functions)),
+        "functions_removed": [
+            name
+            for name in dict.fromkeys(removed_functions)
+            if name not in modified_functions
+        ],
+        "change_type": change_type,
+        # Additional metadata
+        "classes_added": added_classes,
+        "classes_removed": removed_classes,
+        "imports_added": added_imports,
+        "imports_removed": removed_imports,
+        "hunks": hunks,
+        "symbols_changed": [
+            {
+                "symbol": name,
+                "kind": kind,
+                "lines_added": counts[1],
+                "lines_removed": counts[2],
+            }
+            for (name, kind), counts in symbol_changes.items()
+        ],
+    }
+
+
+def analyze_diffs(diff_texts):
+    """Analyze many diffs, e.g. every patch of an ingested commit, in one call"""
+    return [analyze_diff_content(diff_text) for diff_text in diff_texts]
+
+
+def analyze_patches(patches, file_paths):
+    """Return {file path: change summary} for the given files of a patch map"""
+    summaries = analyze_diffs(patches.get(file_path, "") for file_path in file_paths)
+    return dict(zip(file_paths, summaries))
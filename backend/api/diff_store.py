@@ -0,0 +1,95 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+
+import zstandard
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Lines of each side of a patch kept inline in a change summary
+PREVIEW_LINES = 5
+PREVIEW_LINE_LENGTH = 200
+
+
+class DiffStore:
+    """
+    Content-addressed store of zstd-compressed patch bodies
+    Each patch is written once under the SHA-256 of its text, so identical
+    patches (reverts, cherry-picks, re-analysis) share one object on disk
+    """
+
+    def __init__(self, root, level=10):
+        self.root = str(root)
+        self.level = level
+        self._local = threading.local()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _compressor(self):
+        # zstd contexts are not thread-safe, so every thread gets its own
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.compressor, self._local.decompressor
+
+    def _object_path(self, diff_ref):
+        return os.path.join(self.root, diff_ref[:2], f"{diff_ref[2:]}.zst")
+
+    def put(self, patch_text):
+        """Store a patch and return its reference; existing objects are not rewritten"""
+        data = patch_text.encode("utf-8")
+        diff_ref = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(diff_ref)
+        if os.path.exists(object_path):
+            return diff_ref
+
+        compressor, _ = self._compressor()
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+        # Write atomically; concurrent writers of the same patch produce the same bytes
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(object_path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressor.compress(data))
+            os.replace(tmp_path, object_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return diff_ref
+
+    def get(self, diff_ref):
+        """Return the full text of a stored patch, or None if it is unknown"""
+        if not diff_ref or not re.fullmatch(r"[0-9a-f]{64}", diff_ref):
+            return None
+        object_path = self._object_path(diff_ref)
+        if not os.path.exists(object_path):
+            return None
+
+        _, decompressor = self._compressor()
+        with open(object_path, "rb") as f:
+            data = decompressor.decompress(f.read())
+        return data.decode("utf-8")
+
+    def __contains__(self, diff_ref):
+        return os.path.exists(self._object_path(diff_ref))
+
+
+def _preview(lines):
+    return [line[:PREVIEW_LINE_LENGTH] for line in lines if line][:PREVIEW_LINES]
+
+
+def compact_change_summary(summary, patch_text, diff_store):
+    """
+    Move the full added/removed lines of a change summary out to the diff
+    store, keeping a reference to the patch and a short preview of each side
+    """
+    additions = summary.pop("additions", [])
+    deletions = summary.pop("deletions", [])
+    summary["diff_ref"] = diff_store.put(patch_text) if patch_text else None
+    summary["additions_preview"] = _preview(additions)
+    summary["deletions_preview"] = _preview(deletions)
+    return summary
@@ -0,0 +1,35 @@
+import posixpath
+
+
+def directory_tree(file_paths):
+    """
+    Directory -> {"files": [...], "directories": [...]} for every directory
+    containing one of `file_paths`, up to the repository root ""
+    """
+    tree = {"": {"files": [], "directories": []}}
+    for file_path in sorted(file_paths):
+        directory = posixpath.dirname(file_path.replace("\\", "/"))
+        tree.setdefault(directory, {"files": [], "directories": []})
+        tree[directory]["files"].append(file_path)
+        # Register the directory with each ancestor not seen yet
+        while directory:
+            parent = posixpath.dirname(directory)
+            known = parent in tree
+            tree.setdefault(parent, {"files": [], "directories": []})
+            if directory not in tree[parent]["directories"]:
+                tree[parent]["directories"].append(directory)
+            if known:
+                break
+            directory = parent
+    for node in tree.values():
+        node["directories"].sort()
+    return tree
+
+
+def rollup_levels(tree):
+    """Directories grouped by depth, deepest first, so children precede parents"""
+    levels = {}
+    for directory in tree:
+        depth = directory.count("/") + 1 if directory else 0
+        levels.setdefault(depth, []).append(directory)
+    return [sorted(levels[depth]) for depth in sorted(levels, reverse=True)]
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import re
+
+from .js_extractor import extract_js_module
+from .python_extractor import (
+    extract_python_module,
+    file_dependencies as python_file_dependencies,
+    import_file_paths,
+    import_statement,
+    module_files,
+)
+
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx")
+# Extensions with a parser; analyzing anything else is cheap enough to redo
+PARSED_EXTENSIONS = (".py",) + JS_EXTENSIONS
+# Extensions that get symbol counts in the vector store metadata
+CODE_EXTENSIONS = (".py", ".js", ".ts", ".jsx", ".tsx", ".java", ".cpp", ".c")
+
+JS_IMPORT_PATTERNS = [
+    re.compile(
+        r'import\s+(?:{[^}]+}|[^{}\s]+)\s+from\s+[\'"]([^\'"]+)[\'"]', re.MULTILINE
+    ),  # import x from 'y'
+    re.compile(r'import\s+[\'"]([^\'"]+)[\'"]', re.MULTILINE),  # import 'x'
+    re.compile(r'require\([\'"]([^\'"]+)[\'"]\)', re.MULTILINE),  # require('x')
+]
+
+# Simple heuristics for the languages without an extractor (Java, C, C++)
+HEURISTIC_IMPORT_PATTERN = re.compile(
+    r"^\s*(?:import|from|require)\s+.*$", re.MULTILINE
+)
+HEURISTIC_FUNCTION_PATTERN = re.compile(
+    r"^\s*(?:def|function|const\s+\w+\s*=\s*\(.*?\)\s*=>)\s+\w+", re.MULTILINE
+)
+HEURISTIC_CLASS_PATTERN = re.compile(r"^\s*class\s+\w+", re.MULTILINE)
+
+
+def git_blob_sha(data):
+    """The hash git gives `data` as a blob, so working tree files share cache entries"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def _js_module_paths(file_path, module_paths, graph_rules):
+    """
+    Candidate repository paths of imported JS/TS modules
+    The dependency graphs and the summaries have always filtered package
+    imports slightly differently; both rules are kept
+    """
+    paths = []
+    for module_path in module_paths:
+        local = module_path.startswith(("./", "../"))
+        if graph_rules:
+            local = local or not (
+                "/" in module_path and not module_path.startswith("@")
+            )
+        else:
+            local = local or not (module_path.startswith("@") or "/" not in module_path)
+        if not local:
+            continue
+
+        normalized_path = os.path.normpath(
+            os.path.join(os.path.dirname(file_path), module_path)
+        )
+        # Add potential extensions if missing
+        if not os.path.splitext(normalized_path)[1]:
+            paths.extend(normalized_path + ext for ext in JS_EXTENSIONS)
+        else:
+            paths.append(normalized_path)
+    return paths
+
+
+def empty_analysis():
+    """The analysis of a file nothing could be extracted from"""
+    return {
+        "language": None,
+        # Imports as shown to the summarizer, local file paths they may refer
+        # to, and the paths the dependency graph links
+        "imports": [],
+        "file_dependencies": [],
+        "graph_imports": [],
+        "functions": [],
+        "classes": [],
+        "function_calls": {},
+        "called_by": {},
+        # Candidate files of the modules `name.attr()` calls are qualified with
+        "module_files": {},
+        "counts": None,
+    }
+
+
+def analyze_file(file_path, content):
+    """
+    Analyze one version of a file: imports, functions, classes and calls
+    The result is the single source for the dependency graphs, the summary
+    prompts and the vector store metadata, and is plain JSON so it can be cached
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+    analysis = empty_analysis()
+
+    if file_ext == ".py":
+        module = extract_python_module(content)
+        analysis["language"] = "python"
+        for entry in module["imports"]:
+            if entry["level"] or (entry["names"] and "." in entry["module"]):
+                # Could be a local file dependency
+                analysis["file_dependencies"].extend(
+                    import_file_paths(file_path, entry)
+                )
+            else:
+                analysis["imports"].append(import_statement(entry))
+        analysis["graph_imports"] = python_file_dependencies(file_path, module)[
+            "imports"
+        ]
+        analysis["module_files"] = module_files(file_path, module)
+        import_count = len(module["imports"])
+
+    elif file_ext in JS_EXTENSIONS:
+        module = extract_js_module(content)
+        analysis["language"] = "javascript"
+        module_paths = [
+            match.group(1).strip()
+            for pattern in JS_IMPORT_PATTERNS
+            for match in pattern.finditer(content)
+        ]
+        analysis["imports"] = module_paths
+        analysis["file_dependencies"] = _js_module_paths(
+            file_path, module_paths, graph_rules=False
+        )
+        analysis["graph_imports"] = _js_module_paths(
+            file_path, module_paths, graph_rules=True
+        )
+        import_count = len(module_paths)
+
+    if analysis["language"] is not None:
+        for key in ("functions", "classes", "function_calls", "called_by"):
+            analysis[key] = module[key]
+        analysis["counts"] = {
+            "imports": import_count,
+            "functions": len(module["functions"]),
+            "classes": len(module["classes"]),
+        }
+    elif file_ext in CODE_EXTENSIONS:
+        analysis["counts"] = {
+            "imports": len(HEURISTIC_IMPORT_PATTERN.findall(content)),
+            "functions": len(HEURISTIC_FUNCTION_PATTERN.findall(content)),
+            "classes": len(HEURISTIC_CLASS_PATTERN.findall(content)),
+        }
+    return analysis
+
+
+def graph_dependencies(analysis):
+    """The per-file entries of the file and function dependency graphs"""
+    if not analysis:
+        return {}
+    dependencies = {
+        "file_dependencies": {
+            "imports": analysis["graph_imports"],
+            "imported_by": [],
+            "references": [],
+        }
+    }
+    if analysis["language"] is not None:
+        dependencies["function_dependencies"] = {
+            "functions": analysis["functions"],
+            "function_calls": analysis["function_calls"],
+            "called_by": analysis["called_by"],
+            "module_files": analysis["module_files"],
+        }
+    return dependencies
+
+
+def summary_dependencies(analysis):
+    """The dependency listing included in a file's summary prompt"""
+    return {
+        "imports": analysis["imports"],
+        "functions": analysis["functions"],
+        "classes": analysis["classes"],
+        "file_dependencies": analysis["file_dependencies"],
+        "function_calls": analysis["function_calls"],
+    }
+
+
+def vector_metadata(analysis):
+    """Symbol counts stored with a code file's documents in the vector store"""
+    counts = analysis["counts"] if analysis else None
+    if counts is None:
+        return {}
+    return {
+        "imports_count": counts["imports"],
+        "functions_count": counts["functions"],
+        "classes_count": counts["classes"],
+        "contains_imports": counts["imports"] > 0,
+        "contains_functions": counts["functions"] > 0,
+        "contains_classes": counts["classes"] > 0,
+    }
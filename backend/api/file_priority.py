@@ -0,0 +1,85 @@
+import math
+import posixpath
+
+# File names that usually start or configure a program, and READMEs
+ENTRY_POINT_NAMES = {
+    "__main__.py",
+    "main.py",
+    "app.py",
+    "manage.py",
+    "setup.py",
+    "wsgi.py",
+    "asgi.py",
+    "settings.py",
+    "urls.py",
+    "server.js",
+    "server.ts",
+    "package.json",
+    "pyproject.toml",
+    "requirements.txt",
+    "Dockerfile",
+    "docker-compose.yml",
+    "Makefile",
+    "index.html",
+}
+ENTRY_POINT_STEMS = {"index", "main", "app", "App", "README", "readme"}
+
+# Weights of the importance signals; the log scale keeps a single hub file or
+# a churn-heavy config file from dominating the ranking
+IN_DEGREE_WEIGHT = 2.0
+CHURN_WEIGHT = 1.0
+ENTRY_POINT_BONUS = 3.0
+
+
+def is_entry_point(file_path):
+    file_name = posixpath.basename(file_path)
+    stem = file_name.split(".")[0]
+    return file_name in ENTRY_POINT_NAMES or stem in ENTRY_POINT_STEMS
+
+
+def importance_scores(file_dependencies, change_counts=None):
+    """
+    Importance of every file of `file_dependencies` (path -> summary
+    dependencies) from its in-degree in the file dependency graph, its commit
+    churn and whether it looks like an entry point
+    """
+    change_counts = change_counts or {}
+    in_degree = dict.fromkeys(file_dependencies, 0)
+    for file_path, dependencies in file_dependencies.items():
+        # Candidate paths of one import are counted once per importing file
+        for imported in set(dependencies.get("file_dependencies", ())):
+            if imported in in_degree and imported != file_path:
+                in_degree[imported] += 1
+
+    return {
+        file_path: IN_DEGREE_WEIGHT * math.log1p(in_degree[file_path])
+        + CHURN_WEIGHT * math.log1p(change_counts.get(file_path, 0))
+        + (ENTRY_POINT_BONUS if is_entry_point(file_path) else 0.0)
+        for file_path in file_dependencies
+    }
+
+
+class SummaryReadiness:
+    """
+    Tracks when SUMMARY_READY_COVERAGE of a repository's files are summarized.
+    Files summarized from the cache count as covered from the start
+    """
+
+    def __init__(self, total, pending, coverage):
+        self.total = total
+        self.pending = pending
+        self.covered = total - pending
+        self.ready_at = math.ceil(total * coverage)
+        self.reached = False
+
+    def complete(self):
+        """
+        Count one more summarized file; True the one time the coverage is
+        reached while files are still pending, when an early index is worth it
+        """
+        self.covered += 1
+        self.pending -= 1
+        if self.reached or self.covered < self.ready_at:
+            return False
+        self.reached = True
+        return self.pending > 0
@@ -0,0 +1,184 @@
+import logging
+
+from .llm_scheduler import LLMScheduler
+from .summary_prompts import (
+    batch_summary_prompt,
+    chunk_summary_prompt,
+    file_summary_prompt,
+    merge_summary_prompt,
+    parse_batch_summaries,
+    partial_merge_prompt,
+    plan_summary_batches,
+    split_structural_chunks,
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class FileSummarizer:
+    """
+    Summarizes (file_path, file_content, dependencies) entries with prompts of
+    bounded size. Small files share batched prompts, files larger than
+    `chunk_chars` are split on structural boundaries and summarized chunk by
+    chunk before the chunk summaries are merged (map-reduce), and every other
+    file gets its own prompt
+    """
+
+    def __init__(
+        self,
+        llm,
+        scheduler,
+        chunk_chars=100000,
+        batch_tokens=0,
+        batch_file_tokens=0,
+        batch_max_files=1,
+    ):
+        self.llm = llm
+        self.scheduler = scheduler
+        self.chunk_chars = chunk_chars
+        self.batch_tokens = batch_tokens
+        self.batch_file_tokens = batch_file_tokens
+        self.batch_max_files = batch_max_files
+
+    @classmethod
+    def from_config(cls, llm, config, scheduler=None):
+        return cls(
+            llm,
+            scheduler or LLMScheduler.from_config(config),
+            chunk_chars=config.summary_chunk_chars,
+            batch_tokens=config.summary_batch_tokens,
+            batch_file_tokens=config.summary_batch_file_tokens,
+            batch_max_files=config.summary_batch_max_files,
+        )
+
+    def plan(self, files):
+        """Split the entries into batches, single files and files to chunk"""
+        large = [entry for entry in files if len(entry[1]) > self.chunk_chars]
+        batches, singles = plan_summary_batches(
+            [entry for entry in files if len(entry[1]) <= self.chunk_chars],
+            self.batch_tokens,
+            self.batch_file_tokens,
+            self.batch_max_files,
+        )
+        return batches, singles, large
+
+    def summarize(self, files, on_summary):
+        """
+        Summarize every entry, calling `on_summary(file_path, summary, error)`
+        exactly once per file as its summary completes. Batches, single files
+        and chunks are sent first; whatever a reply requires (individual retries
+        of batch misses, merges of chunk summaries) is sent as soon as the
+        replies it depends on are in, ahead of the requests not started yet
+        """
+        self._entries = {entry[0]: entry for entry in files}
+        self._on_summary = on_summary
+        # Chunk summaries of large files, by path, for the current merge level
+        self._parts = {}
+
+        batches, singles, large = self.plan(files)
+        jobs = [
+            (("batch", tuple(entry[0] for entry in batch)), batch_summary_prompt(batch))
+            for batch in batches
+        ]
+        jobs.extend(
+            (("file", entry[0]), file_summary_prompt(*entry)) for entry in singles
+        )
+        for file_path, file_content, _ in large:
+            chunks = split_structural_chunks(file_content, self.chunk_chars)
+            logger.info(f"Summarizing {file_path} in {len(chunks)} chunks")
+            self._parts[file_path] = [None] * len(chunks)
+            jobs.extend(
+                (
+                    ("part", file_path, 0, index),
+                    chunk_summary_prompt(file_path, chunks, index),
+                )
+                for index in range(len(chunks))
+            )
+
+        # Requests start in the order of the files they cover, so callers can
+        # pass files most important first
+        rank = {entry[0]: index for index, entry in enumerate(files)}
+        jobs.sort(
+            key=lambda job: min(rank[file_path] for file_path in _job_paths(job[0]))
+        )
+
+        self.scheduler.run(self.llm, jobs, self._handle)
+
+    def _handle(self, key, reply, error):
+        """Process one reply and return the follow-up jobs it requires"""
+        kind = key[0]
+        if kind in ("file", "merge"):
+            self._on_summary(key[1], reply, error)
+            return []
+
+        if kind == "batch":
+            file_paths = key[1]
+            parsed = parse_batch_summaries(reply, file_paths) if error is None else {}
+            for file_path in parsed:
+                self._on_summary(file_path, parsed[file_path], None)
+            missing = [file_path for file_path in file_paths if file_path not in parsed]
+            if missing:
+                logger.warning(
+                    f"Batch reply covered {len(parsed)} of {len(file_paths)} files, "
+                    "summarizing the rest individually"
+                )
+            return [
+                (("file", file_path), file_summary_prompt(*self._entries[file_path]))
+                for file_path in missing
+            ]
+
+        # A chunk summary, or a merge of several of them
+        _, file_path, level, index = key
+        parts = self._parts.get(file_path)
+        if parts is None:
+            # The file already failed
+            return []
+        if error is not None:
+            del self._parts[file_path]
+            self._on_summary(file_path, None, error)
+            return []
+        parts[index] = reply
+        if any(part is None for part in parts):
+            return []
+        return self._merge_jobs(file_path, level, parts)
+
+    def _merge_jobs(self, file_path, level, parts):
+        """
+        The final merge of a large file's part summaries, or, while they do not
+        fit one prompt, merges of groups of consecutive parts
+        """
+        # Truncating keeps at least two parts per group, so every level shrinks
+        limit = self.chunk_chars // 2
+        parts = [part if len(part) <= limit else part[:limit] for part in parts]
+        if sum(len(part) for part in parts) <= self.chunk_chars:
+            del self._parts[file_path]
+            dependencies = self._entries[file_path][2]
+            return [
+                (
+                    ("merge", file_path),
+                    merge_summary_prompt(file_path, parts, dependencies),
+                )
+            ]
+
+        groups = [[]]
+        size = 0
+        for part in parts:
+            if groups[-1] and size + len(part) > self.chunk_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(part)
+            size += len(part)
+        self._parts[file_path] = [None] * len(groups)
+        return [
+            (
+                ("part", file_path, level + 1, index),
+                partial_merge_prompt(file_path, group),
+            )
+            for index, group in enumerate(groups)
+        ]
+
+
+def _job_paths(key):
+    """Paths of the files a job key covers"""
+    return key[1] if key[0] == "batch" else (key[1],)
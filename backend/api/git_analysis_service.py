@@ -1,15 +1,62 @@
 import subprocess
+import hashlib
 import logging
+import queue
+import threading
 import time
 import json
 import os
+import posixpath
+import shutil
 from pathlib import Path
-from git import Repo
-from collections import defaultdict
 import re
 
-from .utils import GitAnalysisConfig, GitProjectState, is_binary_file, is_asset_file
-from langchain_google_genai import ChatGoogleGenerativeAI
+from .utils import (
+    GitAnalysisConfig,
+    GitProjectState,
+    is_asset_file,
+    is_binary_file,
+    write_text_atomic,
+)
+from .diff_analysis import analyze_diff_content
+from .snapshot_reader import GitSnapshotReader
+from .dependency_state import DependencyState, DependencyStateCache
+from .result_cache import PersistentResultCache
+from .history_store import HISTORY_STORE_NAME, HistoryStore
+from .history_spill import FileRecordSpill, peak_rss_mb
+from .diff_store import DiffStore
+from .symbol_timeline import SymbolTimeline
+from .path_filter import PathFilter
+from .llm_providers import LLMProvider
+from .llm_scheduler import LLMScheduler, is_rate_limit_error
+from .file_summarizer import FileSummarizer
+from .summary_prompts import SUMMARY_PROMPTS, rollup_prompt, template_hash
+from .directory_rollup import directory_tree, rollup_levels
+from .file_priority import SummaryReadiness, importance_scores
+from .file_analysis import (
+    PARSED_EXTENSIONS,
+    analyze_file,
+    empty_analysis,
+    git_blob_sha,
+    graph_dependencies,
+    summary_dependencies,
+    vector_metadata,
+)
+from .graph_rendering import (
+    build_file_dependency_graph,
+    build_function_dependency_graph,
+    prerender_recent_graphs,
+    save_graph,
+)
+from .history_ingest import (
+    INGEST_FORMAT_VERSION,
+    GitHistoryIngester,
+    analyze_commit_shard,
+    filter_existing_objects,
+    list_commits,
+    read_ref_tips,
+    summarize_commits,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -18,6 +65,9 @@ logging.getLogger("faiss").setLevel(logging.ERROR)
 # Load configuration
 config = GitAnalysisConfig()
 
+# Bump whenever dependency extraction output changes, so cached results are not reused
+DEPENDENCY_EXTRACTOR_VERSION = 6
+
 
 class GitAnalysisService:
     """Service for Git repository analysis"""
@@ -25,9 +75,22 @@ class GitAnalysisService:
     def __init__(self):
         self.config = GitAnalysisConfig()
         self.state = GitProjectState()
+        self.llm_provider = LLMProvider.from_config(self.config)
         self._setup_intent_classifier()
-        # Create a file index to help with retrieval
+        # Content and analysis of the working tree files read during the
+        # current analysis run, by relative path (see _analyze_working_file)
         self.file_index = {}
+        # Summaries of the last summarization, by relative path; rolled up into
+        # directory summaries by summarize_directories
+        self.file_summaries = {}
+        # Incremented whenever a vector database is built, so a retrieval chain
+        # can tell that it was loaded from an outdated index
+        self.index_generation = 0
+        # Held while a vector database is swapped in or loaded
+        self._index_lock = threading.Lock()
+        # Opened on first use, see _get_dependency_cache and _get_summary_cache
+        self._dependency_cache = None
+        self._summary_cache = None
 
     def _setup_intent_classifier(self):
         """Setup the intent classifier to determine if a message is requesting git analysis"""
@@ -136,12 +199,8 @@ class GitAnalysisService:
             return True, github_url
 
     def get_llm(self, temperature=0.0):
-        """Get a new LLM instance"""
-        return ChatGoogleGenerativeAI(
-            model=self.config.llm_model,
-            api_key=self.config.api_key,
-            temperature=temperature,
-        )
+        """Get a new LLM instance from the configured provider"""
+        return self.llm_provider.chat_model(temperature)
 
     def clone_repository(self, repo_url):
         """Clone a Git repository"""
@@ -155,6 +214,19 @@ class GitAnalysisService:
 
             if repo_path.exists():
                 logger.info(f"Repository already exists at {repo_path}")
+
+                # Pick up commits pushed since the last analysis
+                pull = subprocess.run(
+                    ["git", "pull", "--ff-only", "--prune"],
+                    cwd=str(repo_path),
+                    capture_output=True,
+                    text=True,
+                )
+                if pull.returncode != 0:
+                    logger.warning(
+                        f"Could not update repository {repo_name}: {pull.stderr.strip()}"
+                    )
+
                 self.state.update_repo(repo_name, str(repo_path))
                 return True, str(repo_path)
 
@@ -176,84 +248,116 @@ class GitAnalysisService:
         repo_path = self.state.current_repo_path
         logger.info(f"Starting repository history analysis for: {repo_path}")
 
+        snapshot_reader = None
+        history_store = None
+        record_spill = None
         try:
-            # Clear previous output
-            for file in self.config.git_history_dir.iterdir():
-                if file.is_file():
-                    file.unlink()
-                elif file.is_dir():
-                    import shutil
-
-                    shutil.rmtree(file)
-
-            repo = Repo(repo_path)
-            try:
-                NULL_TREE = repo.git.hash_object("-t", "tree", "/dev/null")
-                logger.info(f"Computed NULL_TREE hash: {NULL_TREE}")
-            except Exception as e:
-                # Fallback to the standard empty tree hash if command fails
-                NULL_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
-                logger.warning(f"Using default NULL_TREE hash: {NULL_TREE}. Error: {e}")
-
-            # Global repository commit data
-            repo_commits = []
-            file_commit_data = defaultdict(list)
-            commit_file_map = {}  # Map of commit hash to files changed
-
-            i = 0
+            ref_tips = read_ref_tips(repo_path)
+            history_store = self.get_history_store()
+            path_filter = PathFilter.from_config(repo_path, self.config)
+
+            # Resume from the refs analyzed last time if their commits still exist
+            watermark = (
+                self._load_history_watermark(repo_path)
+                if self.config.incremental_history
+                else None
+            )
+            known_tips = (
+                filter_existing_objects(repo_path, watermark["ref_tips"].values())
+                if watermark
+                else []
+            )
+            # The store has to hold every commit the watermark covers, filtered
+            # by the same rules
+            incremental = (
+                bool(known_tips)
+                and history_store.commit_count() == watermark["commit_count"]
+                and watermark.get("path_filter") == path_filter.signature()
+                and watermark.get("ingest_format") == INGEST_FORMAT_VERSION
+            )
+
+            if incremental and watermark["ref_tips"] == ref_tips:
+                logger.info("No new commits since the last history analysis")
+                return (
+                    True,
+                    f"Git history is already up to date ({watermark['commit_count']} commits analyzed).",
+                )
+
+            if incremental:
+                # Only walk commits that are not reachable from the previous tips
+                revisions = ["--all", "--not", *known_tips]
+                commit_offset = watermark["commit_count"]
+                logger.info(
+                    f"Resuming history analysis after {commit_offset} analyzed commits"
+                )
+            else:
+                revisions = None
+                commit_offset = 0
+
+                # Clear previous output
+                history_store.clear()
+                for file in self.config.git_history_dir.iterdir():
+                    if file.name.startswith(HISTORY_STORE_NAME):
+                        continue
+                    if file.is_file():
+                        file.unlink()
+                    elif file.is_dir():
+                        import shutil
+
+                        shutil.rmtree(file)
+
+            # One reader serves the tree and blob lookups of every commit
+            snapshot_reader = GitSnapshotReader(repo_path)
+            self._get_dependency_cache().reset_stats()
+
+            # Dependency maps of recent commits, carried forward to their children
+            dependency_states = DependencyStateCache(
+                self.config.dependency_state_cache_size
+            )
+
+            # Global repository commit data; per-file records are spilled to disk
+            # once more than history_max_records of them are held in memory
+            new_commit_count = 0
+            size_skipped_changes = 0
+            # Files with versions left out of the dependency graphs for their size
+            oversized_files = {}
+            record_spill = FileRecordSpill(
+                self.config.cache_dir, self.config.history_max_records
+            )
+
             # Loop through commits in chronological order
-            for commit in list(repo.iter_commits("--all", reverse=True)):
-                i += 1
-                parents = commit.parents or []
-                commit_hash = commit.hexsha
+            for i, commit in enumerate(
+                self._iter_analyzed_commits(repo_path, revisions, path_filter),
+                start=commit_offset + 1,
+            ):
+                commit_hash = commit["commit_hash"]
                 commit_info = {
                     "commit_hash": commit_hash,
-                    "commit_time": commit.committed_datetime.isoformat(),
-                    "author": f"{commit.author.name} <{commit.author.email}>",
-                    "commit_message": commit.message.strip(),
+                    "commit_time": commit["commit_time"],
+                    "author": commit["author"],
+                    "commit_message": commit["commit_message"],
                     "files_changed": [],
                     "graph_path": None,  # Will store path to generated graphs
                 }
 
                 # Track files changed in this commit
-                files_changed = []
-
-                if not parents:
-                    files_changed = repo.git.diff(
-                        NULL_TREE, commit_hash, name_only=True
-                    ).splitlines()
-                else:
-                    files_changed = repo.git.diff(
-                        parents[0].hexsha, commit_hash, name_only=True
-                    ).splitlines()
+                files_changed = commit["files_changed"]
+                size_skipped_changes += len(commit["skipped_files"])
 
                 # Add files to the commit info
                 commit_info["files_changed"] = files_changed
-                commit_file_map[commit_hash] = files_changed
-
-                # Save overall commit info
-                repo_commits.append(commit_info)
+                new_commit_count += 1
 
                 # Process each changed file
                 for file_path in files_changed:
-                    # Now get the diff for this specific file
-                    if not parents:
-                        diff_text = repo.git.diff(
-                            NULL_TREE, commit_hash, "--", file_path
-                        )
-                    else:
-                        diff_text = repo.git.diff(
-                            parents[0].hexsha, commit_hash, "--", file_path
-                        )
-
                     # Extract just what changed (without redundancy)
-                    change_summary = self._analyze_diff_content(diff_text)
+                    change_summary = commit["change_summaries"][file_path]
                     # Store file commit data with minimal redundancy
                     file_commit_record = {
-                        "commit_time": commit.committed_datetime.isoformat(),
+                        "commit_time": commit["commit_time"],
                         "commit_hash": commit_hash,
-                        "commit_message": commit.message.strip(),
-                        "author": f"{commit.author.name} <{commit.author.email}>",
+                        "commit_message": commit["commit_message"],
+                        "author": commit["author"],
                         "file_name_modified": file_path,
                         "commit_history_index": i,
                         "change_summary": change_summary,
@@ -266,7 +370,8 @@ class GitAnalysisService:
                     # ):
                     #     file_commit_record["diff"] = diff_text
 
-                    file_commit_data[file_path].append(file_commit_record)
+                    record_spill.add(file_path, file_commit_record)
+                    history_store.add_file_change(file_commit_record)
 
                 # Generate graphs for this commit
                 graphs = self.config.git_history_dir / "graphs"
@@ -278,44 +383,76 @@ class GitAnalysisService:
                     / f"{i}_commit_{commit_hash[:8]}_graphs"
                 )
                 graph_dir.mkdir(exist_ok=True)
-                self._generate_commit_graphs(commit_hash, commit_file_map, graph_dir)
+                self._generate_commit_graphs(
+                    commit_hash,
+                    {commit_hash: files_changed},
+                    graph_dir,
+                    snapshot_reader,
+                    parent_hash=commit["parents"][0] if commit["parents"] else None,
+                    dependency_states=dependency_states,
+                    changed_blobs=commit["blobs"],
+                    path_filter=path_filter,
+                    skipped_files=commit["skipped_files"],
+                    oversized_files=oversized_files,
+                )
                 commit_info["graph_path"] = str(graph_dir)
+                history_store.add_commit(commit_info, i, commit["parents"])
 
-            # Save all repository commits in chronological order
-            repo_info = {
-                "repo_name": os.path.basename(repo_path),
-                "commit_count": len(repo_commits),
-                "first_commit_date": (
-                    repo_commits[0]["commit_time"] if repo_commits else None
-                ),
-                "last_commit_date": (
-                    repo_commits[-1]["commit_time"] if repo_commits else None
-                ),
-                "commits": repo_commits,
-                "commit_file_map": commit_file_map,
-            }
+            history_store.set_metadata("repo_name", os.path.basename(repo_path))
+            history_store.flush()
+            total_commits = history_store.commit_count()
 
-            # Save repo commit history
-            repo_history_path = self.config.git_history_dir / "repo_history.json"
-            with open(repo_history_path, "w", encoding="utf-8") as f:
-                json.dump(repo_info, f, indent=2, ensure_ascii=False)
+            # Export the whole history in the legacy JSON format
+            if self.config.export_history_json:
+                history_store.export_repo_history(
+                    self.config.git_history_dir / "repo_history.json",
+                    os.path.basename(repo_path),
+                )
 
             # Safe folder name maker
             def safe_folder_name(name):
                 return re.sub(r'[\/:*?"<>|]', "_", name)
 
-            # Now write per-file output
-            for file_path, commits in file_commit_data.items():
-                # Sort by time
-                commits.sort(key=lambda x: x["commit_time"])
-
+            # Now write per-file output, merging the spilled records file by file
+            file_count = 0
+            for file_path, new_commits in record_spill.iter_files():
+                file_count += 1
                 # Create a folder for each file
                 safe_name = safe_folder_name(file_path)
                 full_folder_path = self.config.git_history_dir / safe_name
                 full_folder_path.mkdir(exist_ok=True)
+                json_path = full_folder_path / "commit_history.json"
 
-                # Add cumulative file insights by analyzing sequential changes
-                self._analyze_file_evolution(commits)
+                # Append to the records written by the previous analysis
+                commits = new_commits
+                timeline = None
+                if incremental and json_path.exists():
+                    with open(json_path, "r", encoding="utf-8") as f:
+                        previous_info = json.load(f)
+                    commits = previous_info.get("commits", []) + new_commits
+                    if "symbol_timeline" in previous_info:
+                        timeline = SymbolTimeline.from_dict(
+                            previous_info["symbol_timeline"]
+                        )
+
+                # Sort by time
+                commits.sort(key=lambda x: x["commit_time"])
+
+                # Add cumulative file insights by analyzing sequential changes,
+                # starting at the first record that was not analyzed before
+                first_new = next(
+                    (
+                        index
+                        for index, commit in enumerate(commits)
+                        if commit["commit_history_index"] > commit_offset
+                    ),
+                    0,
+                )
+                if timeline is None:
+                    first_new = 0  # No timeline yet, replay the whole history
+                timeline = self._analyze_file_evolution(
+                    commits, start=first_new, timeline=timeline
+                )
 
                 # Add file information to the JSON structure
                 file_info = {
@@ -325,164 +462,338 @@ class GitAnalysisService:
                     "commit_count": len(commits),
                     "first_commit_date": commits[0]["commit_time"] if commits else None,
                     "last_commit_date": commits[-1]["commit_time"] if commits else None,
+                    "symbol_timeline": timeline.to_dict(),
                     "commits": commits,
                 }
 
                 # Save JSON file
-                json_path = full_folder_path / "commit_history.json"
                 with open(json_path, "w", encoding="utf-8") as f:
                     json.dump(file_info, f, indent=2, ensure_ascii=False)
 
+            # Remember which ref tips have been analyzed for the next run
+            self._save_history_watermark(
+                repo_path, ref_tips, total_commits, path_filter.signature()
+            )
+
+            # Nothing is diffed for filtered paths, so count them from a raw listing
+            filter_report = path_filter.report(revisions)
+            logger.info(
+                f"Path filter skipped {filter_report['skipped_changes']} changes to "
+                f"{filter_report['skipped_paths']} generated, vendored or lock files "
+                f"({filter_report['skipped_bytes'] / 1024 / 1024:.1f} MB), plus "
+                f"{size_skipped_changes} changes to files over {path_filter.max_file_bytes} bytes"
+            )
+            skipped_changes = filter_report["skipped_changes"] + size_skipped_changes
+            oversized_message = ""
+            if oversized_files:
+                oversized_message = (
+                    f" {len(oversized_files)} files had versions above "
+                    f"{self.config.history_max_file_bytes} bytes that were left out "
+                    "of the dependency graphs."
+                )
+                logger.info(oversized_message.strip())
+
+            # Optionally render the images of the most recent commits right away
+            if self.config.graph_prerender_last_n > 0:
+                rendered = prerender_recent_graphs(
+                    self.config.git_history_dir / "graphs",
+                    self.config.graph_prerender_last_n,
+                    self.config.graph_render_workers,
+                )
+                logger.info(f"Pre-rendered {rendered} graph images")
+
+            peak_rss = peak_rss_mb()
+            if peak_rss is not None:
+                logger.info(
+                    f"Peak RSS: {peak_rss[0]:.1f} MB (worker processes: {peak_rss[1]:.1f} MB), "
+                    f"{record_spill.record_count} file records in {len(record_spill.segment_paths)} spilled segments"
+                )
+
+            cache_stats = self._get_dependency_cache().stats()
+            logger.info(
+                f"Dependency cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                f"({cache_stats['hit_rate']:.1%} hit rate, {cache_stats['size_bytes'] / 1024 / 1024:.1f} MB stored)"
+            )
+
             logger.info(
                 f"Git history analysis complete. Output saved to: {self.config.git_history_dir}"
             )
+            if incremental:
+                return (
+                    True,
+                    f"Git history analysis complete. Processed {new_commit_count} new commits touching {file_count} files ({total_commits} commits in total, {skipped_changes} filtered file changes skipped).{oversized_message}",
+                )
             return (
                 True,
-                f"Git history analysis complete. Found history for {len(file_commit_data)} files across {len(repo_commits)} commits.",
+                f"Git history analysis complete. Found history for {file_count} files across {new_commit_count} commits ({skipped_changes} filtered file changes skipped).{oversized_message}",
             )
 
         except Exception as e:
             logger.error(f"Error analyzing git history: {e}")
             return False, f"Error analyzing git history: {e}"
 
-    def _analyze_file_evolution(self, commits):
-        """Analyze the evolution of a file across multiple commits"""
-        if not commits:
+        finally:
+            if snapshot_reader is not None:
+                snapshot_reader.close()
+            if history_store is not None:
+                history_store.close()
+            if record_spill is not None:
+                record_spill.cleanup()
+            if self._dependency_cache is not None:
+                self._dependency_cache.flush()
+
+    def _iter_analyzed_commits(self, repo_path, revisions=None, path_filter=None):
+        """
+        Yield ingested commits with per-file change summaries in chronological order
+        With more than one configured worker, contiguous shards of the commit
+        range are analyzed in a process pool and yielded back in shard order
+        """
+        workers = self.config.history_workers
+        if workers <= 1:
+            # Stream commits, changed files and patches from a single git process
+            ingester = GitHistoryIngester(
+                repo_path, revisions=revisions, path_filter=path_filter
+            )
+            yield from summarize_commits(ingester.iter_commits(), self.get_diff_store())
             return
 
-        # Initialize tracking variables
-        current_functions = set()
-        current_classes = set()
-        current_imports = set()
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
 
-        # Process commits in chronological order to track evolution
-        for i, commit in enumerate(commits):
-            summary = commit["change_summary"]
-
-            # Update tracked elements
-            if "functions_added" in summary:
-                current_functions.update(summary["functions_added"])
-            if "functions_removed" in summary:
-                current_functions.difference_update(summary["functions_removed"])
-
-            if "classes_added" in summary:
-                current_classes.update(summary["classes_added"])
-            if "classes_removed" in summary:
-                current_classes.difference_update(summary["classes_removed"])
-
-            if "imports_added" in summary:
-                current_imports.update(summary["imports_added"])
-            if "imports_removed" in summary:
-                current_imports.difference_update(summary["imports_removed"])
-
-            # Add state after this commit
-            commit["cumulative_state"] = {
-                "functions": list(current_functions),
-                "classes": list(current_classes),
-                "imports": list(current_imports),
-            }
+        commit_hashes = list_commits(repo_path, revisions)
+        diff_store_root = str(self.config.diff_store_dir)
+        shard_size = max(1, self.config.history_shard_size)
+        shards = iter(
+            [
+                commit_hashes[start : start + shard_size]
+                for start in range(0, len(commit_hashes), shard_size)
+            ]
+        )
+        logger.info(
+            f"Analyzing {len(commit_hashes)} commits in shards of {shard_size} with {workers} workers"
+        )
 
-            # For all but the first commit, compute what changed since previous
-            if i > 0:
-                prev = commits[i - 1].get("cumulative_state", {})
-                curr = commit["cumulative_state"]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded window of shards in flight and consume them in
+            # submission order so the merge stays chronological
+            pending = deque()
+            for shard in shards:
+                pending.append(
+                    executor.submit(
+                        analyze_commit_shard,
+                        repo_path,
+                        shard,
+                        diff_store_root,
+                        path_filter,
+                    )
+                )
+                if len(pending) >= workers * 2:
+                    break
+
+            while pending:
+                shard_commits = pending.popleft().result()
+                next_shard = next(shards, None)
+                if next_shard is not None:
+                    pending.append(
+                        executor.submit(
+                            analyze_commit_shard,
+                            repo_path,
+                            next_shard,
+                            diff_store_root,
+                            path_filter,
+                        )
+                    )
+                yield from shard_commits
 
-                # Check what's new compared to previous state
-                commit["evolution"] = {
-                    "new_functions": [
-                        f
-                        for f in curr["functions"]
-                        if f not in prev.get("functions", [])
-                    ],
-                    "new_classes": [
-                        c for c in curr["classes"] if c not in prev.get("classes", [])
-                    ],
-                    "new_imports": [
-                        imp
-                        for imp in curr["imports"]
-                        if imp not in prev.get("imports", [])
-                    ],
-                }
+    def _load_history_watermark(self, repo_path):
+        """Load the ref tips recorded by the previous history analysis of this repository"""
+        watermark_path = self.config.git_history_dir / "history_watermark.json"
+        if not watermark_path.exists():
+            return None
 
-    def _generate_commit_graphs(self, commit_hash, commit_file_map, output_dir):
-        """Generate dependency graphs for a specific commit with cumulative dependencies"""
-        from pathlib import Path
-        import networkx as nx
-        import matplotlib.pyplot as plt
-        import os
+        try:
+            with open(watermark_path, "r", encoding="utf-8") as f:
+                watermark = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable history watermark: {e}")
+            return None
+
+        # The output directory is shared, so a watermark for another repo is useless
+        if watermark.get("repo_path") != str(repo_path):
+            return None
+        return watermark
+
+    def _save_history_watermark(
+        self, repo_path, ref_tips, commit_count, path_filter=None
+    ):
+        """Persist the analyzed ref tips so the next run only processes new commits"""
+        watermark = {
+            "repo_path": str(repo_path),
+            "ref_tips": ref_tips,
+            "commit_count": commit_count,
+            "path_filter": path_filter,
+            "ingest_format": INGEST_FORMAT_VERSION,
+            "analyzed_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        watermark_path = self.config.git_history_dir / "history_watermark.json"
+        with open(watermark_path, "w", encoding="utf-8") as f:
+            json.dump(watermark, f, indent=2)
 
-        # Create output directory if it doesn't exist
-        output_dir.mkdir(exist_ok=True)
+    def get_history_store(self):
+        """Open the indexed store of the analyzed commit history"""
+        return HistoryStore(self.config.git_history_dir / HISTORY_STORE_NAME)
 
-        # Get the repo object
-        repo = Repo(self.state.current_repo_path)
+    def get_diff_store(self):
+        """Content-addressed store holding the full patch of every analyzed change"""
+        return DiffStore(self.config.diff_store_dir)
 
-        # Get files changed in this commit
-        files_in_commit = commit_file_map.get(commit_hash, [])
+    def load_patch(self, diff_ref):
+        """Fetch the full patch behind a change summary's diff_ref, or None"""
+        return self.get_diff_store().get(diff_ref)
 
-        # Checkout the commit to read actual file state at this commit
-        current_branch = repo.active_branch.name
-        try:
-            # Checkout the commit
-            repo.git.checkout(commit_hash)
+    def load_file_history(self, file_path):
+        """Load the change records of a single file without reading the whole history"""
+        with self.get_history_store() as history_store:
+            return history_store.load_file_history(file_path)
 
-            # Initialize dependency tracking
-            file_dependencies = {}
-            function_dependencies = {}
+    def load_symbol_history(self, symbol, file_path=None):
+        """Load the change history of one function or class from the symbol index"""
+        with self.get_history_store() as history_store:
+            return history_store.symbol_history(symbol, file_path)
 
-            # Process each file in the repository at this commit point
-            for root, dirs, files in os.walk(self.state.current_repo_path):
-                # Skip hidden directories and git directory
-                dirs[:] = [d for d in dirs if not d.startswith(".") and d != ".git"]
+    def _analyze_file_evolution(self, commits, start=0, timeline=None):
+        """
+        Analyze the evolution of a file across multiple commits
+        Symbol lifetimes are kept in a SymbolTimeline indexed by the position of
+        each record, so the symbols present at any commit can be looked up with
+        SymbolTimeline.present_at instead of storing a snapshot per record.
+        Records before `start` were already analyzed into `timeline`.
+        Returns the timeline
+        """
+        if timeline is None:
+            timeline = SymbolTimeline()
+        timeline.truncate(start)
 
-                for filename in files:
-                    file_path = os.path.join(root, filename)
-                    rel_path = os.path.relpath(file_path, self.state.current_repo_path)
+        # Process commits in chronological order to track evolution
+        for i in range(start, len(commits)):
+            commit = commits[i]
+            commit.pop("cumulative_state", None)  # Written by older versions
 
-                    # Skip binary files and non-code files
-                    if is_binary_file(file_path) or is_asset_file(file_path):
-                        continue
+            introduced = timeline.apply(i, commit["change_summary"])
 
-                    # Read the content of the file
-                    try:
-                        with open(
-                            file_path, "r", encoding="utf-8", errors="ignore"
-                        ) as f:
-                            content = f.read()
-
-                        # Skip empty files or very large files
-                        if (
-                            not content or len(content) > 100000
-                        ):  # Skip files larger than 100KB
-                            continue
+            # For all but the first commit, record what is new since the previous one
+            if i > 0:
+                commit["evolution"] = {
+                    "new_functions": introduced["functions"],
+                    "new_classes": introduced["classes"],
+                    "new_imports": introduced["imports"],
+                }
 
-                        # Extract file dependencies
-                        file_deps = self._extract_file_dependencies(rel_path, content)
-                        file_dependencies[rel_path] = file_deps
+        return timeline
+
+    def _generate_commit_graphs(
+        self,
+        commit_hash,
+        commit_file_map,
+        output_dir,
+        snapshot_reader=None,
+        parent_hash=None,
+        dependency_states=None,
+        changed_blobs=None,
+        path_filter=None,
+        skipped_files=None,
+        oversized_files=None,
+    ):
+        """
+        Generate dependency graphs for a specific commit with cumulative dependencies
+        File contents are read from the object database, so nothing is checked out.
+        When the first parent's dependency state is cached, only the files changed
+        in this commit are re-extracted; otherwise the whole tree is scanned.
+        `changed_blobs` maps changed paths to their new blob hash (None if deleted).
+        Paths rejected by `path_filter` are left out of the full tree scan.
+        `skipped_files` are the changed paths the ingester left out (path -> size,
+        None if filtered by pattern); they are dropped from the carried state.
+        File versions above HISTORY_MAX_FILE_BYTES are left out of the graphs and
+        recorded in `oversized_files` (path -> size)
+        """
+        # Create output directory if it doesn't exist
+        output_dir.mkdir(exist_ok=True)
 
-                        # Extract function dependencies
-                        if rel_path.endswith((".py", ".js", ".jsx", ".ts", ".tsx")):
-                            func_deps = self._extract_function_dependencies(
-                                rel_path, content
-                            )
-                            function_dependencies[rel_path] = func_deps
+        # Get files changed in this commit
+        files_in_commit = commit_file_map.get(commit_hash, [])
 
-                    except Exception as e:
-                        logger.warning(
-                            f"Error processing file {rel_path} at commit {commit_hash}: {e}"
-                        )
+        owns_reader = snapshot_reader is None
+        if owns_reader:
+            snapshot_reader = GitSnapshotReader(self.state.current_repo_path)
+        try:
+            parent_state = (
+                dependency_states.get(parent_hash)
+                if dependency_states is not None and parent_hash
+                else None
+            )
 
-            # Now generate graphs based on the complete repository state at this commit
+            if parent_state is not None:
+                # Carry the parent's dependencies forward and refresh changed files
+                state = parent_state.copy()
+                for rel_path, size in (skipped_files or {}).items():
+                    # A file that grew past the size limit is no longer diffed,
+                    # so its previous version must not linger in the graphs
+                    state.remove(rel_path)
+                    if size is not None and self._is_graph_candidate(rel_path):
+                        self._record_oversized_version(rel_path, size, oversized_files)
+                for rel_path in files_in_commit:
+                    state.remove(rel_path)
+                    if changed_blobs is not None:
+                        blob_sha = changed_blobs.get(rel_path)
+                        if blob_sha is None:
+                            continue  # Deleted, or no longer a regular file
+                    else:
+                        blob_sha = None
+                    self._extract_path_dependencies(
+                        state,
+                        rel_path,
+                        blob_sha,
+                        lambda: snapshot_reader.read_text(
+                            blob_sha or f"{commit_hash}:{rel_path}"
+                        ),
+                        commit_hash,
+                    )
+            else:
+                # Read the file state at this commit without touching the working tree
+                snapshot = snapshot_reader.snapshot(commit_hash)
+                state = DependencyState()
+
+                rel_paths = snapshot.paths()
+                if path_filter is not None:
+                    rel_paths = list(rel_paths)
+                    path_filter.prefetch_attributes(rel_paths)
+                    rel_paths = [
+                        rel_path
+                        for rel_path in rel_paths
+                        if not path_filter.excludes(rel_path)
+                    ]
+
+                # Process each file in the repository at this commit point
+                for rel_path in rel_paths:
+                    self._extract_path_dependencies(
+                        state,
+                        rel_path,
+                        snapshot.blob_sha(rel_path),
+                        lambda: snapshot.read_text(rel_path),
+                        commit_hash,
+                        size=snapshot.size(rel_path),
+                        oversized_files=oversized_files,
+                    )
 
-            # 1. File dependency graph
-            file_graph = self._build_file_dependency_graph(file_dependencies)
-            file_graph_path = output_dir / f"file_dependency_{commit_hash[:8]}.png"
-            self._save_graph(file_graph, file_graph_path, "File Dependencies")
+            if dependency_states is not None:
+                dependency_states.put(commit_hash, state)
 
-            # 2. Function call graph
-            func_graph = self._build_function_dependency_graph(function_dependencies)
-            func_graph_path = output_dir / f"function_dependency_{commit_hash[:8]}.png"
-            self._save_graph(func_graph, func_graph_path, "Function Call Dependencies")
+            file_dependencies, function_dependencies = state.graph_inputs()
+
+            # Cross-reference imports based on the complete repository state at this
+            # commit. The graph images are rendered lazily from the saved dependency
+            # data when they are first requested (see graph_rendering)
+            self._build_file_dependency_graph(file_dependencies)
 
             # Store the dependency data for future reference
             dependency_data = {
@@ -501,682 +812,210 @@ class GitAnalysisService:
                 json.dump(dependency_data, f, indent=2, ensure_ascii=False)
 
         finally:
-            # Always restore the original branch
-            repo.git.checkout(current_branch)
+            if owns_reader:
+                snapshot_reader.close()
 
         return str(output_dir)
 
-    def _extract_file_dependencies(self, file_path, content):
-        """Extract file dependencies from file content"""
-        dependencies = {"imports": [], "imported_by": [], "references": []}
-
-        file_ext = os.path.splitext(file_path)[1].lower()
-
-        # Python file dependencies
-        if file_ext == ".py":
-            # Regular imports
-            import_patterns = [
-                re.compile(
-                    r"^import\s+([^\s,;]+)(?:\s*,\s*([^\s,;]+))*", re.MULTILINE
-                ),  # import x, y
-                re.compile(
-                    r"^from\s+([^\s]+)\s+import\s+([^#\n]+)", re.MULTILINE
-                ),  # from x import y
-            ]
+    def _record_oversized_version(self, rel_path, size, oversized_files):
+        """Log a file version left out of the dependency graphs for its size, once per file"""
+        if oversized_files is None or rel_path not in oversized_files:
+            logger.warning(
+                f"Leaving {rel_path} out of the dependency graphs "
+                f"({size} bytes, above HISTORY_MAX_FILE_BYTES)"
+            )
+        if oversized_files is not None:
+            oversized_files[rel_path] = size
+
+    @staticmethod
+    def _is_graph_candidate(rel_path):
+        """Whether a path can appear in the dependency graphs at all"""
+        # Skip hidden directories and git directory
+        if any(part.startswith(".") for part in rel_path.split("/")[:-1]):
+            return False
+
+        # Skip binary files and non-code files
+        return not (is_binary_file(rel_path) or is_asset_file(rel_path))
+
+    def _extract_path_dependencies(
+        self,
+        state,
+        rel_path,
+        blob_sha,
+        read_content,
+        commit_hash,
+        size=None,
+        oversized_files=None,
+    ):
+        """
+        Extract the dependencies of one file into a DependencyState
+        Analyses are cached by blob hash, so known contents are never read or parsed again.
+        A file whose `size` is above HISTORY_MAX_FILE_BYTES is not read at all
+        """
+        if not self._is_graph_candidate(rel_path):
+            return
 
-            for pattern in import_patterns:
-                for match in pattern.finditer(content):
-                    if match.group(0).startswith("from"):
-                        module = match.group(1).strip()
-                        # Check if it's a relative import
-                        if module.startswith("."):
-                            # Convert relative import to potential file path
-                            relative_path = os.path.normpath(
-                                os.path.join(
-                                    os.path.dirname(file_path),
-                                    module.strip(".").replace(".", "/"),
-                                )
-                            )
-                            if module.strip("."):  # Not just '.'
-                                dependencies["imports"].append(f"{relative_path}.py")
-                        else:
-                            # Handle absolute imports
-                            if "." in module and not module.startswith(
-                                ("os", "sys", "re", "json")
-                            ):
-                                # Could be a project module
-                                module_path = module.replace(".", "/") + ".py"
-                                dependencies["imports"].append(module_path)
-                    else:
-                        # Handle 'import x' or 'import x, y, z'
-                        for i in range(
-                            1, match.lastindex + 1 if match.lastindex else 2
-                        ):
-                            if match.group(i):
-                                module = match.group(i).strip()
-                                if "." in module and not module.startswith(
-                                    ("os", "sys", "re", "json")
-                                ):
-                                    module_path = module.replace(".", "/") + ".py"
-                                    dependencies["imports"].append(module_path)
-
-        # JavaScript/TypeScript file dependencies
-        elif file_ext in [".js", ".jsx", ".ts", ".tsx"]:
-            import_patterns = [
-                re.compile(
-                    r'import\s+(?:{[^}]+}|[^{}\s]+)\s+from\s+[\'"]([^\'"]+)[\'"]',
-                    re.MULTILINE,
-                ),  # import x from 'y'
-                re.compile(r'import\s+[\'"]([^\'"]+)[\'"]', re.MULTILINE),  # import 'x'
-                re.compile(
-                    r'require\([\'"]([^\'"]+)[\'"]\)', re.MULTILINE
-                ),  # require('x')
-            ]
+        if size is not None and not self._within_size_limit(size):
+            self._record_oversized_version(rel_path, size, oversized_files)
+            return
 
-            for pattern in import_patterns:
-                for match in pattern.finditer(content):
-                    module_path = match.group(1).strip()
+        cache = self._get_dependency_cache()
+        cache_key = None
+        if blob_sha:
+            cache_key = self._analysis_cache_key(rel_path, blob_sha)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                self._apply_extracted_dependencies(
+                    state, rel_path, graph_dependencies(cached)
+                )
+                return
 
-                    # Filter out node_modules and external packages
-                    if (
-                        module_path.startswith("./")
-                        or module_path.startswith("../")
-                        or not ("/" in module_path and not module_path.startswith("@"))
-                    ):
+        # Read the content of the file
+        try:
+            content = read_content()
+            analysis = {}
 
-                        # Normalize the path
-                        normalized_path = os.path.normpath(
-                            os.path.join(os.path.dirname(file_path), module_path)
-                        )
+            # Skip deleted, empty or very large files
+            if content and self._within_size_limit(len(content)):
+                analysis = analyze_file(rel_path, content)
 
-                        # Add potential extensions if missing
-                        if not os.path.splitext(normalized_path)[1]:
-                            for ext in [".js", ".jsx", ".ts", ".tsx"]:
-                                dependencies["imports"].append(normalized_path + ext)
-                        else:
-                            dependencies["imports"].append(normalized_path)
-
-        return dependencies
-
-    def _extract_function_dependencies(self, file_path, content):
-        """Extract function dependencies from file content"""
-        function_info = {
-            "functions": [],
-            "function_calls": {},  # function -> [called functions]
-            "called_by": {},  # function -> [calling functions]
-        }
+            if cache_key is not None and content is not None:
+                cache.put(cache_key, analysis)
+            self._apply_extracted_dependencies(
+                state, rel_path, graph_dependencies(analysis)
+            )
 
-        file_ext = os.path.splitext(file_path)[1].lower()
+        except Exception as e:
+            logger.warning(
+                f"Error processing file {rel_path} at commit {commit_hash}: {e}"
+            )
 
-        # Python function extraction
-        if file_ext == ".py":
-            # Find all function definitions
-            function_pattern = re.compile(
-                r"^def\s+([a-zA-Z0-9_]+)\s*\([^)]*\):", re.MULTILINE
+    @staticmethod
+    def _apply_extracted_dependencies(state, rel_path, extracted):
+        """Store extraction results (possibly from the cache) in a DependencyState"""
+        if "file_dependencies" in extracted:
+            state.file_dependencies[rel_path] = extracted["file_dependencies"]
+        if "function_dependencies" in extracted:
+            state.set_function_dependencies(
+                rel_path, extracted["function_dependencies"]
             )
-            functions = [m.group(1) for m in function_pattern.finditer(content)]
-            function_info["functions"] = functions
-
-            # For each function, find calls to other functions
-            for func_name in functions:
-                # Find the function body
-                func_pattern = re.compile(
-                    r"def\s+"
-                    + re.escape(func_name)
-                    + r"\s*\([^)]*\):\s*(.*?)(?=\n\S|$)",
-                    re.DOTALL,
-                )
-                func_matches = func_pattern.findall(content)
-
-                if func_matches:
-                    func_body = func_matches[0]
-                    calls = []
-
-                    # Look for calls to other functions
-                    for other_func in functions:
-                        if other_func != func_name and re.search(
-                            r"\b" + re.escape(other_func) + r"\s*\(", func_body
-                        ):
-                            calls.append(other_func)
-
-                            # Track who calls whom
-                            if other_func not in function_info["called_by"]:
-                                function_info["called_by"][other_func] = []
-                            function_info["called_by"][other_func].append(func_name)
-
-                    if calls:
-                        function_info["function_calls"][func_name] = calls
-
-        # JavaScript/TypeScript function extraction
-        elif file_ext in [".js", ".jsx", ".ts", ".tsx"]:
-            # Various patterns to catch JS function definitions
-            function_patterns = [
-                re.compile(
-                    r"function\s+([a-zA-Z0-9_$]+)\s*\(", re.MULTILINE
-                ),  # function x()
-                re.compile(
-                    r"(?:const|let|var)\s+([a-zA-Z0-9_$]+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>",
-                    re.MULTILINE,
-                ),  # const x = () =>
-                re.compile(
-                    r"(?:const|let|var)\s+([a-zA-Z0-9_$]+)\s*=\s*function", re.MULTILINE
-                ),  # const x = function
-                re.compile(
-                    r"([a-zA-Z0-9_$]+)\s*:\s*function", re.MULTILINE
-                ),  # x: function
-                re.compile(
-                    r"([a-zA-Z0-9_$]+)\([^)]*\)\s*{", re.MULTILINE
-                ),  # x() { (method)
-            ]
 
-            # Collect all function definitions
-            functions = []
-            for pattern in function_patterns:
-                funcs = [m.group(1) for m in pattern.finditer(content)]
-                functions.extend(funcs)
-
-            # Remove duplicates
-            functions = list(set(functions))
-            function_info["functions"] = functions
-
-            # Simplified function call analysis (for a more accurate analysis, we'd need AST parsing)
-            for func_name in functions:
-                # Find potential calls to other functions
-                # This is a simplified approach; real JS analysis would be more complex
-                calls = []
-                for other_func in functions:
-                    if other_func != func_name and re.search(
-                        r"\b" + re.escape(other_func) + r"\s*\(", content
-                    ):
-                        calls.append(other_func)
-
-                        # Track who calls whom
-                        if other_func not in function_info["called_by"]:
-                            function_info["called_by"][other_func] = []
-                        function_info["called_by"][other_func].append(func_name)
-
-                if calls:
-                    function_info["function_calls"][func_name] = calls
-
-        return function_info
+    @staticmethod
+    def _analysis_cache_key(rel_path, blob_sha):
+        # Analysis depends on the content, the extension and (for relative
+        # imports) the directory, so all of them are part of the cache key
+        directory, file_name = os.path.split(rel_path)
+        extension = os.path.splitext(file_name)[1].lower()
+        return f"{DEPENDENCY_EXTRACTOR_VERSION}:{blob_sha}:{directory}:{extension}"
+
+    def _analyze_working_file(self, file_path, rel_path):
+        """
+        Read and analyze a file of the working tree at most once per analysis run
+        Returns (content, analysis), both None for empty files. Files above
+        HISTORY_MAX_FILE_BYTES are not parsed and get an empty analysis, so
+        they are still summarized (in chunks) and indexed. The analysis is looked up by blob hash in the dependency cache first, so
+        files the history analysis already extracted are not parsed again
+        """
+        file_stat = file_path.stat()
+        stat_key = (file_stat.st_mtime_ns, file_stat.st_size)
+        entry = self.file_index.get(rel_path)
+        if entry is not None and entry["stat"] == stat_key:
+            return entry["content"], entry["analysis"]
+
+        analysis = None
+        data = file_path.read_bytes()
+        content = data.decode("utf-8", errors="ignore") or None
+        blob_sha = git_blob_sha(data)
+        oversized = not self._within_size_limit(file_stat.st_size)
+        if content is not None:
+            if oversized:
+                logger.warning(
+                    f"Not extracting dependencies from {rel_path} "
+                    f"({file_stat.st_size} bytes, above HISTORY_MAX_FILE_BYTES)"
+                )
+                analysis = empty_analysis()
+            elif file_path.suffix.lower() in PARSED_EXTENSIONS:
+                cache = self._get_dependency_cache()
+                cache_key = self._analysis_cache_key(rel_path, blob_sha)
+                analysis = cache.get(cache_key)
+                if not analysis:
+                    analysis = analyze_file(rel_path, content)
+                    cache.put(cache_key, analysis)
+            else:
+                analysis = analyze_file(rel_path, content)
+
+        self.file_index[rel_path] = {
+            "stat": stat_key,
+            "content": content,
+            "analysis": analysis,
+            "blob_sha": blob_sha,
+            "oversized": oversized,
+        }
+        return content, analysis
+
+    def _within_size_limit(self, size):
+        """Files above HISTORY_MAX_FILE_BYTES are neither diffed nor parsed for dependencies"""
+        limit = self.config.history_max_file_bytes
+        return not limit or size <= limit
+
+    def _get_dependency_cache(self):
+        """Persistent cache of dependency extraction results, keyed by blob hash"""
+        if self._dependency_cache is None:
+            self._dependency_cache = PersistentResultCache(
+                self.config.cache_dir / "dependency_cache.sqlite3",
+                max_bytes=self.config.dependency_cache_max_mb * 1024 * 1024,
+            )
+        return self._dependency_cache
+
+    def _get_summary_cache(self):
+        """Persistent cache of LLM file summaries, kept across restarts and repositories"""
+        if self._summary_cache is None:
+            self._summary_cache = PersistentResultCache(
+                self.config.cache_dir / "summary_cache.sqlite3",
+                max_bytes=self.config.summary_cache_max_mb * 1024 * 1024,
+            )
+        return self._summary_cache
+
+    def _summary_cache_key(self, rel_path, blob_sha):
+        # The prompt embeds the path and the dependencies resolved relative to
+        # it, so a summary is reused for the same content at the same path only
+        return (
+            f"{template_hash(*SUMMARY_PROMPTS)}:{self.llm_provider.cache_namespace}:"
+            f"{DEPENDENCY_EXTRACTOR_VERSION}:{blob_sha}:{rel_path}"
+        )
 
     def _build_file_dependency_graph(self, file_dependencies):
         """Build file dependency graph from extracted dependencies"""
-        import networkx as nx
-
-        G = nx.DiGraph()
-
-        # Add nodes for all files
-        for file_path in file_dependencies:
-            # Add node with file extension as attribute
-            ext = os.path.splitext(file_path)[1].lower()
-            G.add_node(file_path, type="file", extension=ext)
-
-        # Add edges based on imports
-        for file_path, deps in file_dependencies.items():
-            for imported_file in deps["imports"]:
-                # Check if the imported file exists in our dependency map
-                if imported_file in file_dependencies:
-                    G.add_edge(file_path, imported_file)
-
-                    # Also update the imported_by list for cross-reference
-                    if file_path not in file_dependencies[imported_file]["imported_by"]:
-                        file_dependencies[imported_file]["imported_by"].append(
-                            file_path
-                        )
-
-        return G
+        return build_file_dependency_graph(file_dependencies)
 
-    def _build_function_dependency_graph(self, function_dependencies):
+    def _build_function_dependency_graph(
+        self, function_dependencies, file_dependencies=None, symbol_index=None
+    ):
         """Build function call graph from extracted dependencies"""
-        import networkx as nx
-
-        G = nx.DiGraph()
-
-        # Track all functions across files
-        all_functions = {}  # file_path:function_name -> node_id
-
-        # Add nodes for all functions
-        for file_path, func_info in function_dependencies.items():
-            for func_name in func_info["functions"]:
-                # Create unique identifier for this function
-                node_id = f"{file_path}:{func_name}"
-                G.add_node(node_id, function=func_name, file=file_path)
-                all_functions[node_id] = func_name
-
-        # Add edges based on function calls
-        for file_path, func_info in function_dependencies.items():
-            for caller, callees in func_info["function_calls"].items():
-                caller_id = f"{file_path}:{caller}"
-
-                for callee in callees:
-                    callee_id = f"{file_path}:{callee}"  # Default to same file
-
-                    # Check if the callee exists in this file
-                    if callee_id in all_functions:
-                        G.add_edge(caller_id, callee_id)
-                    else:
-                        # If not found in this file, it might be from another file
-                        # This is a simplified approach; actual cross-file function resolution would be more complex
-                        for other_file, other_info in function_dependencies.items():
-                            if (
-                                other_file != file_path
-                                and callee in other_info["functions"]
-                            ):
-                                other_callee_id = f"{other_file}:{callee}"
-                                G.add_edge(caller_id, other_callee_id)
-                                break
-
-        return G
+        return build_function_dependency_graph(
+            function_dependencies, file_dependencies, symbol_index
+        )
 
     def _save_graph(self, G, output_path, title):
         """Save a graph visualization to file"""
-        import matplotlib
-
-        # Set non-interactive backend to avoid GUI thread issues
-        matplotlib.use("Agg")
-        import matplotlib.pyplot as plt
-        import networkx as nx
-
-        plt.figure(figsize=(12, 8))
-
-        # Different layout algorithms for different graph sizes
-        if len(G.nodes) < 20:
-            pos = nx.spring_layout(G, seed=42)
-        else:
-            pos = nx.kamada_kawai_layout(G)
-
-        # Check if graph has extension attribute
-        if any("extension" in G.nodes[n] for n in G.nodes):
-            # Color nodes by file extension
-            extension_colors = {
-                ".py": "skyblue",
-                ".js": "lightgreen",
-                ".jsx": "green",
-                ".ts": "yellow",
-                ".tsx": "orange",
-                ".html": "salmon",
-                ".css": "violet",
-                ".json": "khaki",
-            }
-
-            node_colors = [
-                extension_colors.get(G.nodes[n].get("extension", ""), "lightgray")
-                for n in G.nodes
-            ]
-
-            nx.draw(
-                G,
-                pos,
-                with_labels=True,
-                labels={n: os.path.basename(n) for n in G.nodes},
-                node_color=node_colors,
-                node_size=800,
-                edge_color="gray",
-                arrows=True,
-            )
-        else:
-            # Simple graph drawing
-            nx.draw(
-                G,
-                pos,
-                with_labels=True,
-                node_color="lightblue",
-                node_size=800,
-                edge_color="gray",
-                arrows=True,
-            )
-
-        plt.title(title)
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close()
-        return str(output_path)
+        return save_graph(G, output_path, title)
 
     def _analyze_diff_content(self, diff_text):
         """
         Analyzes diff content to extract meaningful change information
         Returns a structured summary of changes
         """
-        summary = {
-            "lines_added": 0,
-            "lines_removed": 0,
-            "additions": [],
-            "deletions": [],
-            "modifications": [],
-            "functions_added": [],
-            "functions_modified": [],
-            "functions_removed": [],
-            "change_type": "unknown",
-        }
-
-        # Simple pattern matching for Python functions
-        function_pattern = re.compile(
-            r"^[\+\-]\s*def\s+([a-zA-Z0-9_]+)\s*\(", re.MULTILINE
-        )
-        class_pattern = re.compile(r"^[\+\-]\s*class\s+([a-zA-Z0-9_]+)", re.MULTILINE)
-        import_pattern = re.compile(
-            r"^[\+\-]\s*(?:import|from)\s+([^\s]+)", re.MULTILINE
-        )
+        return analyze_diff_content(diff_text)
 
-        # Count added/removed lines
-        for line in diff_text.split("\n"):
-            if line.startswith("+") and not line.startswith("+++"):
-                summary["lines_added"] += 1
-                summary["additions"].append(line[1:].strip())
-            elif line.startswith("-") and not line.startswith("---"):
-                summary["lines_removed"] += 1
-                summary["deletions"].append(line[1:].strip())
-
-        # Extract function changes
-        added_functions = [
-            m.group(1)
-            for m in function_pattern.finditer(diff_text)
-            if m.group(0).startswith("+")
-        ]
-        removed_functions = [
-            m.group(1)
-            for m in function_pattern.finditer(diff_text)
-            if m.group(0).startswith("-")
-        ]
-
-        # Functions that appear in both added and removed are likely modifications
-        modified_functions = set(added_functions) & set(removed_functions)
-        truly_added_functions = set(added_functions) - modified_functions
-        truly_removed_functions = set(removed_functions) - modified_functions
-
-        summary["functions_added"] = list(truly_added_functions)
-        summary["functions_removed"] = list(truly_removed_functions)
-        summary["functions_modified"] = list(modified_functions)
-
-        # Similarly handle class changes
-        added_classes = [
-            m.group(1)
-            for m in class_pattern.finditer(diff_text)
-            if m.group(0).startswith("+")
-        ]
-        removed_classes = [
-            m.group(1)
-            for m in class_pattern.finditer(diff_text)
-            if m.group(0).startswith("-")
-        ]
-
-        # And import changes
-        added_imports = [
-            m.group(1)
-            for m in import_pattern.finditer(diff_text)
-            if m.group(0).startswith("+")
-        ]
-        removed_imports = [
-            m.group(1)
-            for m in import_pattern.finditer(diff_text)
-            if m.group(0).startswith("-")
-        ]
-
-        # Determine overall change type
-        if summary["lines_added"] > 0 and summary["lines_removed"] == 0:
-            summary["change_type"] = "addition"
-        elif summary["lines_added"] == 0 and summary["lines_removed"] > 0:
-            summary["change_type"] = "deletion"
-        elif summary["lines_added"] > 0 and summary["lines_removed"] > 0:
-            summary["change_type"] = "modification"
-
-        # Additional metadata
-        summary["classes_added"] = added_classes
-        summary["classes_removed"] = removed_classes
-        summary["imports_added"] = added_imports
-        summary["imports_removed"] = removed_imports
-
-        return summary
-
-    def summarize_repository_files(self):
-        def extract_dependencies(file_path, content):
-            """
-            Enhanced dependency extraction that captures all types of dependencies
-            """
-            file_ext = os.path.splitext(file_path)[1].lower()
-            dependencies = {
-                "imports": [],
-                "functions": [],
-                "classes": [],
-                "file_dependencies": [],
-                "function_calls": {},  # Map of which functions call which others
-            }
-
-            # Python-specific extraction
-            if file_ext == ".py":
-                # Import patterns
-                import_patterns = [
-                    re.compile(
-                        r"^import\s+([^\s,;]+)(?:\s*,\s*([^\s,;]+))*", re.MULTILINE
-                    ),  # import x, y
-                    re.compile(
-                        r"^from\s+([^\s]+)\s+import\s+([^#\n]+)", re.MULTILINE
-                    ),  # from x import y
-                ]
-
-                # Function and class patterns
-                function_pattern = re.compile(
-                    r"^def\s+([a-zA-Z0-9_]+)\s*\([^)]*\):", re.MULTILINE
-                )
-                class_pattern = re.compile(r"^class\s+([a-zA-Z0-9_]+)", re.MULTILINE)
-
-                # Find all imports
-                for pattern in import_patterns:
-                    for match in pattern.finditer(content):
-                        if match.group(0).startswith("from"):
-                            module = match.group(1).strip()
-                            imported_items = [
-                                item.strip() for item in match.group(2).split(",")
-                            ]
-
-                            # Check if it's a local import
-                            if not module.startswith(".") and "." not in module:
-                                dependencies["imports"].append(
-                                    f"from {module} import {', '.join(imported_items)}"
-                                )
-                            else:
-                                # Could be a local file dependency
-                                if module.startswith("."):
-                                    # Relative import
-                                    relative_path = os.path.normpath(
-                                        os.path.join(
-                                            os.path.dirname(file_path),
-                                            module.strip(".").replace(".", "/"),
-                                        )
-                                    )
-                                    if module.strip("."):  # Not just '.'
-                                        dependencies["file_dependencies"].append(
-                                            f"{relative_path}.py"
-                                        )
-                                else:
-                                    # Absolute import within project
-                                    dependencies["file_dependencies"].append(
-                                        f"{module.replace('.', '/')}.py"
-                                    )
-                        else:
-                            # Handle 'import x' or 'import x, y, z'
-                            for i in range(
-                                1, match.lastindex + 1 if match.lastindex else 2
-                            ):
-                                if match.group(i):
-                                    module = match.group(i).strip()
-                                    dependencies["imports"].append(f"import {module}")
-
-                # Extract all functions and classes first
-                functions = [m.group(1) for m in function_pattern.finditer(content)]
-                dependencies["functions"] = functions
-                dependencies["classes"] = [
-                    m.group(1) for m in class_pattern.finditer(content)
-                ]
-
-                # Now analyze each function to find its calls
-                for func_name in functions:
-                    # Find the function body
-                    func_pattern = re.compile(
-                        r"def\s+"
-                        + re.escape(func_name)
-                        + r"\s*\([^)]*\):\s*(.*?)(?=\n\S|$)",
-                        re.DOTALL,
-                    )
-                    func_matches = func_pattern.findall(content)
-
-                    if func_matches:
-                        func_body = func_matches[0]
-                        calls = []
-
-                        # Look for calls to other functions in this file
-                        for other_func in functions:
-                            if other_func != func_name and re.search(
-                                r"\b" + re.escape(other_func) + r"\s*\(", func_body
-                            ):
-                                calls.append(other_func)
-
-                        if calls:
-                            dependencies["function_calls"][func_name] = calls
-
-            # JavaScript/TypeScript-specific extraction
-            elif file_ext in [".js", ".ts", ".jsx", ".tsx"]:
-                # Import patterns for JS/TS
-                js_import_patterns = [
-                    re.compile(
-                        r'import\s+(?:{[^}]+}|[^{}\s]+)\s+from\s+[\'"]([^\'"]+)[\'"]',
-                        re.MULTILINE,
-                    ),  # import x from 'y'
-                    re.compile(
-                        r'import\s+[\'"]([^\'"]+)[\'"]', re.MULTILINE
-                    ),  # import 'x'
-                    re.compile(
-                        r'require\([\'"]([^\'"]+)[\'"]\)', re.MULTILINE
-                    ),  # require('x')
-                ]
-
-                # Function patterns for JS/TS (expanded to catch more patterns)
-                js_function_patterns = [
-                    re.compile(
-                        r"function\s+([a-zA-Z0-9_$]+)\s*\(", re.MULTILINE
-                    ),  # function x()
-                    re.compile(
-                        r"(?:const|let|var)\s+([a-zA-Z0-9_$]+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>",
-                        re.MULTILINE,
-                    ),  # const x = () =>
-                    re.compile(
-                        r"(?:const|let|var)\s+([a-zA-Z0-9_$]+)\s*=\s*function",
-                        re.MULTILINE,
-                    ),  # const x = function()
-                    re.compile(
-                        r"([a-zA-Z0-9_$]+)\s*:\s*function", re.MULTILINE
-                    ),  # x: function
-                    re.compile(
-                        r"([a-zA-Z0-9_$]+)\([^)]*\)\s*{", re.MULTILINE
-                    ),  # x() { (method in class/object)
-                ]
-
-                # Class pattern for JS/TS
-                js_class_pattern = re.compile(r"class\s+([a-zA-Z0-9_$]+)", re.MULTILINE)
-
-                # Find all imports
-                for pattern in js_import_patterns:
-                    for match in pattern.finditer(content):
-                        module_path = match.group(1).strip()
-                        dependencies["imports"].append(module_path)
-
-                        # Check if it's a local import
-                        if (
-                            module_path.startswith("./")
-                            or module_path.startswith("../")
-                            or not (
-                                module_path.startswith("@") or "/" not in module_path
-                            )
-                        ):
-                            # Normalize and add extension if missing
-                            local_path = os.path.normpath(
-                                os.path.join(os.path.dirname(file_path), module_path)
-                            )
-                            if not os.path.splitext(local_path)[1]:
-                                # Try common extensions
-                                for ext in [".js", ".jsx", ".ts", ".tsx"]:
-                                    possible_path = local_path + ext
-                                    dependencies["file_dependencies"].append(
-                                        possible_path
-                                    )
-                            else:
-                                dependencies["file_dependencies"].append(local_path)
-
-                # Find all functions
-                functions = []
-                for pattern in js_function_patterns:
-                    for match in pattern.finditer(content):
-                        functions.append(match.group(1))
-
-                dependencies["functions"] = functions
-                dependencies["classes"] = [
-                    m.group(1) for m in js_class_pattern.finditer(content)
-                ]
-
-                # Simplified function call analysis for JS (more complex in reality)
-                for func_name in functions:
-                    # This is a simplified approximation; real JS analysis would require an AST
-                    calls = []
-                    for other_func in functions:
-                        if other_func != func_name and re.search(
-                            r"\b" + re.escape(other_func) + r"\s*\(", content
-                        ):
-                            calls.append(other_func)
-
-                    if calls:
-                        dependencies["function_calls"][func_name] = calls
-
-            return dependencies
-
-        def summarize_file(file_path, file_content, dependencies):
-            """
-            Enhanced file summarization that emphasizes dependencies for graph generation
-            """
-            prompt = f"""
-            You are a code analysis assistant. Provide a detailed summary of the following file.
-            
-            IMPORTANT REQUIREMENTS:
-            1. Start with an overview of the file's main purpose in 1-2 sentences
-            2. List ALL import statements EXACTLY as they appear in the code (preserve them precisely)
-            3. List ALL functions with their signatures and a brief description
-            4. List ALL classes with their inheritance structure and a brief description
-            5. Explicitly identify ALL function calls between functions in this file
-            6. Clearly identify ALL dependencies on other local files (not standard libraries)
-            7. Format your response with clear headings for each section
-            
-            This information will be used for:
-            - Understanding code dependencies
-            - Generating accurate dependency graphs
-            - Retrieving relevant information based on queries
-            
-            EXTERNAL ANALYSIS RESULTS:
-            Identified imports: {dependencies['imports']}
-            Identified functions: {dependencies['functions']}
-            Identified classes: {dependencies['classes']}
-            Identified file dependencies: {dependencies['file_dependencies']}
-            Identified function calls: {dependencies['function_calls']}
-            
-            File path: {file_path}
-            File content:
-            
-            {file_content}
-            """
-
-            retries = 3
-            for attempt in range(retries):
-                try:
-                    response = llm.invoke(prompt)
-                    return response.content
-                except Exception as e:
-                    if "429" in str(e):
-                        logger.warning("Quota exceeded. Retrying after delay...")
-                        time.sleep(35)
-                    else:
-                        raise e
-            return "Error: Failed after multiple retries."
-
-        """Summarize all files in the current repository with enhanced dependency tracking"""
+    def summarize_repository_files(self, progress=None, on_ready=None, scheduler=None):
+        """
+        Summarize all files in the current repository with enhanced dependency tracking
+        The LLM requests run concurrently; `progress` is called with status lines.
+        Files are summarized most important first. Once SUMMARY_READY_COVERAGE of
+        the files are summarized, the summaries so far are written and `on_ready`
+        is called, so an index can be built while the rest are summarized.
+        Pass the same `scheduler` to stages running meanwhile to share its rate limits
+        """
         if not self.state.current_repo_path:
             return False, "No repository currently loaded"
 
@@ -1204,11 +1043,12 @@ class GitAnalysisService:
             summaries = {}
             file_dependencies = {}  # Track dependencies between files
             all_function_calls = {}  # Track function calls across the project
-
-            def get_file_content(file_path):
-                """Reads the content of a file."""
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as file:
-                    return file.read()
+            pending = []  # (path, content, dependencies) of files to summarize
+            summary_cache = self._get_summary_cache()
+            summary_cache.reset_stats()
+            cache_keys = {}
+            # Files summarized without dependency analysis, see _analyze_working_file
+            oversized = 0
 
             # Walk through the repo directory
             repo_path_obj = Path(repo_path)
@@ -1235,57 +1075,265 @@ class GitAnalysisService:
                         continue
 
                     try:
-                        # Read the file content
-                        file_content = get_file_content(file_path)
+                        # Read and analyze the file (shared with the vector database step)
+                        file_content, analysis = self._analyze_working_file(
+                            file_path, relative_path
+                        )
 
-                        # Skip empty files or very large files
-                        if (
-                            not file_content or len(file_content) > 100000
-                        ):  # Skip files larger than 100KB
+                        # Skip empty files
+                        if analysis is None:
                             continue
+                        if self.file_index[relative_path]["oversized"]:
+                            oversized += 1
 
-                        # Extract dependencies
-                        dependencies = extract_dependencies(relative_path, file_content)
+                        dependencies = summary_dependencies(analysis)
                         file_dependencies[relative_path] = dependencies
 
-                        # Get the summary of the content
-                        summary = summarize_file(
-                            relative_path, file_content, dependencies
+                        # Unchanged files keep the summary of their last analysis
+                        cache_key = self._summary_cache_key(
+                            relative_path, self.file_index[relative_path]["blob_sha"]
                         )
-                        time.sleep(
-                            1.5
-                        )  # Add delay between API calls to avoid rate limiting
+                        summary = summary_cache.get(cache_key)
+                        if summary is not None:
+                            summaries[relative_path] = summary
+                            continue
 
-                        # Store the summary in the dictionary with relative file path
-                        summaries[relative_path] = summary
-                        logger.info(f"Summarized: {relative_path}")
+                        # Reserve the slot so summaries keep the walk order
+                        summaries[relative_path] = None
+                        cache_keys[relative_path] = cache_key
+                        pending.append((relative_path, file_content, dependencies))
 
                     except Exception as e:
                         logger.error(f"Error summarizing {file_path}: {e}")
 
-            # Write all summaries to a single file
-            with open(summary_file, "w", encoding="utf-8") as file:
-                for file_path, summary in summaries.items():
-                    file.write(f"Summary of {file_path}:\n")
-                    file.write(f"{summary}\n")
-                    file.write("\n" + "=" * 50 + "\n")
+            # Most depended upon, most changed files and entry points first
+            scores = importance_scores(file_dependencies, self._history_change_counts())
+            pending.sort(key=lambda entry: -scores[entry[0]])
+            # Every lookup has happened by now; an early index built while the
+            # requests run adds directory rollup lookups of its own
+            cache_stats = summary_cache.stats()
+
+            # Small files share prompts and large files are summarized in chunks,
+            # so no prompt grows with the size of a file
+            summarizer = FileSummarizer.from_config(llm, self.config, scheduler)
+            scheduler = summarizer.scheduler
+            completed = 0
+            report_every = max(1, len(pending) // 20)
+            readiness = SummaryReadiness(
+                len(file_dependencies), len(pending), self.config.summary_ready_coverage
+            )
+
+            def on_summary(relative_path, summary, error):
+                nonlocal completed
+                completed += 1
+                if error is None:
+                    # Store the summary in the dictionary with relative file path
+                    summaries[relative_path] = summary
+                    summary_cache.put(cache_keys[relative_path], summary)
+                    logger.info(f"Summarized: {relative_path}")
+                elif is_rate_limit_error(error):
+                    summaries[relative_path] = "Error: Failed after multiple retries."
+                    logger.error(f"Quota exceeded summarizing {relative_path}: {error}")
+                else:
+                    del summaries[relative_path]
+                    logger.error(f"Error summarizing {relative_path}: {error}")
+
+                if progress and (
+                    completed % report_every == 0 or completed == len(pending)
+                ):
+                    progress(f"Summarized {completed}/{len(pending)} files\n")
+
+                if readiness.complete() and on_ready:
+                    logger.info(
+                        f"Summaries ready for {readiness.covered} of "
+                        f"{readiness.total} files"
+                    )
+                    self._write_summaries(summaries, file_dependencies)
+                    on_ready()
+
+            if progress and pending:
+                batches, singles, large = summarizer.plan(pending)
+                progress(
+                    f"Summarizing {len(pending)} files ({len(batches)} batches, "
+                    f"{len(large)} large files in chunks) with up to "
+                    f"{scheduler.concurrency} requests in flight...\n"
+                )
+            summarizer.summarize(pending, on_summary)
+
+            if scheduler.retries:
+                logger.info(f"Retried {scheduler.retries} rate limited or failed calls")
 
-            # Write dependencies to a JSON file
-            with open(dependency_file, "w", encoding="utf-8") as file:
-                json.dump(file_dependencies, file, indent=2)
+            # Commit both caches so other processes can use them right away
+            self._get_dependency_cache().flush()
+            summary_cache.flush()
+            cache_message = (
+                f"{cache_stats['hits']} of {cache_stats['hits'] + cache_stats['misses']} "
+                f"summaries reused from cache ({cache_stats['hit_rate']:.1%} hit rate)"
+            )
+            logger.info(
+                f"Summary cache: {cache_message}, "
+                f"{summary_cache.stats()['size_bytes'] / 1024 / 1024:.1f} MB stored"
+            )
+
+            self._write_summaries(summaries, file_dependencies)
 
             logger.info(
                 f"Summarization complete. Created summaries for {len(summaries)} files."
             )
-            return (
-                True,
-                f"Summarization complete. Created summaries for {len(summaries)} files with dependency tracking.",
-            )
+            message = f"Summarization complete. Created summaries for {len(summaries)} files with dependency tracking. {cache_message}."
+            if oversized:
+                message += (
+                    f" {oversized} files above {self.config.history_max_file_bytes} "
+                    "bytes were summarized without dependency analysis."
+                )
+            return True, message
 
         except Exception as e:
             logger.error(f"Error summarizing repository files: {e}")
             return False, f"Error summarizing repository files: {e}"
 
+    def _history_change_counts(self):
+        """Commit churn of every path from the history analysis, if it ran"""
+        if not (self.config.git_history_dir / HISTORY_STORE_NAME).exists():
+            return {}
+        history_store = self.get_history_store()
+        try:
+            return history_store.change_counts()
+        finally:
+            history_store.close()
+
+    def _write_summaries(self, summaries, file_dependencies):
+        """Write the completed summaries and the dependencies to the summaries folder"""
+        summaries_dir = self.config.summaries_dir
+        self.file_summaries = {
+            file_path: summary
+            for file_path, summary in summaries.items()
+            if summary is not None
+        }
+
+        # Write all summaries to a single file; an early index may be reading
+        # the previous version meanwhile, so it is replaced in one step
+        write_text_atomic(
+            summaries_dir / "summaries.txt",
+            "".join(
+                f"Summary of {file_path}:\n{summary}\n\n{'=' * 50}\n"
+                for file_path, summary in self.file_summaries.items()
+            ),
+        )
+
+        # Write dependencies to a JSON file
+        write_text_atomic(
+            summaries_dir / "dependencies.json",
+            json.dumps(file_dependencies, indent=2),
+        )
+
+    def _rollup_cache_key(self, prompt):
+        # The prompt embeds the summaries of every child, so a directory is
+        # only summarized again when something below it changed
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"rollup:{self.llm_provider.cache_namespace}:{prompt_hash}"
+
+    def summarize_directories(self, progress=None, scheduler=None):
+        """
+        Build directory and repository summaries bottom-up from the file summaries
+        The rollups are indexed next to the file summaries, so broad questions
+        about the repository are answered from a few dense documents
+        """
+        summaries = {
+            file_path: summary
+            for file_path, summary in self.file_summaries.items()
+            if summary and not summary.startswith("Error:")
+        }
+        if not summaries:
+            return False, "No file summaries to build directory summaries from"
+
+        repo_path = self.state.current_repo_path
+        repository = self.state.current_repo_name or Path(repo_path).name
+        logger.info(f"Building directory summaries for repository: {repository}")
+        rollup_file = self.config.summaries_dir / "directory_summaries.json"
+
+        try:
+            llm = self.get_llm()
+            scheduler = scheduler or LLMScheduler.from_config(self.config)
+            summary_cache = self._get_summary_cache()
+            tree = directory_tree(summaries)
+            rollups = {}
+            reused = 0
+
+            # Every level only needs the rollups of the deeper levels before it
+            for level in rollup_levels(tree):
+                prompts = []
+                cache_keys = {}
+                for directory in level:
+                    node = tree[directory]
+                    children = [
+                        (posixpath.basename(file_path), summaries[file_path])
+                        for file_path in node["files"]
+                    ]
+                    children.extend(
+                        (f"{posixpath.basename(subdirectory)}/", rollups[subdirectory])
+                        for subdirectory in node["directories"]
+                        if subdirectory in rollups
+                    )
+                    if not children:
+                        continue
+
+                    prompt = rollup_prompt(
+                        directory,
+                        children,
+                        self.config.summary_chunk_chars,
+                        repository=repository,
+                    )
+                    cache_key = self._rollup_cache_key(prompt)
+                    rollup = summary_cache.get(cache_key)
+                    if rollup is not None:
+                        rollups[directory] = rollup
+                        reused += 1
+                        continue
+                    cache_keys[directory] = cache_key
+                    prompts.append((directory, prompt))
+
+                def on_result(directory, rollup, error):
+                    if error is not None:
+                        logger.error(
+                            f"Error summarizing directory {directory}/: {error}"
+                        )
+                        return
+                    rollups[directory] = rollup
+                    summary_cache.put(cache_keys[directory], rollup)
+                    logger.info(f"Summarized directory: {directory}/")
+
+                scheduler.run(llm, prompts, on_result)
+                if progress and prompts:
+                    progress(f"Summarized {len(rollups)}/{len(tree)} directories\n")
+
+            summary_cache.flush()
+
+            # Repository overview first, then directories top-down
+            with open(rollup_file, "w", encoding="utf-8") as file:
+                json.dump(
+                    {
+                        directory: rollups[directory]
+                        for directory in sorted(
+                            rollups, key=lambda path: (path.count("/"), path)
+                        )
+                    },
+                    file,
+                    indent=2,
+                    ensure_ascii=False,
+                )
+
+            message = (
+                f"Built {len(rollups)} directory summaries "
+                f"({reused} unchanged and reused from cache)."
+            )
+            logger.info(message)
+            return True, message
+
+        except Exception as e:
+            logger.error(f"Error building directory summaries: {e}")
+            return False, f"Error building directory summaries: {e}"
+
     def create_vector_database(self):
         """Create an enhanced vector database from repository files, summaries, and git history"""
         if not self.state.current_repo_path:
@@ -1305,7 +1353,13 @@ class GitAnalysisService:
                 folder = Path(folder_path)
                 docs = []
                 for file in folder.rglob("*"):
-                    if(file.name == "dependencies.json"): # Skip dependencies.json file
+                    if file.name in (
+                        "dependencies.json",
+                        "directory_summaries.json",
+                        "history_watermark.json",
+                    ) or file.name.startswith((HISTORY_STORE_NAME, ".")):
+                        # Skip dependency dumps, analysis bookkeeping and files
+                        # being written
                         continue
                     if file.is_file():
                         try:
@@ -1367,77 +1421,81 @@ class GitAnalysisService:
                 for file in folder.rglob("*"):
                     if file.is_file() and not is_binary_file(file):
                         try:
-                            with open(
-                                file, "r", encoding="utf-8", errors="ignore"
-                            ) as f:
-                                content = f.read()
-                                # Skip empty files or very large files
-                                if (
-                                    not content or len(content) > 100000
-                                ):  # Skip files larger than 100KB
-                                    continue
-
-                                # Enhanced metadata for code files
-                                rel_path = file.relative_to(folder)
-                                metadata = {
-                                    "file_path": str(file),
-                                    "relative_path": str(rel_path),
-                                    "source": source_label,
-                                    "filename": file.name,
-                                    "file_type": file.suffix,
-                                    "directory": str(file.parent.relative_to(folder)),
-                                }
-
-                                # Additional metadata for code files
-                                if file.suffix in [
-                                    ".py",
-                                    ".js",
-                                    ".ts",
-                                    ".jsx",
-                                    ".tsx",
-                                    ".java",
-                                    ".cpp",
-                                    ".c",
-                                ]:
-                                    # Simple heuristics to identify key elements
-                                    imports = re.findall(
-                                        r"^\s*(?:import|from|require)\s+.*$",
-                                        content,
-                                        re.MULTILINE,
-                                    )
-                                    functions = re.findall(
-                                        r"^\s*(?:def|function|const\s+\w+\s*=\s*\(.*?\)\s*=>)\s+\w+",
-                                        content,
-                                        re.MULTILINE,
-                                    )
-                                    classes = re.findall(
-                                        r"^\s*class\s+\w+", content, re.MULTILINE
-                                    )
-
-                                    metadata["imports_count"] = len(imports)
-                                    metadata["functions_count"] = len(functions)
-                                    metadata["classes_count"] = len(classes)
-                                    metadata["contains_imports"] = len(imports) > 0
-                                    metadata["contains_functions"] = len(functions) > 0
-                                    metadata["contains_classes"] = len(classes) > 0
-
-                                doc = Document(
-                                    page_content=content,
-                                    metadata=metadata,
-                                )
-                                docs.append(doc)
+                            # Reuses what the summarization step read and analyzed
+                            rel_path = file.relative_to(folder)
+                            # Git's own object and pack files are not repository content
+                            if ".git" in rel_path.parts:
+                                continue
+                            content, analysis = self._analyze_working_file(
+                                file, str(rel_path)
+                            )
+                            # Skip empty files
+                            if analysis is None:
+                                continue
+
+                            # Enhanced metadata for code files
+                            metadata = {
+                                "file_path": str(file),
+                                "relative_path": str(rel_path),
+                                "source": source_label,
+                                "filename": file.name,
+                                "file_type": file.suffix,
+                                "directory": str(file.parent.relative_to(folder)),
+                            }
+                            # Symbol counts from the shared file analysis
+                            metadata.update(vector_metadata(analysis))
+
+                            doc = Document(
+                                page_content=content,
+                                metadata=metadata,
+                            )
+                            docs.append(doc)
                         except Exception as e:
                             logger.warning(f"Skipping {file} due to error: {e}")
                 return docs
 
+            def load_rollups(rollup_file):
+                """One document per directory summary, titled with its directory"""
+                if not rollup_file.exists():
+                    return []
+                with open(rollup_file, "r", encoding="utf-8") as f:
+                    rollups = json.load(f)
+                docs = []
+                for directory, rollup in rollups.items():
+                    if directory:
+                        title = f"Summary of directory {directory}/"
+                        source_label = "directory_summary"
+                    else:
+                        title = (
+                            f"Overview of the repository {self.state.current_repo_name}"
+                        )
+                        source_label = "repository_summary"
+                    docs.append(
+                        Document(
+                            page_content=rollup,
+                            metadata={
+                                "file_path": str(rollup_file),
+                                "source": source_label,
+                                "directory": directory,
+                                "title": title,
+                            },
+                        )
+                    )
+                return docs
+
             # Load documents from different sources
             summary_docs = load_folder(self.config.summaries_dir, "summary")
             commit_diff_docs = load_folder(self.config.git_history_dir, "commit_diff")
             repo_docs = load_repo_folder(repo_path, "repo_code")
+            rollup_docs = load_rollups(
+                self.config.summaries_dir / "directory_summaries.json"
+            )
 
             # Combine documents
             all_docs = summary_docs + commit_diff_docs + repo_docs
-            logger.info(f"Loaded {len(all_docs)} documents for vector database")
+            logger.info(
+                f"Loaded {len(all_docs) + len(rollup_docs)} documents for vector database"
+            )
 
             # Enhanced splitting strategy with overlap for better context preservation
             splitter = RecursiveCharacterTextSplitter(
@@ -1448,19 +1506,36 @@ class GitAnalysisService:
             )
             split_docs = splitter.split_documents(all_docs)
 
+            # Every chunk of a rollup starts with its title, so it matches
+            # questions about that directory or the repository as a whole
+            for doc in splitter.split_documents(rollup_docs):
+                doc.page_content = f"{doc.metadata['title']}:\n{doc.page_content}"
+                split_docs.append(doc)
+
             # Setup embeddings
             embeddings = HuggingFaceEmbeddings(model_name=self.config.embedding_model)
 
             # Create FAISS vector store
             db = FAISS.from_documents(split_docs, embedding=embeddings)
 
-            # Save the database locally
-            db.save_local(str(self.config.vector_db_dir))
+            # Save the database next to the published one and swap it in,
+            # so a retrieval chain never loads a partially written index
+            vector_db_dir = self.config.vector_db_dir
+            temp_dir = vector_db_dir.with_name(f".{vector_db_dir.name}.tmp")
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            db.save_local(str(temp_dir))
+            with self._index_lock:
+                old_dir = vector_db_dir.with_name(f".{vector_db_dir.name}.old")
+                shutil.rmtree(old_dir, ignore_errors=True)
+                if vector_db_dir.exists():
+                    os.replace(vector_db_dir, old_dir)
+                os.replace(temp_dir, vector_db_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
 
             logger.info(
                 f"Vector database created and saved to {self.config.vector_db_dir}"
             )
-            self.state.mark_analysis_complete()
+            self.index_generation += 1
             return True, "Vector database created successfully"
 
         except Exception as e:
@@ -1469,7 +1544,7 @@ class GitAnalysisService:
 
     def initialize_retrieval_chain(self):
         """Initialize the enhanced retrieval chain for answering questions about the repository"""
-        if not self.state.analysis_complete:
+        if not self.state.index_ready:
             return False, "Repository analysis not complete yet"
 
         logger.info("Initializing enhanced retrieval chain")
@@ -1486,12 +1561,13 @@ class GitAnalysisService:
             # Load embeddings
             embeddings = HuggingFaceEmbeddings(model_name=self.config.embedding_model)
 
-            # Load FAISS vectorstore safely
-            db = FAISS.load_local(
-                str(self.config.vector_db_dir),
-                embeddings,
-                allow_dangerous_deserialization=True,
-            )
+            # Load FAISS vectorstore safely, never while a new one is swapped in
+            with self._index_lock:
+                db = FAISS.load_local(
+                    str(self.config.vector_db_dir),
+                    embeddings,
+                    allow_dangerous_deserialization=True,
+                )
 
             # Create base retriever with increased k for more comprehensive results
             base_retriever = db.as_retriever(search_kwargs={"k": 10, "fetch_k": 25})
@@ -1562,11 +1638,13 @@ class GitAnalysisService:
         """
 
         def workflow_generator():
+            # Every file is read and analyzed at most once per run
+            self.file_index = {}
             yield "Starting repository analysis process...\n"
             time.sleep(0.5)
 
             # Step 1: Clone the repository
-            yield "Step 1/4: Cloning repository...\n"
+            yield "Step 1/5: Cloning repository...\n"
             success, repo_path = self.clone_repository(repo_url)
             if not success:
                 yield f"Error: {repo_path}\n"
@@ -1577,7 +1655,7 @@ class GitAnalysisService:
             time.sleep(0.5)
 
             # Step 2: Analyze git history
-            yield "Step 2/4: Analyzing Git history...\n"
+            yield "Step 2/5: Analyzing Git history...\n"
             success, message = self.analyze_git_history()
             if not success:
                 yield f"Error: {message}\n"
@@ -1585,24 +1663,100 @@ class GitAnalysisService:
             yield f"{message}\n"
             time.sleep(0.5)
 
-            # Step 3: Summarize files
-            yield "Step 3/4: Summarizing repository files...\n"
-            success, message = self.summarize_repository_files()
-            if not success:
-                yield f"Error: {message}\n"
-                return
-            yield f"{message}\n"
-            time.sleep(0.5)
+            # Steps 3 to 5 run in a thread of their own, so they finish and
+            # publish the index even if the client stops reading this response
+            updates = queue.Queue()
+            threading.Thread(
+                target=self._summarize_and_index, args=(updates.put,), daemon=True
+            ).start()
+            yield from iter(updates.get, None)
+
+        return workflow_generator
+
+    def _summarize_and_index(self, progress):
+        """
+        Steps 3 to 5 of the analysis workflow, reporting through `progress`
+        and ending with a None update
+        An early index is published as soon as the most important files are
+        summarized; the analysis is complete once the final index is built
+        """
+        try:
+            # One scheduler for every stage, so they share one RPM/TPM budget
+            scheduler = LLMScheduler.from_config(self.config)
 
-            # Step 4: Create vector database
-            yield "Step 4/4: Creating vector database for retrieval...\n"
-            success, message = self.create_vector_database()
+            # Step 3: Summarize files, most important first, relaying progress
+            # while the requests run
+            progress("Step 3/5: Summarizing repository files...\n")
+            updates = queue.Queue()
+            result = {}
+            ready = object()
+
+            def summarize():
+                try:
+                    result["value"] = self.summarize_repository_files(
+                        progress=updates.put,
+                        on_ready=lambda: updates.put(ready),
+                        scheduler=scheduler,
+                    )
+                finally:
+                    updates.put(None)
+
+            threading.Thread(target=summarize, daemon=True).start()
+            for update in iter(updates.get, None):
+                if update is not ready:
+                    progress(update)
+                    continue
+                # Publish an index of the most important files now; the rest
+                # keep being summarized meanwhile
+                progress("Enough files are summarized to publish a first index...\n")
+                if self._build_index(
+                    ("Early index 1/2", "Early index 2/2"), progress, scheduler
+                ):
+                    self.state.mark_early_index_ready()
+                    progress(
+                        "Questions can be asked now; the index is updated once all "
+                        "files are summarized, even if this connection closes.\n"
+                    )
+
+            success, message = result.get(
+                "value", (False, "Summarization stopped unexpectedly")
+            )
             if not success:
-                yield f"Error: {message}\n"
+                progress(f"Error: {message}\n")
                 return
-            yield f"{message}\n"
+            progress(f"{message}\n")
             time.sleep(0.5)
 
-            yield "\nAnalysis complete! You can now ask questions about the repository."
+            if not self._build_index(("Step 4/5", "Step 5/5"), progress, scheduler):
+                return
+            self.state.mark_analysis_complete()
+            progress(
+                "\nAnalysis complete! You can now ask questions about the repository."
+            )
+        finally:
+            progress(None)
 
-        return workflow_generator
+    def _build_index(self, steps, progress, scheduler):
+        """
+        Steps 4 and 5 of the analysis workflow, with `steps` as the labels of
+        their progress lines
+        Returns: whether the vector database was created
+        """
+        # Step 4: Roll file summaries up into directory summaries
+        progress(f"{steps[0]}: Summarizing directories and the repository...\n")
+        success, message = self.summarize_directories(scheduler=scheduler)
+        # The file summaries alone still make a usable index
+        if not success:
+            message = f"Skipping directory summaries: {message}"
+        progress(f"{message}\n")
+        time.sleep(0.5)
+
+        # Step 5: Create vector database
+        progress(f"{steps[1]}: Creating vector database for retrieval...\n")
+        success, message = self.create_vector_database()
+        if not success:
+            progress(f"Error: {message}\n")
+            return False
+        progress(f"{message}\n")
+        time.sleep(0.5)
+        return True
@@ -0,0 +1,291 @@
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+
+from .symbol_index import SymbolIndex
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Graph images that can be rendered from a commit's dependencies_<hash>.json:
+# image prefix -> (dependency keys passed to the builder, graph builder name, title)
+GRAPH_IMAGES = {
+    "file_dependency": (
+        ("file_dependencies",),
+        "build_file_dependency_graph",
+        "File Dependencies",
+    ),
+    "function_dependency": (
+        ("function_dependencies", "file_dependencies"),
+        "build_function_dependency_graph",
+        "Function Call Dependencies",
+    ),
+}
+GRAPH_IMAGE_PATTERN = re.compile(
+    r"^(file_dependency|function_dependency)_([0-9a-f]+)\.png$"
+)
+
+# Process pool shared by every render request, created on first use
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = {}
+
+
+def build_file_dependency_graph(file_dependencies):
+    """Build file dependency graph from extracted dependencies"""
+    import networkx as nx
+
+    G = nx.DiGraph()
+
+    # Add nodes for all files
+    for file_path in file_dependencies:
+        # Add node with file extension as attribute
+        ext = os.path.splitext(file_path)[1].lower()
+        G.add_node(file_path, type="file", extension=ext)
+
+    # Add edges based on imports
+    for file_path, deps in file_dependencies.items():
+        for imported_file in deps["imports"]:
+            # Check if the imported file exists in our dependency map
+            if imported_file in file_dependencies:
+                G.add_edge(file_path, imported_file)
+
+                # Also update the imported_by list for cross-reference
+                if file_path not in file_dependencies[imported_file]["imported_by"]:
+                    file_dependencies[imported_file]["imported_by"].append(file_path)
+
+    return G
+
+
+def build_function_dependency_graph(
+    function_dependencies, file_dependencies=None, symbol_index=None
+):
+    """
+    Build function call graph from extracted dependencies
+    Callees are looked up in a symbol index of the whole snapshot; the files
+    each caller imports (from `file_dependencies`) break ties between files
+    defining the same name. Pass the snapshot's `symbol_index` if one is kept
+    (see DependencyState), otherwise it is built from `function_dependencies`
+    """
+    import networkx as nx
+
+    G = nx.DiGraph()
+    index = symbol_index or SymbolIndex.from_function_dependencies(
+        function_dependencies
+    )
+
+    # Add nodes for all functions
+    for file_path, func_info in function_dependencies.items():
+        for func_name in func_info["functions"]:
+            # Create unique identifier for this function
+            node_id = f"{file_path}:{func_name}"
+            G.add_node(node_id, function=func_name, file=file_path)
+
+    # Add edges based on function calls
+    for file_path, func_info in function_dependencies.items():
+        imported_files = (
+            set(file_dependencies.get(file_path, {}).get("imports", []))
+            if file_dependencies
+            else set()
+        )
+        module_files = func_info.get("module_files", {})
+        for caller, callees in func_info["function_calls"].items():
+            caller_id = f"{file_path}:{caller}"
+
+            for callee in callees:
+                # Prefers the caller's own file, then the files it imports
+                callee_file = index.resolve(callee, file_path, imported_files)
+                if callee_file is not None:
+                    G.add_edge(caller_id, f"{callee_file}:{callee}")
+                    continue
+
+                # `module.name()` only links to the module's own file
+                qualifier, _, name = callee.rpartition(".")
+                defining_files = set(index.defining_files(name))
+                callee_file = next(
+                    (
+                        candidate
+                        for candidate in module_files.get(qualifier, ())
+                        if candidate in defining_files
+                    ),
+                    None,
+                )
+                if callee_file is not None:
+                    G.add_edge(caller_id, f"{callee_file}:{name}")
+
+    return G
+
+
+def save_graph(G, output_path, title):
+    """Save a graph visualization to file"""
+    import matplotlib
+
+    # Set non-interactive backend to avoid GUI thread issues
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    plt.figure(figsize=(12, 8))
+
+    # Different layout algorithms for different graph sizes
+    if len(G.nodes) < 20:
+        pos = nx.spring_layout(G, seed=42)
+    else:
+        pos = nx.kamada_kawai_layout(G)
+
+    # Check if graph has extension attribute
+    if any("extension" in G.nodes[n] for n in G.nodes):
+        # Color nodes by file extension
+        extension_colors = {
+            ".py": "skyblue",
+            ".js": "lightgreen",
+            ".jsx": "green",
+            ".ts": "yellow",
+            ".tsx": "orange",
+            ".html": "salmon",
+            ".css": "violet",
+            ".json": "khaki",
+        }
+
+        node_colors = [
+            extension_colors.get(G.nodes[n].get("extension", ""), "lightgray")
+            for n in G.nodes
+        ]
+
+        nx.draw(
+            G,
+            pos,
+            with_labels=True,
+            labels={n: os.path.basename(n) for n in G.nodes},
+            node_color=node_colors,
+            node_size=800,
+            edge_color="gray",
+            arrows=True,
+        )
+    else:
+        # Simple graph drawing
+        nx.draw(
+            G,
+            pos,
+            with_labels=True,
+            node_color="lightblue",
+            node_size=800,
+            edge_color="gray",
+            arrows=True,
+        )
+
+    plt.title(title)
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+    return str(output_path)
+
+
+def render_graph_image(graph_dir, filename):
+    """
+    Render one graph image of a commit from its saved dependency data
+    Runs inside a render worker; returns the path of the written image
+    """
+    match = GRAPH_IMAGE_PATTERN.match(filename)
+    if not match:
+        raise ValueError(f"Not a renderable graph image: {filename}")
+
+    prefix, short_hash = match.groups()
+    dependency_keys, builder_name, title = GRAPH_IMAGES[prefix]
+    graph_dir = Path(graph_dir)
+
+    with open(
+        graph_dir / f"dependencies_{short_hash}.json", "r", encoding="utf-8"
+    ) as f:
+        dependencies = json.load(f)
+
+    graph = globals()[builder_name](*(dependencies[key] for key in dependency_keys))
+
+    # Write to a temporary name first so a half-written image is never served
+    output_path = graph_dir / filename
+    temp_path = graph_dir / f".{filename}.{os.getpid()}.tmp.png"
+    save_graph(graph, temp_path, title)
+    os.replace(temp_path, output_path)
+    return str(output_path)
+
+
+def graph_image_names(short_hash):
+    """Names of every graph image that can be rendered for a commit"""
+    return [f"{prefix}_{short_hash}.png" for prefix in GRAPH_IMAGES]
+
+
+def is_graph_image(filename):
+    return GRAPH_IMAGE_PATTERN.match(filename) is not None
+
+
+def _get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Spawned workers stay safe inside the threaded web server
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def submit_graph_render(graph_dir, filename, max_workers=2):
+    """
+    Queue rendering of one graph image in the process pool
+    Concurrent requests for the same image share a single render
+    """
+    key = str(Path(graph_dir) / filename)
+    with _executor_lock:
+        future = _in_flight.get(key)
+        if future is not None:
+            return future
+
+    executor = _get_executor(max_workers)
+    with _executor_lock:
+        future = _in_flight.get(key)
+        if future is None:
+            future = executor.submit(render_graph_image, str(graph_dir), filename)
+            _in_flight[key] = future
+            future.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return future
+
+
+def ensure_graph_image(graph_dir, filename, max_workers=2, timeout=120):
+    """Return the path of a graph image, rendering and caching it on disk if needed"""
+    output_path = Path(graph_dir) / filename
+    if output_path.exists():
+        return str(output_path)
+    return submit_graph_render(graph_dir, filename, max_workers).result(timeout)
+
+
+def prerender_recent_graphs(graphs_root, last_n, max_workers=2):
+    """Render the images of the last N analyzed commits ahead of time"""
+    if last_n <= 0 or not Path(graphs_root).exists():
+        return 0
+
+    # Graph folders are named "<commit index>_commit_<hash>_graphs"
+    graph_dirs = sorted(
+        (d for d in Path(graphs_root).iterdir() if d.is_dir()),
+        key=lambda d: int(d.name.split("_", 1)[0]) if d.name[0].isdigit() else -1,
+    )[-last_n:]
+
+    futures = []
+    for graph_dir in graph_dirs:
+        short_hash = graph_dir.name.split("_")[2]
+        for filename in graph_image_names(short_hash):
+            if not (graph_dir / filename).exists():
+                futures.append(submit_graph_render(graph_dir, filename, max_workers))
+
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.warning(f"Failed to pre-render graph: {e}")
+    return len(futures)
@@ -0,0 +1,445 @@
+import logging
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+from .diff_analysis import analyze_patches
+from .diff_store import DiffStore, compact_change_summary
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Markers wrapped around the commit header so it can be told apart from
+# the raw entries and patch lines that follow it in the same stream
+COMMIT_START = b"\x01"
+COMMIT_END = b"\x02"
+FIELD_SEPARATOR = "\x00"
+LOG_FORMAT = "%x01%H%x00%P%x00%an%x00%ae%x00%cI%x00%B%x02"
+
+# Bump whenever the ingested commit records change, so histories stored by an
+# older version are analyzed again instead of being extended
+INGEST_FORMAT_VERSION = 2
+
+# Tree entry modes of regular (non-executable and executable) files
+REGULAR_FILE_MODES = ("100644", "100755")
+
+# Attributes selecting git's built-in diff drivers, so hunk headers name the
+# enclosing function or class of each hunk
+FUNCTION_CONTEXT_ATTRIBUTES = Path(__file__).resolve().parent / (
+    "function_context.gitattributes"
+)
+
+
+def user_attributes_file(repo_path):
+    """
+    The attributes file git reads besides the repository's own: the configured
+    core.attributesFile, or $XDG_CONFIG_HOME/git/attributes. None if absent
+    """
+    configured = subprocess.run(
+        ["git", "config", "--path", "core.attributesFile"],
+        cwd=str(repo_path),
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+    if configured:
+        attributes_file = Path(configured)
+    else:
+        config_home = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+        attributes_file = Path(config_home) / "git" / "attributes"
+    return attributes_file if attributes_file.is_file() else None
+
+
+def unquote_git_path(path):
+    """Undo git's C-style quoting of paths containing special characters"""
+    if len(path) < 2 or not (path.startswith('"') and path.endswith('"')):
+        return path
+
+    escapes = {"a": b"\a", "b": b"\b", "f": b"\f", "n": b"\n", "r": b"\r"}
+    escapes.update({"t": b"\t", "v": b"\v", '"': b'"', "\\": b"\\"})
+
+    body = path[1:-1].encode("utf-8")
+    result = bytearray()
+    i = 0
+    while i < len(body):
+        char = body[i : i + 1]
+        if char == b"\\" and i + 1 < len(body):
+            next_char = body[i + 1 : i + 2].decode("ascii", errors="replace")
+            if next_char in "01234567":
+                # Octal escape for a raw byte, e.g. \303\251
+                result.append(int(body[i + 1 : i + 4], 8))
+                i += 4
+                continue
+            result += escapes.get(next_char, next_char.encode("utf-8"))
+            i += 2
+            continue
+        result += char
+        i += 1
+    return result.decode("utf-8", errors="replace")
+
+
+class GitHistoryIngester:
+    """
+    Streams commits, changed files and per-file patches out of a single
+    `git log -p --raw` process instead of forking one `git diff` per file
+    """
+
+    def __init__(
+        self,
+        repo_path,
+        revisions=None,
+        commits=None,
+        function_context=True,
+        path_filter=None,
+    ):
+        self.repo_path = str(repo_path)
+        self.revisions = list(revisions) if revisions else ["--all"]
+        # An explicit list of commit hashes is streamed in the given order instead
+        self.commits = list(commits) if commits is not None else None
+        self.function_context = function_context
+        # Optional PathFilter; its excludes are handed to git so they are never diffed
+        self.path_filter = path_filter
+        self._size_reader = None
+
+    def _attributes_file(self, scratch_dir):
+        """
+        The attributes file to run git log with. Setting core.attributesFile
+        hides the user's own attributes file, so its lines are appended to the
+        built-in drivers, where they still take precedence (e.g. custom diff
+        drivers)
+        """
+        user_attributes = user_attributes_file(self.repo_path)
+        if user_attributes is None:
+            return FUNCTION_CONTEXT_ATTRIBUTES
+        merged = Path(scratch_dir) / "attributes"
+        merged.write_bytes(
+            FUNCTION_CONTEXT_ATTRIBUTES.read_bytes()
+            + b"\n"
+            + user_attributes.read_bytes()
+        )
+        return merged
+
+    def _build_command(self, scratch_dir):
+        """Build the git log command producing the commit stream"""
+        if self.commits is not None:
+            # Read the commits from stdin and show them without walking history
+            selection = ["--no-walk=unsorted", "--stdin"]
+        else:
+            selection = ["--reverse", *self.revisions]
+
+        config = ["-c", "core.quotepath=off"]
+        if self.function_context:
+            attributes_file = self._attributes_file(scratch_dir)
+            config += ["-c", f"core.attributesFile={attributes_file}"]
+
+        pathspecs = []
+        if self.path_filter is not None:
+            config += self.path_filter.git_config()
+            pathspecs = self.path_filter.git_pathspecs()
+        if pathspecs:
+            # Keep commits that only touch filtered paths in the stream
+            selection = ["--full-history", "--sparse", *selection]
+
+        return [
+            "git",
+            *config,
+            "log",
+            "-p",
+            "--raw",
+            "--no-abbrev",
+            "--no-color",
+            "--no-ext-diff",
+            "--no-textconv",
+            # A rename is a deletion of the source plus an add of the target, so
+            # the source leaves the carried-forward dependency state and the
+            # target's patch holds its full content, like a per-file diff did
+            "--no-renames",
+            # Diff merges against their first parent, like the per-commit loop did
+            "--diff-merges=first-parent",
+            f"--format={LOG_FORMAT}",
+            *selection,
+            "--",
+            *pathspecs,
+        ]
+
+    def iter_commits(self):
+        """
+        Yield one dict per commit in chronological order
+        Each dict holds the commit metadata, the list of changed files and
+        a map of file path -> patch text, parsed incrementally from the stream
+        """
+        with (
+            tempfile.TemporaryDirectory() as scratch_dir,
+            tempfile.TemporaryFile() as stderr_file,
+        ):
+            process = subprocess.Popen(
+                self._build_command(scratch_dir),
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE if self.commits is not None else None,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+            )
+            if self.commits is not None:
+                # git reads all of stdin before it starts writing the log
+                process.stdin.write("".join(f"{c}\n" for c in self.commits).encode())
+                process.stdin.close()
+            try:
+                for commit in self._parse_stream(process.stdout):
+                    yield self._filter_commit(commit)
+            finally:
+                process.stdout.close()
+                if self._size_reader is not None:
+                    self._size_reader.close()
+                    self._size_reader = None
+                return_code = process.wait()
+
+            if return_code != 0:
+                stderr_file.seek(0)
+                error = stderr_file.read().decode("utf-8", errors="replace").strip()
+                raise RuntimeError(f"git log exited with {return_code}: {error}")
+
+    def _parse_stream(self, stream):
+        """Parse the raw byte stream of git log into commit dicts"""
+        commit = None
+        header_lines = None
+        patch_lines = None
+        patch_path = None
+        raw_index = -1
+
+        def finish_patch():
+            if commit is not None and patch_path is not None:
+                text = "\n".join(patch_lines)
+                patches = commit["patches"]
+                patches[patch_path] = (
+                    patches[patch_path] + "\n" + text if patch_path in patches else text
+                )
+
+        for raw_line in stream:
+            # A new commit header starts; flush everything for the previous one
+            if raw_line.startswith(COMMIT_START):
+                finish_patch()
+                if commit is not None:
+                    yield commit
+                commit = None
+                patch_path = None
+                patch_lines = None
+                raw_index = -1
+                header_lines = [raw_line[1:]]
+                if COMMIT_END in raw_line:
+                    commit = self._parse_header(header_lines)
+                    header_lines = None
+                continue
+
+            if header_lines is not None:
+                header_lines.append(raw_line)
+                if COMMIT_END in raw_line:
+                    commit = self._parse_header(header_lines)
+                    header_lines = None
+                continue
+
+            if commit is None:
+                continue
+
+            line = raw_line.decode("utf-8", errors="replace").rstrip("\n")
+
+            if patch_lines is None and line.startswith(":"):
+                # Raw entry: ":<old mode> <new mode> <old sha> <new sha> <status>\t<path>[\t<new path>]"
+                fields = line.split("\t")
+                paths = fields[1:]
+                if paths:
+                    file_path = unquote_git_path(paths[-1])
+                    commit["files_changed"].append(file_path)
+
+                    # Remember the new blob of regular files; deletions,
+                    # symlinks and submodules get None
+                    _, new_mode, old_sha, new_sha = fields[0][1:].split()[:4]
+                    commit["blobs"][file_path] = (
+                        new_sha if new_mode in REGULAR_FILE_MODES else None
+                    )
+                    commit["previous_blobs"][file_path] = old_sha
+                continue
+
+            if line.startswith("diff --git "):
+                finish_patch()
+                raw_index = self._match_patch_to_file(
+                    line, commit["files_changed"], raw_index
+                )
+                patch_path = (
+                    commit["files_changed"][raw_index]
+                    if 0 <= raw_index < len(commit["files_changed"])
+                    else None
+                )
+                patch_lines = [line]
+                continue
+
+            if patch_lines is not None:
+                patch_lines.append(line)
+
+        finish_patch()
+        if commit is not None:
+            yield commit
+
+    def _filter_commit(self, commit):
+        """
+        Drop the files the path filter rejects from a parsed commit
+        Paths matching patterns that could not be pushed down to git are
+        removed here, and so are files git only reported as binary because
+        they are above the size threshold. Skipped files are listed with
+        their size in `skipped_files`
+        """
+        previous_blobs = commit.pop("previous_blobs")
+        path_filter = self.path_filter
+        if path_filter is None:
+            return commit
+
+        for file_path in list(commit["files_changed"]):
+            patch = commit["patches"].get(file_path, "")
+            if not path_filter.patterns_pushed_down and path_filter.matches_pattern(
+                file_path
+            ):
+                size = None
+            elif path_filter.max_file_bytes > 0 and "\nBinary files " in patch:
+                blob_sha = commit["blobs"].get(file_path) or previous_blobs[file_path]
+                size = self._blob_size(blob_sha)
+                if not path_filter.too_large(size):
+                    continue
+            else:
+                continue
+
+            commit["files_changed"].remove(file_path)
+            commit["blobs"].pop(file_path, None)
+            commit["patches"].pop(file_path, None)
+            commit["skipped_files"][file_path] = size
+        return commit
+
+    def _blob_size(self, blob_sha):
+        if self._size_reader is None:
+            from .path_filter import BlobSizeReader
+
+            self._size_reader = BlobSizeReader(self.repo_path)
+        return self._size_reader.size(blob_sha)
+
+    @staticmethod
+    def _match_patch_to_file(header, files_changed, current_index):
+        """
+        Work out which raw entry a `diff --git` header belongs to
+        Patches come in the same order as the raw entries, but a type change
+        produces two patches for one path, so the current entry is checked first
+        """
+
+        def matches(index):
+            path = files_changed[index]
+            return header.endswith(f" b/{path}") or header.endswith(f'b/{path}"')
+
+        if 0 <= current_index < len(files_changed) and matches(current_index):
+            return current_index
+        for index in range(current_index + 1, len(files_changed)):
+            if matches(index):
+                return index
+        return current_index + 1
+
+    @staticmethod
+    def _parse_header(header_lines):
+        """Parse the commit header emitted by LOG_FORMAT"""
+        header = b"".join(header_lines)
+        header = header[: header.index(COMMIT_END)]
+        fields = header.decode("utf-8", errors="replace").split(FIELD_SEPARATOR, 5)
+        commit_hash, parents, author_name, author_email, commit_time, message = fields
+        return {
+            "commit_hash": commit_hash,
+            "parents": parents.split(),
+            "author": f"{author_name} <{author_email}>",
+            "commit_time": commit_time,
+            "commit_message": message.strip(),
+            "files_changed": [],
+            "blobs": {},
+            "previous_blobs": {},
+            "patches": {},
+            "skipped_files": {},
+        }
+
+
+def read_ref_tips(repo_path):
+    """Return a map of ref name -> commit hash for HEAD and every ref under refs/"""
+    output = subprocess.run(
+        ["git", "show-ref", "--head"],
+        cwd=str(repo_path),
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    ref_tips = {}
+    for line in output.splitlines():
+        commit_hash, _, ref_name = line.partition(" ")
+        if ref_name:
+            ref_tips[ref_name] = commit_hash
+    return ref_tips
+
+
+def filter_existing_objects(repo_path, object_hashes):
+    """Return the subset of object hashes that still exist in the repository"""
+    object_hashes = list(dict.fromkeys(object_hashes))
+    if not object_hashes:
+        return []
+
+    output = subprocess.run(
+        ["git", "cat-file", "--batch-check"],
+        cwd=str(repo_path),
+        input="\n".join(object_hashes) + "\n",
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    # Missing objects are reported as "<hash> missing"
+    return [
+        line.split()[0]
+        for line in output.splitlines()
+        if line and not line.endswith(" missing")
+    ]
+
+
+def list_commits(repo_path, revisions=None):
+    """List commit hashes in the same chronological order GitHistoryIngester uses"""
+    output = subprocess.run(
+        ["git", "rev-list", "--reverse", *(revisions or ["--all"]), "--"],
+        cwd=str(repo_path),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return output.split()
+
+
+def summarize_commit_changes(commit, diff_store=None):
+    """
+    Replace the raw patches of an ingested commit with per-file change summaries
+    With a diff store, the patch bodies are moved there and the summaries only
+    keep a reference and a short preview of the added and removed lines
+    """
+    patches = commit.pop("patches")
+    summaries = analyze_patches(patches, commit["files_changed"])
+    if diff_store is not None:
+        for file_path, summary in summaries.items():
+            compact_change_summary(summary, patches.get(file_path, ""), diff_store)
+    commit["change_summaries"] = summaries
+    return commit
+
+
+def summarize_commits(commits, diff_store=None):
+    """Summarize a stream of ingested commits one at a time as they arrive"""
+    for commit in commits:
+        yield summarize_commit_changes(commit, diff_store)
+
+
+def analyze_commit_shard(
+    repo_path, commit_hashes, diff_store_root=None, path_filter=None
+):
+    """
+    Ingest and analyze one contiguous shard of commits
+    Runs in a worker process, so it only returns plain picklable data
+    """
+    ingester = GitHistoryIngester(
+        repo_path, commits=commit_hashes, path_filter=path_filter
+    )
+    diff_store = DiffStore(diff_store_root) if diff_store_root else None
+    return list(summarize_commits(ingester.iter_commits(), diff_store))
@@ -0,0 +1,98 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def record_sort_key(file_path, record):
+    """Order records by file, then chronologically like the per-file output"""
+    return (file_path, record["commit_time"], record["commit_history_index"])
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process and of its finished children
+    (e.g. shard workers) in MB, or None where the platform cannot report it
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return own / 1024 / 1024, children / 1024 / 1024
+
+
+class FileRecordSpill:
+    """
+    Collects per-file commit records while holding at most `max_records` of
+    them in memory. Whenever the buffer is full it is sorted and written to an
+    append-only JSONL segment; `iter_files` k-way merges the segments so every
+    file's records come out together and in chronological order.
+    """
+
+    def __init__(self, spill_root, max_records=50000):
+        self.max_records = max(1, max_records)
+        self.spill_dir = tempfile.mkdtemp(prefix="history_spill_", dir=spill_root)
+        self.segment_paths = []
+        self.record_count = 0
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+    def add(self, file_path, record):
+        self._buffer.append((file_path, record))
+        self.record_count += 1
+        if len(self._buffer) >= self.max_records:
+            self._spill()
+
+    def _spill(self):
+        """Write the sorted buffer to a new segment file"""
+        self._buffer.sort(key=lambda item: record_sort_key(*item))
+        segment_path = os.path.join(
+            self.spill_dir, f"segment_{len(self.segment_paths):05d}.jsonl"
+        )
+        with open(segment_path, "w", encoding="utf-8") as f:
+            for file_path, record in self._buffer:
+                f.write(json.dumps([file_path, record], ensure_ascii=False))
+                f.write("\n")
+        self.segment_paths.append(segment_path)
+        self._buffer = []
+        logger.debug(f"Spilled history records to {segment_path}")
+
+    @staticmethod
+    def _read_segment(segment_path):
+        with open(segment_path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield tuple(json.loads(line))
+
+    def iter_files(self):
+        """Yield (file_path, records) for every file, merging all spilled segments"""
+        self._buffer.sort(key=lambda item: record_sort_key(*item))
+        streams = [self._read_segment(path) for path in self.segment_paths]
+        streams.append(iter(self._buffer))
+
+        merged = heapq.merge(*streams, key=lambda item: record_sort_key(*item))
+        for file_path, items in itertools.groupby(merged, key=lambda item: item[0]):
+            yield file_path, [record for _, record in items]
+
+    def cleanup(self):
+        """Delete the segment files"""
+        self._buffer = []
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -0,0 +1,336 @@
+import json
+import logging
+import sqlite3
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# File name of the store inside the git history output directory
+HISTORY_STORE_NAME = "history_store.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS commits (
+    hash TEXT PRIMARY KEY,
+    history_index INTEGER NOT NULL,
+    commit_time TEXT NOT NULL,
+    author TEXT NOT NULL,
+    message TEXT NOT NULL,
+    parents TEXT NOT NULL,
+    graph_path TEXT
+);
+CREATE INDEX IF NOT EXISTS commits_history_index ON commits (history_index);
+CREATE INDEX IF NOT EXISTS commits_time ON commits (commit_time);
+CREATE INDEX IF NOT EXISTS commits_author ON commits (author);
+CREATE TABLE IF NOT EXISTS commit_files (
+    commit_hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (commit_hash, position)
+);
+CREATE INDEX IF NOT EXISTS commit_files_path ON commit_files (path);
+CREATE TABLE IF NOT EXISTS file_changes (
+    path TEXT NOT NULL,
+    commit_hash TEXT NOT NULL,
+    history_index INTEGER NOT NULL,
+    commit_time TEXT NOT NULL,
+    change_type TEXT,
+    lines_added INTEGER,
+    lines_removed INTEGER,
+    change_summary TEXT NOT NULL,
+    PRIMARY KEY (path, commit_hash)
+);
+CREATE INDEX IF NOT EXISTS file_changes_path_time ON file_changes (path, commit_time);
+CREATE INDEX IF NOT EXISTS file_changes_commit ON file_changes (commit_hash);
+CREATE TABLE IF NOT EXISTS symbol_changes (
+    symbol TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    commit_hash TEXT NOT NULL,
+    history_index INTEGER NOT NULL,
+    lines_added INTEGER NOT NULL,
+    lines_removed INTEGER NOT NULL,
+    PRIMARY KEY (symbol, path, commit_hash, kind)
+);
+CREATE INDEX IF NOT EXISTS symbol_changes_commit ON symbol_changes (commit_hash);
+"""
+
+
+class HistoryStore:
+    """
+    Embedded SQLite store of the analyzed commit history: commits, the files
+    each commit touched and the change summary of every (file, commit) pair.
+    Queries by hash, time, author or path only read the rows they need.
+    """
+
+    # Number of commits buffered before the transaction is committed
+    COMMIT_INTERVAL = 500
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._pending_commits = 0
+        self._connection = sqlite3.connect(self.db_path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def clear(self):
+        """Remove every stored commit, e.g. before a full re-analysis"""
+        for table in (
+            "metadata",
+            "commits",
+            "commit_files",
+            "file_changes",
+            "symbol_changes",
+        ):
+            self._connection.execute(f"DELETE FROM {table}")
+        self._connection.commit()
+
+    def set_metadata(self, key, value):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
+
+    def get_metadata(self, key, default=None):
+        row = self._connection.execute(
+            "SELECT value FROM metadata WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def add_commit(self, commit_info, history_index, parents=()):
+        """Store one commit and the list of files it changed"""
+        commit_hash = commit_info["commit_hash"]
+        self._connection.execute(
+            "INSERT OR REPLACE INTO commits "
+            "(hash, history_index, commit_time, author, message, parents, graph_path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                commit_hash,
+                history_index,
+                commit_info["commit_time"],
+                commit_info["author"],
+                commit_info["commit_message"],
+                " ".join(parents),
+                commit_info.get("graph_path"),
+            ),
+        )
+        self._connection.execute(
+            "DELETE FROM commit_files WHERE commit_hash = ?", (commit_hash,)
+        )
+        self._connection.executemany(
+            "INSERT INTO commit_files (commit_hash, position, path) VALUES (?, ?, ?)",
+            [
+                (commit_hash, position, path)
+                for position, path in enumerate(commit_info["files_changed"])
+            ],
+        )
+
+        self._pending_commits += 1
+        if self._pending_commits >= self.COMMIT_INTERVAL:
+            self.flush()
+
+    def add_file_change(self, record):
+        """Store the change summary of one file in one commit and index its symbols"""
+        summary = record["change_summary"]
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO symbol_changes "
+            "(symbol, kind, path, commit_hash, history_index, lines_added, lines_removed) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    change["symbol"],
+                    change["kind"],
+                    record["file_name_modified"],
+                    record["commit_hash"],
+                    record["commit_history_index"],
+                    change["lines_added"],
+                    change["lines_removed"],
+                )
+                for change in summary.get("symbols_changed", [])
+            ],
+        )
+        self._connection.execute(
+            "INSERT OR REPLACE INTO file_changes "
+            "(path, commit_hash, history_index, commit_time, change_type, "
+            "lines_added, lines_removed, change_summary) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                record["file_name_modified"],
+                record["commit_hash"],
+                record["commit_history_index"],
+                record["commit_time"],
+                summary.get("change_type"),
+                summary.get("lines_added"),
+                summary.get("lines_removed"),
+                json.dumps(summary, ensure_ascii=False),
+            ),
+        )
+
+    def commit_count(self):
+        return self._connection.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
+
+    def _commit_rows_to_dicts(self, rows):
+        for commit_hash, commit_time, author, message, graph_path in rows:
+            files_changed = [
+                path
+                for (path,) in self._connection.execute(
+                    "SELECT path FROM commit_files WHERE commit_hash = ? ORDER BY position",
+                    (commit_hash,),
+                )
+            ]
+            yield {
+                "commit_hash": commit_hash,
+                "commit_time": commit_time,
+                "author": author,
+                "commit_message": message,
+                "files_changed": files_changed,
+                "graph_path": graph_path,
+            }
+
+    def _query_commits(self, where="", params=()):
+        rows = self._connection.execute(
+            "SELECT hash, commit_time, author, message, graph_path FROM commits "
+            f"{where} ORDER BY history_index",
+            params,
+        ).fetchall()
+        return list(self._commit_rows_to_dicts(rows))
+
+    def iter_commits(self, batch_size=1000):
+        """Yield every commit in chronological order without loading them all at once"""
+        last_index = -1
+        while True:
+            rows = self._connection.execute(
+                "SELECT hash, commit_time, author, message, graph_path, history_index "
+                "FROM commits WHERE history_index > ? ORDER BY history_index LIMIT ?",
+                (last_index, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            last_index = rows[-1][-1]
+            yield from self._commit_rows_to_dicts(row[:-1] for row in rows)
+
+    def get_commit(self, commit_hash):
+        commits = self._query_commits("WHERE hash = ?", (commit_hash,))
+        return commits[0] if commits else None
+
+    def commits_by_author(self, author):
+        return self._query_commits("WHERE author = ?", (author,))
+
+    def commits_between(self, start_time, end_time):
+        """Commits with start_time <= commit_time <= end_time (ISO 8601 strings)"""
+        return self._query_commits(
+            "WHERE commit_time BETWEEN ? AND ?", (start_time, end_time)
+        )
+
+    def commits_touching(self, file_path):
+        return self._query_commits(
+            "WHERE hash IN (SELECT commit_hash FROM commit_files WHERE path = ?)",
+            (file_path,),
+        )
+
+    def file_paths(self):
+        """Every path that has at least one recorded change"""
+        return [
+            path
+            for (path,) in self._connection.execute(
+                "SELECT DISTINCT path FROM file_changes ORDER BY path"
+            )
+        ]
+
+    def change_counts(self):
+        """Number of recorded changes (commit churn) of every path"""
+        return dict(
+            self._connection.execute(
+                "SELECT path, COUNT(*) FROM file_changes GROUP BY path"
+            )
+        )
+
+    def load_file_history(self, file_path):
+        """
+        Return the change records of one file in chronological order, shaped
+        like the entries of its commit_history.json (without the evolution data)
+        """
+        rows = self._connection.execute(
+            "SELECT c.commit_time, c.hash, c.message, c.author, f.history_index, "
+            "f.change_summary FROM file_changes f JOIN commits c ON c.hash = f.commit_hash "
+            "WHERE f.path = ? ORDER BY f.commit_time, f.history_index",
+            (file_path,),
+        ).fetchall()
+        return [
+            {
+                "commit_time": commit_time,
+                "commit_hash": commit_hash,
+                "commit_message": message,
+                "author": author,
+                "file_name_modified": file_path,
+                "commit_history_index": history_index,
+                "change_summary": json.loads(change_summary),
+            }
+            for commit_time, commit_hash, message, author, history_index, change_summary in rows
+        ]
+
+    def symbol_history(self, symbol, file_path=None):
+        """
+        Return every recorded change to a function or class in chronological
+        order, optionally limited to one file, straight from the symbol index
+        """
+        query = (
+            "SELECT s.path, s.kind, s.commit_hash, c.commit_time, c.author, c.message, "
+            "s.lines_added, s.lines_removed FROM symbol_changes s "
+            "JOIN commits c ON c.hash = s.commit_hash WHERE s.symbol = ?"
+        )
+        params = [symbol]
+        if file_path is not None:
+            query += " AND s.path = ?"
+            params.append(file_path)
+        rows = self._connection.execute(
+            query + " ORDER BY s.history_index", params
+        ).fetchall()
+        return [
+            {
+                "file_path": path,
+                "kind": kind,
+                "commit_hash": commit_hash,
+                "commit_time": commit_time,
+                "author": author,
+                "commit_message": message,
+                "lines_added": lines_added,
+                "lines_removed": lines_removed,
+            }
+            for path, kind, commit_hash, commit_time, author, message, lines_added, lines_removed in rows
+        ]
+
+    def export_repo_history(self, json_path, repo_name):
+        """Write the legacy repo_history.json document from the store"""
+        commits = list(self.iter_commits())
+        repo_info = {
+            "repo_name": repo_name,
+            "commit_count": len(commits),
+            "first_commit_date": commits[0]["commit_time"] if commits else None,
+            "last_commit_date": commits[-1]["commit_time"] if commits else None,
+            "commits": commits,
+            "commit_file_map": {
+                commit["commit_hash"]: commit["files_changed"] for commit in commits
+            },
+        }
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(repo_info, f, indent=2, ensure_ascii=False)
+
+    def flush(self):
+        self._connection.commit()
+        self._pending_commits = 0
+
+    def close(self):
+        self.flush()
+        self._connection.close()
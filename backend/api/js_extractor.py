@@ -0,0 +1,476 @@
+import re
+
+# One token at a time: whitespace, comments, quoted strings, names, numbers and
+# punctuation. Strings stop at the end of the line, so stray quotes in JSX text
+# can not swallow the rest of the file
+TOKEN_PATTERN = re.compile(
+    r"(?P<space>\s+)"
+    r"|(?P<comment>//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))"
+    r"|(?P<string>'(?:\\.|[^'\\\n])*'?|\"(?:\\.|[^\"\\\n])*\"?)"
+    r"|(?P<name>[A-Za-z_$][\w$]*)"
+    r"|(?P<number>\.?\d[\w.]*)"
+    r"|(?P<punct>=>|\?\.|\.\.\.|[^\s\w$'\"`])"
+)
+REGEX_LITERAL_PATTERN = re.compile(
+    r"/(?![*/])(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/[A-Za-z]*"
+)
+# Template literal text up to the closing backtick or the next "${"
+TEMPLATE_CHUNK_PATTERN = re.compile(r"(?:\\[\s\S]|[^`\\$]|\$(?!\{))*")
+
+# Keywords after which a "/" starts a regular expression instead of a division
+REGEX_PREFIX_KEYWORDS = frozenset(
+    (
+        "return",
+        "typeof",
+        "case",
+        "do",
+        "else",
+        "in",
+        "of",
+        "new",
+        "delete",
+        "void",
+        "throw",
+        "instanceof",
+        "yield",
+        "await",
+    )
+)
+# Names followed by "(" that are neither calls nor method definitions
+NON_CALL_KEYWORDS = frozenset(
+    (
+        "if",
+        "for",
+        "while",
+        "switch",
+        "catch",
+        "with",
+        "function",
+        "return",
+        "typeof",
+        "new",
+        "await",
+        "yield",
+        "super",
+        "import",
+        "void",
+        "delete",
+        "in",
+        "of",
+        "instanceof",
+        "case",
+        "throw",
+        "do",
+        "else",
+    )
+)
+# Keywords that start a new statement, ending an arrow function's expression body
+STATEMENT_KEYWORDS = frozenset(
+    (
+        "const",
+        "let",
+        "var",
+        "function",
+        "class",
+        "export",
+        "import",
+        "return",
+        "if",
+        "for",
+        "while",
+        "switch",
+        "try",
+        "throw",
+    )
+)
+OPENING_BRACKETS = {"(": ")", "[": "]", "{": "}"}
+# Type annotations are skipped over at most this many tokens
+MAX_ANNOTATION_TOKENS = 64
+
+
+def tokenize(content):
+    """
+    Split JavaScript/TypeScript source into (kind, text, start, newline_before)
+    tuples in one pass. Comments and whitespace are dropped; template literals
+    yield one "string" token followed by the tokens of their ${} expressions
+    """
+    tokens = []
+    position = 0
+    length = len(content)
+    newline_before = False
+    previous = None
+    # Brace depth of every template literal waiting for its "${...}" to close
+    template_stack = []
+    brace_depth = 0
+
+    def scan_template(position):
+        # Continue a template literal at `position` up to its end or next "${"
+        position = TEMPLATE_CHUNK_PATTERN.match(content, position).end()
+        if content.startswith("${", position):
+            template_stack.append(brace_depth)
+            return position + 2
+        return min(position + 1, length)
+
+    while position < length:
+        char = content[position]
+        if char == "`":
+            tokens.append(("string", "`", position, newline_before))
+            previous = tokens[-1]
+            newline_before = False
+            position = scan_template(position + 1)
+            continue
+
+        if char == "}" and template_stack and template_stack[-1] == brace_depth:
+            template_stack.pop()
+            position = scan_template(position + 1)
+            continue
+
+        if char == "/" and not content.startswith(("//", "/*"), position):
+            regex_allowed = (
+                previous is None
+                or (previous[0] == "punct" and previous[1] not in (")", "]", "}", "<"))
+                or (previous[0] == "name" and previous[1] in REGEX_PREFIX_KEYWORDS)
+            )
+            if regex_allowed:
+                match = REGEX_LITERAL_PATTERN.match(content, position)
+                if match is not None:
+                    tokens.append(("string", match.group(), position, newline_before))
+                    previous = tokens[-1]
+                    newline_before = False
+                    position = match.end()
+                    continue
+
+        match = TOKEN_PATTERN.match(content, position)
+        kind = match.lastgroup
+        text = match.group()
+        if kind == "space":
+            newline_before = newline_before or "\n" in text
+        elif kind != "comment":
+            if text == "{":
+                brace_depth += 1
+            elif text == "}":
+                brace_depth -= 1
+            tokens.append((kind, text, position, newline_before))
+            previous = tokens[-1]
+            newline_before = False
+        position = match.end()
+    return tokens
+
+
+def _match_brackets(tokens):
+    """Map the index of every bracket token to the index of its partner"""
+    partners = {}
+    stack = []
+    for index, (kind, text, _, _) in enumerate(tokens):
+        if kind != "punct":
+            continue
+        if text in OPENING_BRACKETS:
+            stack.append(index)
+        elif text in (")", "]", "}"):
+            # Skip unbalanced closers, e.g. from an unterminated JSX string
+            while stack and OPENING_BRACKETS[tokens[stack[-1]][1]] != text:
+                stack.pop()
+            if stack:
+                opener = stack.pop()
+                partners[opener] = index
+                partners[index] = opener
+    return partners
+
+
+class _Extractor:
+    """Finds function definitions, their token spans and the calls inside them"""
+
+    def __init__(self, content):
+        self.tokens = tokenize(content)
+        self.partners = _match_brackets(self.tokens)
+
+    def text(self, index):
+        return self.tokens[index][1] if 0 <= index < len(self.tokens) else None
+
+    def is_name(self, index):
+        return 0 <= index < len(self.tokens) and self.tokens[index][0] == "name"
+
+    def skip_annotation(self, index, stop):
+        """Skip a TypeScript annotation starting at `index` up to a token in `stop`"""
+        limit = min(len(self.tokens), index + MAX_ANNOTATION_TOKENS)
+        while index < limit:
+            text = self.text(index)
+            if text in stop:
+                return index
+            if text in (";", "=>", "}", ")", "]"):
+                return None
+            if text in ("(", "[") or (text == "{" and "{" not in stop):
+                index = self.partners.get(index, index)
+            index += 1
+        return None
+
+    def expression_end(self, index):
+        """Last token index of an arrow function's expression body starting at `index`"""
+        last = index
+        while index < len(self.tokens):
+            kind, text, _, newline_before = self.tokens[index]
+            if text in (";", ",", ")", "]", "}") and kind == "punct":
+                break
+            if index > last and newline_before and text in STATEMENT_KEYWORDS:
+                break
+            last = index
+            if kind == "punct" and text in OPENING_BRACKETS:
+                index = self.partners.get(index, index)
+                last = index
+            index += 1
+        return last
+
+    def function_value(self, index):
+        """
+        If a function expression or arrow function starts at `index`, return the
+        (start, end) token span of its body, otherwise None
+        """
+        if self.text(index) == "async":
+            index += 1
+        text = self.text(index)
+        if text == "function":
+            return self.function_body(index)
+
+        if text == "(" and index in self.partners:
+            arrow = self.partners[index] + 1
+        elif self.is_name(index) and self.text(index + 1) == "=>":
+            arrow = index + 1
+        else:
+            return None
+        if self.text(arrow) == ":":
+            arrow = self.skip_annotation(arrow + 1, ("=>",))
+        if arrow is None or self.text(arrow) != "=>":
+            return None
+
+        body = arrow + 1
+        if self.text(body) == "{" and body in self.partners:
+            return body, self.partners[body]
+        if body < len(self.tokens):
+            return body, self.expression_end(body)
+        return None
+
+    def function_body(self, index):
+        """Body span of a `function` keyword at `index`"""
+        params = index + 1
+        if self.text(params) == "*":
+            params += 1
+        if self.is_name(params):
+            params += 1
+        if self.text(params) != "(" or params not in self.partners:
+            return None
+        body = self.partners[params] + 1
+        if self.text(body) == ":":
+            body = self.skip_annotation(body + 1, ("{",))
+        if body is None or self.text(body) != "{" or body not in self.partners:
+            return None
+        return body, self.partners[body]
+
+    def extract(self):
+        tokens = self.tokens
+        functions = []
+        classes = []
+        spans = []
+        imports = {}
+        namespaces = set()
+        raw_calls = []
+        # Spans that start at a token index: (name, kind, end index)
+        starts = {}
+        open_spans = []
+
+        def define(name, kind, span):
+            if span is None:
+                return
+            start, end = span
+            starts.setdefault(start, []).append((name, kind, end))
+
+        for index, (kind, text, _, _) in enumerate(tokens):
+            for name, span_kind, end in starts.pop(index, ()):
+                open_spans.append((name, span_kind, end))
+                if span_kind == "function":
+                    spans.append([name, tokens[index][2], tokens[end][2] + 1])
+            # Spans are nested, so ended spans are always on top of the stack
+            while open_spans and open_spans[-1][2] < index:
+                open_spans.pop()
+
+            if kind != "name":
+                continue
+            previous = self.text(index - 1)
+            following = self.text(index + 1)
+            class_name = next(
+                (
+                    name
+                    for name, span_kind, _ in reversed(open_spans)
+                    if span_kind == "class"
+                ),
+                None,
+            )
+            in_class_body = bool(open_spans) and open_spans[-1][1] == "class"
+
+            if text == "class" and previous != ".":
+                name_index = index + 1 if self.is_name(index + 1) else None
+                if name_index is None and previous == "=" and self.is_name(index - 2):
+                    name_index = index - 2
+                body = index + 1
+                while body < len(tokens) and self.text(body) not in ("{", ";"):
+                    body += 1
+                if name_index is not None and body in self.partners:
+                    qualified = self.text(name_index)
+                    if class_name is not None:
+                        qualified = f"{class_name}.{qualified}"
+                    classes.append(qualified)
+                    define(qualified, "class", (body, self.partners[body]))
+                continue
+
+            if text == "function" and previous != ".":
+                if self.is_name(index + 1) or self.text(index + 1) == "*":
+                    name_index = index + 1 if self.is_name(index + 1) else index + 2
+                else:
+                    name_index = None
+                # Expressions assigned to a name take that name
+                assigned = index - 2 if previous == "async" else index - 1
+                if self.text(assigned) in ("=", ":") and self.is_name(assigned - 1):
+                    name_index = assigned - 1
+                if name_index is not None and self.is_name(name_index):
+                    name = self.text(name_index)
+                    functions.append(name)
+                    define(name, "function", self.function_body(index))
+                continue
+
+            if text == "import" and following != "(" and previous != ".":
+                self.read_import(index + 1, imports, namespaces)
+                continue
+
+            if text in ("const", "let", "var") and self.is_name(index + 1):
+                value = index + 2
+                if self.text(value) == ":":
+                    value = self.skip_annotation(value + 1, ("=",))
+                if value is not None and self.text(value) == "=":
+                    if self.text(value + 1) == "require":
+                        namespaces.add(self.text(index + 1))
+                    if "function" in (self.text(value + 1), self.text(value + 2)):
+                        continue  # Named by the `function` branch
+                    span = self.function_value(value + 1)
+                    if span is not None:
+                        name = self.text(index + 1)
+                        functions.append(name)
+                        define(name, "function", span)
+                continue
+
+            if following in ("=", ":") and previous not in (
+                ".",
+                "const",
+                "let",
+                "var",
+                "?",
+            ):
+                # Assignments, object properties and class fields holding a function
+                if "function" in (self.text(index + 2), self.text(index + 3)):
+                    continue  # Named by the `function` branch
+                span = self.function_value(index + 2)
+                if span is not None:
+                    name = f"{class_name}.{text}" if in_class_body else text
+                    functions.append(name)
+                    define(name, "function", span)
+                continue
+
+            if (
+                following != "("
+                or text in NON_CALL_KEYWORDS
+                or previous in ("function", "*")
+            ):
+                continue
+            close = self.partners.get(index + 1)
+            if (
+                close is not None
+                and self.text(close + 1) == "{"
+                and previous not in (".", "?.")
+            ):
+                # Method shorthand: name(params) { ... }
+                name = f"{class_name}.{text}" if in_class_body else text
+                functions.append(name)
+                define(name, "function", (close + 1, self.partners.get(close + 1)))
+                continue
+
+            caller = next(
+                (
+                    name
+                    for name, span_kind, _ in reversed(open_spans)
+                    if span_kind == "function"
+                ),
+                None,
+            )
+            if caller is None:
+                continue
+            if previous in (".", "?."):
+                owner = self.text(index - 2)
+                if owner == "this" and class_name is not None:
+                    raw_calls.append((caller, f"{class_name}.{text}"))
+                elif owner in namespaces:
+                    raw_calls.append((caller, text))
+            else:
+                raw_calls.append((caller, imports.get(text, text)))
+
+        functions = list(dict.fromkeys(functions))
+        function_calls, called_by = _resolve_calls(
+            functions, set(imports.values()), raw_calls
+        )
+        return {
+            "functions": functions,
+            "classes": classes,
+            "spans": spans,
+            "function_calls": function_calls,
+            "called_by": called_by,
+        }
+
+    def read_import(self, index, imports, namespaces):
+        """Record the names bound by an import declaration starting at `index`"""
+        limit = min(len(self.tokens), index + MAX_ANNOTATION_TOKENS)
+        in_braces = False
+        while index < limit:
+            text = self.text(index)
+            if text in ("from", ";") or self.tokens[index][0] == "string":
+                return
+            if text == "{":
+                in_braces = True
+            elif text == "}":
+                in_braces = False
+            elif text == "*" and self.text(index + 1) == "as":
+                namespaces.add(self.text(index + 2))
+                index += 2
+            elif self.is_name(index) and text != "type":
+                if self.text(index + 1) == "as" and self.is_name(index + 2):
+                    imports[self.text(index + 2)] = text
+                    index += 2
+                elif in_braces:
+                    imports[text] = text
+                else:
+                    # Default import
+                    namespaces.add(text)
+                    imports[text] = text
+            index += 1
+
+
+def _resolve_calls(functions, imported_names, raw_calls):
+    """Keep calls to functions of this file or imported names, without duplicates"""
+    known = set(functions) | imported_names
+    function_calls = {}
+    called_by = {}
+    for caller, callee in raw_calls:
+        if callee == caller or callee not in known:
+            continue
+        callees = function_calls.setdefault(caller, [])
+        if callee not in callees:
+            callees.append(callee)
+            called_by.setdefault(callee, []).append(caller)
+    return function_calls, called_by
+
+
+def extract_js_module(content):
+    """
+    Extract the functions, classes and call edges of a JavaScript/TypeScript
+    file in a single pass over its tokens. Every function definition (function
+    declarations and expressions, arrow functions, object and class methods)
+    gets its character span, and each call is attributed to the innermost
+    function enclosing it. Methods are named "Class.method"
+    """
+    return _Extractor(content).extract()
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("google", "fake", "record", "replay")
+
+# Paths of the files of a batched summary prompt, see summary_prompts.BATCH_FILE_SECTION
+BATCH_FILE_PATTERN = re.compile(r"^\s*----- File path: (.+?) -----$", re.MULTILINE)
+
+
+def prompt_key(model, temperature, messages, stop=None):
+    """Identity of one chat request, under which its reply is recorded"""
+    payload = json.dumps(
+        [
+            model,
+            temperature,
+            [[message.type, message.content] for message in messages],
+            stop,
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _chat_result(text):
+    return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+def fake_reply(prompt):
+    """
+    Deterministic stand-in for a model reply. Yes/no questions are answered
+    YES and batched summary prompts get the JSON object they ask for, so the
+    workflow takes the same paths it takes with a real model
+    """
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+    if "Answer only YES or NO" in prompt:
+        return "YES"
+    file_paths = BATCH_FILE_PATTERN.findall(prompt)
+    if file_paths and "Respond with a single JSON object" in prompt:
+        return json.dumps(
+            {
+                file_path: f"Fake summary {digest} of {file_path}"
+                for file_path in file_paths
+            }
+        )
+    return f"Fake response {digest} to a {len(prompt)} character prompt"
+
+
+class ResponseRecording:
+    """
+    Replies of chat requests by prompt key, kept in a JSON Lines file that
+    grows by one line per recorded request, so an interrupted run still
+    leaves everything it recorded so far
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    def get(self, key):
+        """The recorded {"reply", "latency"} of a prompt key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, key, reply, latency):
+        entry = {"key": key, "reply": reply, "latency": latency}
+        with self._lock:
+            self._entries[key] = entry
+            self.recorded += 1
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline chat model answering with fake_reply after `latency` seconds"""
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return _chat_result(fake_reply(messages[-1].content))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _chat_result(fake_reply(messages[-1].content))
+
+
+class RecordingChatModel(BaseChatModel):
+    """Forwards every request to `inner` and records its reply and latency"""
+
+    inner: BaseChatModel
+    recording: Any
+    model: str
+    temperature: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "recording"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        reply = self.inner.invoke(messages, stop=stop, **kwargs)
+        self._record(messages, stop, reply.content, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        reply = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        self._record(messages, stop, reply.content, time.perf_counter() - start)
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _record(self, messages, stop, reply, latency):
+        key = prompt_key(self.model, self.temperature, messages, stop)
+        self.recording.put(key, reply, round(latency, 3))
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Answers with the replies recorded for the same requests, after their
+    recorded latency or a fixed `latency`; unrecorded requests fail
+    """
+
+    recording: Any
+    model: str
+    temperature: float = 0.0
+    latency: Optional[float] = None
+
+    @property
+    def _llm_type(self):
+        return "replay"
+
+    def _lookup(self, messages, stop):
+        key = prompt_key(self.model, self.temperature, messages, stop)
+        entry = self.recording.get(key)
+        if entry is None:
+            raise LookupError(
+                f"No recorded response for request {key[:12]} in "
+                f"{self.recording.path}; record it with LLM_PROVIDER=record"
+            )
+        latency = entry["latency"] if self.latency is None else self.latency
+        return entry["reply"], latency
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply, latency = self._lookup(messages, stop)
+        time.sleep(latency)
+        return _chat_result(reply)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        reply, latency = self._lookup(messages, stop)
+        await asyncio.sleep(latency)
+        return _chat_result(reply)
+
+
+class LLMProvider:
+    """
+    Creates the chat models of every pipeline stage from one backend:
+    "google" (Gemini), "fake" (deterministic offline replies), "record"
+    (Gemini, recording every reply) or "replay" (recorded replies only)
+    """
+
+    def __init__(
+        self,
+        name="google",
+        model="models/gemini-1.5-flash",
+        api_key=None,
+        recording_file=None,
+        fake_latency=0.0,
+        replay_latency=None,
+    ):
+        if name not in PROVIDERS:
+            raise ValueError(
+                f"Unknown LLM provider {name!r}, expected one of {', '.join(PROVIDERS)}"
+            )
+        self.name = name
+        self.model = model
+        self.api_key = api_key
+        self.fake_latency = fake_latency
+        self.replay_latency = replay_latency
+        self.recording = (
+            ResponseRecording(recording_file) if name in ("record", "replay") else None
+        )
+        if name == "replay":
+            logger.info(
+                f"Replaying {len(self.recording)} recorded responses from {recording_file}"
+            )
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            name=config.llm_provider,
+            model=config.llm_model,
+            api_key=config.api_key,
+            recording_file=config.llm_recording_file,
+            fake_latency=config.llm_fake_latency,
+            replay_latency=config.llm_replay_latency,
+        )
+
+    @property
+    def cache_namespace(self):
+        """Model identity for cached LLM output; fake replies never mix with real ones"""
+        return f"fake:{self.model}" if self.name == "fake" else self.model
+
+    def chat_model(self, temperature=0.0):
+        if self.name == "fake":
+            return FakeChatModel(latency=self.fake_latency)
+        if self.name == "replay":
+            return ReplayChatModel(
+                recording=self.recording,
+                model=self.model,
+                temperature=temperature,
+                latency=self.replay_latency,
+            )
+
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        llm = ChatGoogleGenerativeAI(
+            model=self.model, api_key=self.api_key, temperature=temperature
+        )
+        if self.name == "record":
+            return RecordingChatModel(
+                inner=llm,
+                recording=self.recording,
+                model=self.model,
+                temperature=temperature,
+            )
+        return llm
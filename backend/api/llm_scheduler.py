@@ -0,0 +1,288 @@
+import asyncio
+import collections
+import logging
+import random
+import re
+import threading
+import time
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used to budget prompts before they are sent
+CHARS_PER_TOKEN = 4
+
+RATE_LIMIT_MARKERS = ("429", "RESOURCE_EXHAUSTED", "rate limit", "Rate limit")
+TRANSIENT_MARKERS = ("500", "502", "503", "504", "UNAVAILABLE", "DEADLINE_EXCEEDED")
+
+# Retry hints as they appear in provider errors: "retry_delay { seconds: 35 }"
+# (Gemini over gRPC), "retryDelay": "35s" (REST), "Please retry in 34.5s"
+RETRY_HINT_PATTERNS = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)"),
+    re.compile(r"\"retryDelay\":\s*\"(\d+(?:\.\d+)?)s\""),
+    re.compile(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+]
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def is_rate_limit_error(error):
+    if getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error)
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+def is_retryable_error(error):
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if is_rate_limit_error(error):
+        return True
+    message = str(error)
+    return any(marker in message for marker in TRANSIENT_MARKERS)
+
+
+def retry_hint(error):
+    """Seconds the provider asked us to wait before retrying, if it said"""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_after = headers.get("Retry-After") or headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            pass
+
+    message = str(error)
+    for pattern in RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt, base_delay, max_delay, hint=None, rng=random):
+    """
+    Exponential backoff with full jitter; a provider retry hint is a lower bound
+    so that workers woken by the same hint do not all retry at the same instant
+    """
+    delay = rng.uniform(0, min(max_delay, base_delay * 2**attempt))
+    if hint is not None:
+        delay = hint + rng.uniform(0, base_delay)
+    return delay
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to `capacity` tokens, refilled continuously at
+    `capacity` per `period` seconds. A capacity of 0 disables the limit
+    Callers reserve their tokens under a thread lock, going into debt if the
+    bucket is short, and then sleep until the debt is repaid. Reservations are
+    served in order and one bucket can be shared by several event loops
+    """
+
+    def __init__(self, capacity, period=60.0, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / period if capacity else 0
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self, amount=1):
+        """Take `amount` tokens and return the seconds to wait before using them"""
+        if not self.capacity:
+            return 0.0
+        # A single request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    async def acquire(self, amount=1):
+        delay = self.reserve(amount)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider reported the budget exhausted"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute budgets shared by concurrent
+    calls, from any thread
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._resume_at = 0.0
+
+    async def acquire(self, tokens):
+        while time.monotonic() < self._resume_at:
+            await asyncio.sleep(self._resume_at - time.monotonic())
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds`, after the provider rate limited us"""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+        self.requests.drain()
+
+
+class ConcurrencyLimit:
+    """
+    Semaphore capping the requests in flight across the event loops of
+    several threads; freed slots are handed to waiters in arrival order
+    """
+
+    def __init__(self, limit):
+        self._free = limit
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        await waiter
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._free += 1
+                return
+            loop, waiter = self._waiters.popleft()
+        loop.call_soon_threadsafe(self._hand_over, waiter)
+
+    def _hand_over(self, waiter):
+        # A cancelled waiter passes its slot on
+        if waiter.cancelled():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Runs many LLM prompts concurrently within the configured rate limits
+    Rate limited and transient failures are retried with jittered exponential
+    backoff, honoring the retry delay the provider asks for
+    """
+
+    def __init__(
+        self,
+        concurrency=8,
+        requests_per_minute=0,
+        tokens_per_minute=0,
+        max_retries=5,
+        output_tokens=1024,
+        base_delay=1.0,
+        max_delay=60.0,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        # Expected response size, budgeted against tokens per minute with the prompt
+        self.output_tokens = output_tokens
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Retried calls over the scheduler's lifetime
+        self.retries = 0
+        # Shared by every run, also runs in different threads at the same time
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.slots = ConcurrencyLimit(self.concurrency)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            concurrency=config.llm_concurrency,
+            requests_per_minute=config.llm_requests_per_minute,
+            tokens_per_minute=config.llm_tokens_per_minute,
+            max_retries=config.llm_max_retries,
+            output_tokens=config.llm_output_tokens,
+        )
+
+    async def _invoke(self, llm, prompt):
+        limiter = self.limiter
+        tokens = estimate_tokens(prompt) + self.output_tokens
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(tokens)
+            try:
+                if hasattr(llm, "ainvoke"):
+                    response = await llm.ainvoke(prompt)
+                else:
+                    response = await asyncio.to_thread(llm.invoke, prompt)
+                return response.content
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable_error(e):
+                    raise
+                hint = retry_hint(e)
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay, hint)
+                self.retries += 1
+                if is_rate_limit_error(e):
+                    logger.warning(f"Rate limited, retrying in {delay:.1f}s")
+                    limiter.pause(delay)
+                else:
+                    logger.warning(f"LLM call failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _run(self, llm, prompts, on_result):
+        jobs = collections.deque(prompts)
+        tasks = set()
+
+        async def run_one(key, prompt):
+            try:
+                try:
+                    result, error = await self._invoke(llm, prompt), None
+                except Exception as e:
+                    result, error = None, e
+                # Follow-ups go first: they finish files that started before
+                # every job still queued
+                jobs.extendleft(reversed(list(on_result(key, result, error) or ())))
+            finally:
+                self.slots.release()
+
+        started = []
+        while jobs or tasks:
+            if not jobs:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            # The job is only picked once a slot is free, so follow-ups queued
+            # meanwhile are picked first
+            await self.slots.acquire()
+            task = asyncio.create_task(run_one(*jobs.popleft()))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            started.append(task)
+        # Raise what on_result raised
+        await asyncio.gather(*started)
+
+    def run(self, llm, prompts, on_result):
+        """
+        Send every (key, prompt) pair and call `on_result(key, text, error)` as
+        each completes, in completion order; blocks until all are done
+        `on_result` may return follow-up (key, prompt) pairs, which are sent
+        before the pairs not started yet
+        """
+        asyncio.run(self._run(llm, list(prompts), on_result))
@@ -0,0 +1,264 @@
+import logging
+import subprocess
+
+import pathspec
+
+from .history_ingest import unquote_git_path
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Lock files, build output, bundles and vendored dependencies, in gitignore syntax
+DEFAULT_EXCLUDE_PATTERNS = [
+    "package-lock.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "npm-shrinkwrap.json",
+    "poetry.lock",
+    "Pipfile.lock",
+    "uv.lock",
+    "Cargo.lock",
+    "composer.lock",
+    "Gemfile.lock",
+    "go.sum",
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "dist/",
+    "build/",
+    "node_modules/",
+    "vendor/",
+    "third_party/",
+    "__pycache__/",
+]
+
+# .gitattributes used by GitHub Linguist to mark generated and vendored files
+LINGUIST_ATTRIBUTES = ("linguist-generated", "linguist-vendored")
+
+
+def _gitignore_to_pathspecs(pattern):
+    """Translate one gitignore pattern into equivalent git glob pathspecs"""
+    directory_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+    # Patterns without an inner slash match at any depth, others from the root
+    anchored = "/" in pattern
+    base = pattern.lstrip("/") if anchored else f"**/{pattern}"
+    if directory_only:
+        return [f"{base}/**"]
+    return [base, f"{base}/**"]
+
+
+class PathFilter:
+    """
+    Decides which paths are left out of history analysis: gitignore-style
+    patterns, files marked linguist-generated or linguist-vendored in the
+    repository's .gitattributes, and file versions above a size threshold.
+    The same rules are pushed down to git as exclude pathspecs and a big file
+    threshold, so skipped paths are never diffed in the first place.
+    """
+
+    def __init__(
+        self,
+        repo_path,
+        patterns=None,
+        use_linguist_attributes=True,
+        max_file_bytes=0,
+    ):
+        self.repo_path = str(repo_path)
+        self.patterns = [
+            pattern.strip()
+            for pattern in (DEFAULT_EXCLUDE_PATTERNS if patterns is None else patterns)
+            if pattern.strip() and not pattern.strip().startswith("#")
+        ]
+        self.use_linguist_attributes = use_linguist_attributes
+        self.max_file_bytes = max_file_bytes
+        self._spec = pathspec.PathSpec.from_lines("gitwildmatch", self.patterns)
+        self._attribute_cache = {}
+        # Negated ("!") patterns can not be expressed as git exclude pathspecs
+        self.patterns_pushed_down = not any(
+            pattern.startswith("!") for pattern in self.patterns
+        )
+
+    @classmethod
+    def from_config(cls, repo_path, config):
+        return cls(
+            repo_path,
+            patterns=config.history_exclude_patterns,
+            use_linguist_attributes=config.history_linguist_attributes,
+            max_file_bytes=config.history_max_file_bytes,
+        )
+
+    def signature(self):
+        """JSON-serializable description of the rules, stored with the watermark"""
+        return {
+            "patterns": self.patterns,
+            "linguist_attributes": self.use_linguist_attributes,
+            "max_file_bytes": self.max_file_bytes,
+        }
+
+    def git_config(self):
+        """`-c` options for git; files above the threshold are diffed as binary"""
+        if self.max_file_bytes > 0:
+            return ["-c", f"core.bigFileThreshold={self.max_file_bytes}"]
+        return []
+
+    def git_pathspecs(self, positive=False):
+        """
+        Pathspecs selecting everything except the filtered paths, or only the
+        filtered paths with `positive=True`. With negated patterns only the
+        attributes are pushed down and the patterns are applied to the parsed
+        output instead (see matches_pattern).
+        """
+        magic = "glob" if positive else "exclude,glob"
+        pathspecs = []
+        if self.patterns_pushed_down:
+            for pattern in self.patterns:
+                pathspecs += [
+                    f":({magic}){glob}" for glob in _gitignore_to_pathspecs(pattern)
+                ]
+
+        if self.use_linguist_attributes:
+            magic = "attr" if positive else "exclude,attr"
+            for attribute in LINGUIST_ATTRIBUTES:
+                # "linguist-generated" and "linguist-generated=true" both mark a file
+                pathspecs += [f":({magic}:{attribute})", f":({magic}:{attribute}=true)"]
+
+        if positive:
+            return pathspecs
+        return ["."] + pathspecs if pathspecs else []
+
+    def matches_pattern(self, file_path):
+        return self._spec.match_file(file_path)
+
+    def excludes(self, file_path):
+        """True if a path is filtered out by a pattern or a linguist attribute"""
+        if self.matches_pattern(file_path):
+            return True
+        if not self.use_linguist_attributes:
+            return False
+        if file_path not in self._attribute_cache:
+            self.prefetch_attributes([file_path])
+        return self._attribute_cache[file_path]
+
+    def prefetch_attributes(self, file_paths):
+        """Look up the linguist attributes of many paths with one git check-attr"""
+        missing = [path for path in file_paths if path not in self._attribute_cache]
+        if not missing or not self.use_linguist_attributes:
+            return
+
+        output = subprocess.run(
+            ["git", "check-attr", "-z", "--stdin", *LINGUIST_ATTRIBUTES],
+            cwd=self.repo_path,
+            input="\0".join(missing).encode("utf-8") + b"\0",
+            capture_output=True,
+        ).stdout.decode("utf-8", errors="replace")
+
+        for path in missing:
+            self._attribute_cache[path] = False
+        # Output is "<path>\0<attribute>\0<value>\0" for every path and attribute
+        fields = output.split("\0")
+        for i in range(0, len(fields) - 2, 3):
+            path, _, value = fields[i : i + 3]
+            if value in ("set", "true"):
+                self._attribute_cache[path] = True
+
+    def too_large(self, size):
+        return (
+            self.max_file_bytes > 0 and size is not None and size > self.max_file_bytes
+        )
+
+    def report(self, revisions=None):
+        """
+        Count the changes skipped by patterns and attributes in a revision range
+        Only a raw listing is walked, so nothing is diffed
+        """
+        report = {"skipped_paths": 0, "skipped_changes": 0, "skipped_bytes": 0}
+        pathspecs = self.git_pathspecs(positive=True)
+        if not pathspecs:
+            return report
+
+        output = subprocess.run(
+            [
+                "git",
+                "-c",
+                "core.quotepath=off",
+                "log",
+                "--raw",
+                "--no-abbrev",
+                "--no-renames",
+                "--format=",
+                "--diff-merges=first-parent",
+                "--full-history",
+                "--sparse",
+                *(revisions or ["--all"]),
+                "--",
+                *pathspecs,
+            ],
+            cwd=self.repo_path,
+            capture_output=True,
+        ).stdout.decode("utf-8", errors="replace")
+
+        paths = set()
+        blobs = []
+        for line in output.splitlines():
+            if not line.startswith(":"):
+                continue
+            fields = line.split("\t")
+            _, _, old_sha, new_sha, status = fields[0][1:].split()[:5]
+            paths.add(unquote_git_path(fields[-1]))
+            report["skipped_changes"] += 1
+            blobs.append(old_sha if status.startswith("D") else new_sha)
+
+        report["skipped_paths"] = len(paths)
+        report["skipped_bytes"] = sum(blob_sizes(self.repo_path, blobs).values())
+        return report
+
+
+class BlobSizeReader:
+    """Looks up blob sizes through one persistent `git cat-file --batch-check`"""
+
+    def __init__(self, repo_path):
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch-check"],
+            cwd=str(repo_path),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def size(self, blob_hash):
+        """Return the size of a blob in bytes, or None if it does not exist"""
+        self.process.stdin.write(blob_hash.encode("ascii") + b"\n")
+        self.process.stdin.flush()
+        parts = self.process.stdout.readline().decode("ascii", errors="replace").split()
+        return int(parts[2]) if len(parts) == 3 else None
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+def blob_sizes(repo_path, blob_hashes):
+    """Return {blob hash: size in bytes} for the blobs that exist in the repository"""
+    blob_hashes = list(dict.fromkeys(blob_hashes))
+    if not blob_hashes:
+        return {}
+
+    output = subprocess.run(
+        ["git", "cat-file", "--batch-check"],
+        cwd=str(repo_path),
+        input="\n".join(blob_hashes) + "\n",
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    sizes = {}
+    for line in output.splitlines():
+        parts = line.split()
+        # "<sha> <type> <size>", or "<object> missing"
+        if len(parts) == 3:
+            sizes[parts[0]] = int(parts[2])
+    return sizes
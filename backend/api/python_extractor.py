@@ -0,0 +1,337 @@
+import ast
+import os
+import re
+
+# Fallback patterns for files that do not parse (e.g. Python 2 or syntax errors)
+IMPORT_PATTERN = re.compile(r"^import\s+([^#\n;]+)", re.MULTILINE)
+FROM_IMPORT_PATTERN = re.compile(
+    r"^from\s+(\.*)([\w.]*)\s+import\s+\(?([^#\n)]+)", re.MULTILINE
+)
+DEFINITION_PATTERN = re.compile(r"^(def|class)\s+([a-zA-Z0-9_]+)", re.MULTILINE)
+TOP_LEVEL_LINE_PATTERN = re.compile(r"^\S", re.MULTILINE)
+CALL_PATTERN = re.compile(r"\b([a-zA-Z_]\w*)\s*\(")
+
+
+def _import_entry(module, names=(), level=0, aliases=None):
+    """
+    One imported module with the names taken from it ("from" imports only)
+    `aliases` maps names bound with "as" to the imported name or module
+    """
+    return {
+        "module": module,
+        "names": list(names),
+        "level": level,
+        "aliases": aliases or {},
+    }
+
+
+class _ModuleVisitor(ast.NodeVisitor):
+    """
+    Collects imports, classes, functions and raw call targets in one walk
+    Methods are named "Class.method"; functions nested in a function are part
+    of the enclosing function, so their calls are attributed to it
+    """
+
+    def __init__(self):
+        self.imports = []
+        self.functions = []
+        self.classes = []
+        # Caller -> call targets in order of appearance, resolved afterwards
+        self.calls = {}
+        self._class_path = []
+        self._function = None
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            aliases = {alias.asname: alias.name} if alias.asname else None
+            self.imports.append(_import_entry(alias.name, aliases=aliases))
+
+    def visit_ImportFrom(self, node):
+        names = [alias.name for alias in node.names]
+        aliases = {alias.asname: alias.name for alias in node.names if alias.asname}
+        self.imports.append(
+            _import_entry(node.module or "", names, node.level, aliases)
+        )
+
+    def visit_ClassDef(self, node):
+        if self._function is not None:
+            self.generic_visit(node)
+            return
+
+        # Decorators and bases are evaluated in the enclosing scope
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self._class_path.append(node.name)
+        self.classes.append(".".join(self._class_path))
+        for statement in node.body:
+            self.visit(statement)
+        self._class_path.pop()
+
+    def visit_FunctionDef(self, node):
+        if self._function is not None:
+            self.generic_visit(node)
+            return
+
+        # Decorators and default values are evaluated in the enclosing scope
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self.visit(node.args)
+
+        name = ".".join(self._class_path + [node.name])
+        self.functions.append(name)
+        self.calls.setdefault(name, [])
+        self._function = (name, ".".join(self._class_path))
+        for statement in node.body:
+            self.visit(statement)
+        self._function = None
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node):
+        if self._function is not None:
+            caller, class_name = self._function
+            target = node.func
+            if isinstance(target, ast.Name):
+                self.calls[caller].append((None, target.id, class_name))
+            elif isinstance(target, ast.Attribute) and isinstance(
+                target.value, ast.Name
+            ):
+                self.calls[caller].append((target.value.id, target.attr, class_name))
+        self.generic_visit(node)
+
+
+def _resolve_calls(functions, classes, imports, raw_calls):
+    """
+    Map raw call targets to functions of this file or to imported names
+    `name()` is a function or an imported name, `self.name()` / `cls.name()` a
+    method of the enclosing class and `Class.name()` a method of a local class.
+    `module.name()` on an imported module or name keeps its qualifier, so it
+    only resolves to the module's own file (see module_files). Anything else
+    is ignored.
+    """
+    defined = set(functions)
+    class_names = set(classes)
+    imported_names = {}
+    for entry in imports:
+        if entry["names"]:
+            for name in entry["names"]:
+                imported_names[name] = name
+            imported_names.update(entry["aliases"])
+    imported_modules = set(_module_bindings(imports))
+
+    function_calls = {}
+    called_by = {}
+    for caller, targets in raw_calls.items():
+        callees = []
+        for owner, name, class_name in targets:
+            if owner is None:
+                callee = name if name in defined else imported_names.get(name)
+            elif owner in ("self", "cls") and class_name:
+                callee = f"{class_name}.{name}"
+                if callee not in defined:
+                    callee = None
+            elif owner in class_names and f"{owner}.{name}" in defined:
+                callee = f"{owner}.{name}"
+            elif owner in imported_modules or owner in imported_names:
+                callee = f"{owner}.{name}"
+            else:
+                callee = None
+
+            if callee is None or callee == caller or callee in callees:
+                continue
+            callees.append(callee)
+            called_by.setdefault(callee, []).append(caller)
+
+        if callees:
+            function_calls[caller] = callees
+    return function_calls, called_by
+
+
+def _module_bindings(imports):
+    """
+    Names bound to an imported module, with the (module, level) they refer to
+    `import a.b` binds `a`, and a name from a "from" import may be a submodule
+    """
+    bindings = {}
+    for entry in imports:
+        if entry["names"]:
+            for name in entry["names"]:
+                if name != "*":
+                    module = f"{entry['module']}.{name}" if entry["module"] else name
+                    bindings[name] = (module, entry["level"])
+            for alias, name in entry["aliases"].items():
+                bindings[alias] = bindings[name]
+        elif entry["aliases"]:
+            for alias, module in entry["aliases"].items():
+                bindings[alias] = (module, 0)
+        else:
+            module = entry["module"].split(".")[0]
+            bindings[module] = (module, 0)
+    return bindings
+
+
+def _extract_with_regex(content):
+    """
+    Fallback for content `ast` rejects: top-level imports, functions and classes,
+    with each function's body running up to the next top-level line
+    """
+    imports = []
+    for match in IMPORT_PATTERN.finditer(content):
+        for module, _, alias in (
+            part.strip().partition(" as ") for part in match.group(1).split(",")
+        ):
+            if module:
+                aliases = {alias.strip(): module.strip()} if alias.strip() else None
+                imports.append(_import_entry(module.strip(), aliases=aliases))
+    for match in FROM_IMPORT_PATTERN.finditer(content):
+        names = []
+        aliases = {}
+        for name, _, alias in (
+            part.strip().partition(" as ") for part in match.group(3).split(",")
+        ):
+            if name.strip():
+                names.append(name.strip())
+                if alias.strip():
+                    aliases[alias.strip()] = name.strip()
+        imports.append(
+            _import_entry(match.group(2), names, len(match.group(1)), aliases)
+        )
+
+    top_level_starts = [
+        match.start() for match in TOP_LEVEL_LINE_PATTERN.finditer(content)
+    ]
+    functions = []
+    classes = []
+    raw_calls = {}
+    position = 0
+    for match in DEFINITION_PATTERN.finditer(content):
+        keyword, name = match.groups()
+        if keyword == "class":
+            classes.append(name)
+            continue
+
+        functions.append(name)
+        # The body ends where the next top-level line starts
+        while (
+            position < len(top_level_starts)
+            and top_level_starts[position] <= match.start()
+        ):
+            position += 1
+        end = (
+            top_level_starts[position]
+            if position < len(top_level_starts)
+            else len(content)
+        )
+        raw_calls[name] = [
+            (None, call.group(1), "")
+            for call in CALL_PATTERN.finditer(content, match.end(), end)
+        ]
+    return imports, functions, classes, raw_calls
+
+
+def extract_python_module(content):
+    """
+    Extract the imports, classes, functions (including methods) and call edges
+    of a Python module from a single `ast` parse, falling back to regular
+    expressions when the content does not parse
+    """
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError, RecursionError):
+        tree = None
+
+    if tree is not None:
+        visitor = _ModuleVisitor()
+        visitor.visit(tree)
+        imports, functions, classes, raw_calls = (
+            visitor.imports,
+            visitor.functions,
+            visitor.classes,
+            visitor.calls,
+        )
+    else:
+        imports, functions, classes, raw_calls = _extract_with_regex(content)
+
+    function_calls, called_by = _resolve_calls(functions, classes, imports, raw_calls)
+    return {
+        "parsed": tree is not None,
+        "imports": imports,
+        "functions": functions,
+        "classes": classes,
+        "function_calls": function_calls,
+        "called_by": called_by,
+    }
+
+
+def import_statement(entry):
+    """Render an import entry the way it is written in the source"""
+    if entry["names"]:
+        module = "." * entry["level"] + entry["module"]
+        return f"from {module} import {', '.join(entry['names'])}"
+    return f"import {entry['module']}"
+
+
+def import_file_paths(file_path, entry):
+    """
+    Candidate repository paths of the module(s) an import entry refers to
+    Relative imports are resolved against the importing file's package;
+    `from . import name` may import submodules, so each name is a candidate
+    """
+    if not entry["level"]:
+        return [entry["module"].replace(".", "/") + ".py"]
+
+    package = os.path.dirname(file_path)
+    for _ in range(entry["level"] - 1):
+        package = os.path.dirname(package)
+    if entry["module"]:
+        base = os.path.join(package, entry["module"].replace(".", "/"))
+        return [os.path.normpath(base) + ".py"]
+    return [
+        os.path.normpath(os.path.join(package, name)) + ".py"
+        for name in entry["names"]
+        if name != "*"
+    ]
+
+
+def module_files(file_path, module):
+    """
+    Candidate repository paths of the module every module-bound name of a
+    file refers to, by name, so `name.attr()` calls can be resolved to the
+    module's own file and never to an unrelated file defining `attr`
+    """
+    files = {}
+    for name, (module_name, level) in _module_bindings(module["imports"]).items():
+        files[name] = [
+            candidate
+            for path in import_file_paths(
+                file_path, _import_entry(module_name, level=level)
+            )
+            for candidate in (path, path[: -len(".py")] + "/__init__.py")
+        ]
+    return files
+
+
+def file_dependencies(file_path, module):
+    """
+    The file dependency entry of a module for the dependency graphs
+    Absolute imports only count when they are dotted and not obviously from
+    the standard library, like the regex extractor this replaces
+    """
+    imports = []
+    for entry in module["imports"]:
+        if not entry["level"] and (
+            "." not in entry["module"]
+            or entry["module"].startswith(("os", "sys", "re", "json"))
+        ):
+            continue
+        imports.extend(import_file_paths(file_path, entry))
+    return {"imports": imports, "imported_by": [], "references": []}
+
+
+def function_dependencies(module):
+    """The function dependency entry of a module for the dependency graphs"""
+    return {
+        "functions": module["functions"],
+        "function_calls": module["function_calls"],
+        "called_by": module["called_by"],
+    }
@@ -0,0 +1,127 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class PersistentResultCache:
+    """
+    Content-addressed, size-bounded cache of JSON-serializable results backed by SQLite
+    Least recently used entries are evicted once the stored values exceed `max_bytes`
+    """
+
+    # Number of writes buffered before they are committed to disk
+    COMMIT_INTERVAL = 200
+
+    def __init__(self, db_path, max_bytes=256 * 1024 * 1024):
+        self.db_path = str(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        self._connection.commit()
+        self._total_bytes = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def get(self, key):
+        """Return the cached value for a key, or None on a miss"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._after_write()
+            return json.loads(row[0])
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries if the cache is full"""
+        serialized = json.dumps(value, ensure_ascii=False)
+        size = len(serialized.encode("utf-8"))
+
+        with self._lock:
+            previous = self._connection.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, serialized, size, time.time()),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._after_write()
+
+    def _evict(self):
+        """Drop the oldest entries until the cache is back under 90% of its budget"""
+        target = self.max_bytes * 0.9
+        evicted = 0
+        while self._total_bytes > target:
+            rows = self._connection.execute(
+                "SELECT key, size FROM entries ORDER BY last_access LIMIT 500"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_bytes <= target:
+                    break
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                evicted += 1
+        logger.info(f"Evicted {evicted} entries from {self.db_path}")
+
+    def _after_write(self):
+        self._pending_writes += 1
+        if self._pending_writes >= self.COMMIT_INTERVAL:
+            self._connection.commit()
+            self._pending_writes = 0
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters and current size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size_bytes": self._total_bytes,
+        }
+
+    def flush(self):
+        with self._lock:
+            self._connection.commit()
+            self._pending_writes = 0
+
+    def close(self):
+        self.flush()
+        self._connection.close()
@@ -0,0 +1,153 @@
+import logging
+import queue
+import subprocess
+import threading
+
+from .history_ingest import REGULAR_FILE_MODES
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class _CatFileBatch:
+    """One persistent `git cat-file --batch` process"""
+
+    def __init__(self, repo_path):
+        self.process = subprocess.Popen(
+            ["git", "cat-file", "--batch"],
+            cwd=repo_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def read(self, object_name):
+        """Return the raw content of an object, or None if it does not exist"""
+        self.process.stdin.write(object_name.encode("utf-8") + b"\n")
+        self.process.stdin.flush()
+
+        # Header is "<sha> <type> <size>", or "<object> missing" where the
+        # object name may be a "<commit>:<path>" with spaces in the path
+        header = self.process.stdout.readline().decode("utf-8", errors="replace")
+        header = header.rstrip("\n")
+        if header.endswith((" missing", " ambiguous")):
+            return None
+
+        size = int(header.rsplit(" ", 1)[1])
+        content = self.process.stdout.read(size)
+        self.process.stdout.read(1)  # Trailing newline after the content
+        return content
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+class GitSnapshotReader:
+    """
+    Reads the tree and file contents of any commit straight from the object
+    database, so the working directory is never checked out or modified.
+    Blob contents are streamed through persistent `git cat-file --batch`
+    processes; up to `max_processes` threads can read concurrently.
+    """
+
+    def __init__(self, repo_path, max_processes=4):
+        self.repo_path = str(repo_path)
+        self.max_processes = max(1, max_processes)
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _acquire(self):
+        """Take an idle cat-file process, starting a new one if the pool allows it"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.max_processes:
+                batch = _CatFileBatch(self.repo_path)
+                self._all.append(batch)
+                return batch
+        return self._idle.get()
+
+    def read_object(self, object_name):
+        """Read an object by hash or `<commit>:<path>` name; returns bytes or None"""
+        batch = self._acquire()
+        try:
+            return batch.read(object_name)
+        finally:
+            self._idle.put(batch)
+
+    def read_text(self, object_name):
+        """Read an object and decode it as text; returns None if it does not exist"""
+        content = self.read_object(object_name)
+        if content is None:
+            return None
+        return content.decode("utf-8", errors="ignore")
+
+    def list_tree(self, commit_hash):
+        """Return {path: (blob_sha, size)} for every regular file in a commit's tree"""
+        output = subprocess.run(
+            ["git", "ls-tree", "-r", "-l", "-z", "--full-tree", commit_hash],
+            cwd=self.repo_path,
+            capture_output=True,
+            check=True,
+        ).stdout
+
+        entries = {}
+        for record in output.split(b"\x00"):
+            if not record:
+                continue
+            # "<mode> <type> <sha> <size>\t<path>"
+            info, _, path = record.partition(b"\t")
+            mode, object_type, blob_sha, size = info.decode("ascii").split()
+            if object_type != "blob" or mode not in REGULAR_FILE_MODES:
+                continue  # Skip submodules and symlinks
+            entries[path.decode("utf-8", errors="replace")] = (blob_sha, int(size))
+        return entries
+
+    def snapshot(self, commit_hash):
+        """Return a read-only view of the repository at a commit"""
+        return CommitSnapshot(self, commit_hash)
+
+    def close(self):
+        """Stop every cat-file process"""
+        with self._lock:
+            for batch in self._all:
+                batch.close()
+            self._all = []
+            self._idle = queue.LifoQueue()
+
+
+class CommitSnapshot:
+    """The files of a repository as they were at one commit"""
+
+    def __init__(self, reader, commit_hash):
+        self.reader = reader
+        self.commit_hash = commit_hash
+        self.entries = reader.list_tree(commit_hash)
+
+    def paths(self):
+        """All regular file paths in the snapshot, relative to the repository root"""
+        return list(self.entries)
+
+    def blob_sha(self, path):
+        return self.entries[path][0]
+
+    def size(self, path):
+        return self.entries[path][1]
+
+    def read_text(self, path):
+        """Read a file of the snapshot as text"""
+        return self.reader.read_text(self.blob_sha(path))
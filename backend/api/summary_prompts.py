@@ -0,0 +1,392 @@
+import hashlib
+import json
+import re
+
+from .llm_scheduler import estimate_tokens
+
+# Prompt asking for the summary of one file; the indentation is part of the
+# prompt the summaries in the cache were generated with
+FILE_SUMMARY_PROMPT = """
+            You are a code analysis assistant. Provide a detailed summary of the following file.
+            
+            IMPORTANT REQUIREMENTS:
+            1. Start with an overview of the file's main purpose in 1-2 sentences
+            2. List ALL import statements EXACTLY as they appear in the code (preserve them precisely)
+            3. List ALL functions with their signatures and a brief description
+            4. List ALL classes with their inheritance structure and a brief description
+            5. Explicitly identify ALL function calls between functions in this file
+            6. Clearly identify ALL dependencies on other local files (not standard libraries)
+            7. Format your response with clear headings for each section
+            
+            This information will be used for:
+            - Understanding code dependencies
+            - Generating accurate dependency graphs
+            - Retrieving relevant information based on queries
+            
+            EXTERNAL ANALYSIS RESULTS:
+            Identified imports: {imports}
+            Identified functions: {functions}
+            Identified classes: {classes}
+            Identified file dependencies: {file_dependencies}
+            Identified function calls: {function_calls}
+            
+            File path: {file_path}
+            File content:
+            
+            {file_content}
+            """
+
+
+def template_hash(*templates):
+    """Short hash identifying prompt templates, part of the summary cache keys"""
+    digest = hashlib.sha256()
+    for template in templates:
+        digest.update(template.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def file_summary_prompt(file_path, file_content, dependencies):
+    """
+    Enhanced file summarization that emphasizes dependencies for graph generation
+    """
+    return FILE_SUMMARY_PROMPT.format(
+        imports=dependencies["imports"],
+        functions=dependencies["functions"],
+        classes=dependencies["classes"],
+        file_dependencies=dependencies["file_dependencies"],
+        function_calls=dependencies["function_calls"],
+        file_path=file_path,
+        file_content=file_content,
+    )
+
+
+# Prompt asking for the summaries of several small files in one request
+BATCH_SUMMARY_PROMPT = """
+            You are a code analysis assistant. Provide a detailed summary of each of the {file_count} files below.
+
+            For EVERY file, the summary must:
+            1. Start with an overview of the file's main purpose in 1-2 sentences
+            2. List ALL import statements EXACTLY as they appear in the code (preserve them precisely)
+            3. List ALL functions with their signatures and a brief description
+            4. List ALL classes with their inheritance structure and a brief description
+            5. Explicitly identify ALL function calls between functions in the file
+            6. Clearly identify ALL dependencies on other local files (not standard libraries)
+            7. Use clear headings for each section
+
+            Respond with a single JSON object and nothing else. Its keys are the file
+            paths exactly as given below, and each value is that file's summary as a
+            Markdown string:
+            {{"path/of/first_file": "summary ...", "path/of/second_file": "summary ..."}}
+
+            {files}
+            """
+
+BATCH_FILE_SECTION = """
+            ----- File path: {file_path} -----
+            EXTERNAL ANALYSIS RESULTS:
+            Identified imports: {imports}
+            Identified functions: {functions}
+            Identified classes: {classes}
+            Identified file dependencies: {file_dependencies}
+            Identified function calls: {function_calls}
+            File content:
+
+            {file_content}
+            """
+
+_DEPENDENCY_KEYS = (
+    "imports",
+    "functions",
+    "classes",
+    "file_dependencies",
+    "function_calls",
+)
+
+
+def batch_summary_prompt(files):
+    """Prompt summarizing several (file_path, file_content, dependencies) at once"""
+    sections = [
+        BATCH_FILE_SECTION.format(
+            file_path=file_path,
+            file_content=file_content,
+            **{key: dependencies[key] for key in _DEPENDENCY_KEYS},
+        )
+        for file_path, file_content, dependencies in files
+    ]
+    return BATCH_SUMMARY_PROMPT.format(file_count=len(files), files="".join(sections))
+
+
+def plan_summary_batches(files, batch_tokens, file_tokens, max_files):
+    """
+    Split (file_path, file_content, dependencies) into batches of small files
+    that fit `batch_tokens` together and files summarized on their own
+    Files keep their order, so neighbouring files of a directory share a batch
+    """
+    batches = []
+    singles = []
+    batch = []
+    used = 0
+    for entry in files:
+        tokens = estimate_tokens(entry[1])
+        if not batch_tokens or max_files < 2 or tokens > file_tokens:
+            singles.append(entry)
+            continue
+        if batch and (used + tokens > batch_tokens or len(batch) >= max_files):
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(entry)
+        used += tokens
+    if batch:
+        batches.append(batch)
+
+    # A batch of one is just an individual prompt with extra instructions
+    for batch in [batch for batch in batches if len(batch) == 1]:
+        singles.extend(batch)
+    return [batch for batch in batches if len(batch) > 1], singles
+
+
+def parse_batch_summaries(reply, file_paths):
+    """
+    Per-file summaries from a batch reply, by path; files missing from the reply
+    or with an empty summary are left out so they can be summarized on their own
+    """
+    text = reply.strip()
+    # Models often wrap JSON in a Markdown code fence
+    fence = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if fence:
+        text = fence.group(1)
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        try:
+            parsed = json.loads(text[start : end + 1]) if start < end else None
+        except ValueError:
+            parsed = None
+    if not isinstance(parsed, dict):
+        return {}
+    return {
+        file_path: parsed[file_path].strip()
+        for file_path in file_paths
+        if isinstance(parsed.get(file_path), str) and parsed[file_path].strip()
+    }
+
+
+# Map-reduce prompts for files too large for one prompt: every chunk is
+# summarized on its own, then the chunk summaries are merged
+CHUNK_SUMMARY_PROMPT = """
+            You are a code analysis assistant. The file {file_path} is too large to read at once.
+            Below is part {part} of {part_count} (lines {first_line}-{last_line}).
+
+            Summarize this part:
+            1. Its purpose within the file in 1-2 sentences
+            2. ALL import statements EXACTLY as they appear (preserve them precisely)
+            3. ALL functions with their signatures and a brief description
+            4. ALL classes with their inheritance structure and a brief description
+            5. ALL function calls between functions, and ALL dependencies on other local files
+
+            Part content:
+
+            {chunk}
+            """
+
+PARTIAL_MERGE_PROMPT = """
+            You are a code analysis assistant. Below are summaries of consecutive parts of
+            the file {file_path}. Combine them into one summary of those parts, keeping
+            every import, function, class, function call and local file dependency they list.
+
+            {summaries}
+            """
+
+MERGE_SUMMARY_PROMPT = """
+            You are a code analysis assistant. The file {file_path} was too large to read at
+            once, so it was summarized in parts. Combine the part summaries below into a
+            detailed summary of the whole file.
+
+            IMPORTANT REQUIREMENTS:
+            1. Start with an overview of the file's main purpose in 1-2 sentences
+            2. List ALL import statements EXACTLY as they appear in the code (preserve them precisely)
+            3. List ALL functions with their signatures and a brief description
+            4. List ALL classes with their inheritance structure and a brief description
+            5. Explicitly identify ALL function calls between functions in this file
+            6. Clearly identify ALL dependencies on other local files (not standard libraries)
+            7. Format your response with clear headings for each section
+
+            EXTERNAL ANALYSIS RESULTS:
+            Identified imports: {imports}
+            Identified functions: {functions}
+            Identified classes: {classes}
+            Identified file dependencies: {file_dependencies}
+            Identified function calls: {function_calls}
+
+            {summaries}
+            """
+
+# Characters of each analysis listing included in a merge prompt
+MERGE_LISTING_CHARS = 4000
+
+# Lines starting a definition at any nesting level, including decorators
+DEFINITION_PATTERN = re.compile(
+    r"^\s*(?:@|(?:async\s+)?def\s|class\s|(?:export\s+)?(?:default\s+)?"
+    r"(?:async\s+)?function\b|(?:export\s+)?(?:const|let|var)\s+\w+\s*=)"
+)
+# Top-level lines that continue the previous statement rather than start one
+CONTINUATION_PREFIXES = (")", "]", "}", "else", "elif", "except", "finally", "catch")
+
+
+def _cut_rank(line, previous):
+    """
+    How good a place to cut before `line` is, lower is better, None if the
+    line continues the previous one
+    """
+    stripped = line.strip()
+    if not stripped:
+        return 1000
+    if previous.strip().startswith("@"):
+        # Keep decorators with what they decorate
+        return None
+    indent = len(line) - len(line.lstrip())
+    if DEFINITION_PATTERN.match(line):
+        return indent
+    if indent == 0 and not stripped.startswith(CONTINUATION_PREFIXES):
+        return 0
+    return None
+
+
+def split_structural_chunks(content, max_chars):
+    """
+    Split file content into (first_line, last_line, text) chunks of at most
+    `max_chars`. Chunks are cut before the least nested definition or
+    top-level statement in their second half where possible, then at a blank
+    line, so functions and classes are rarely split
+    """
+    chunks = []
+    lines = content.splitlines(keepends=True)
+    start = 0
+    while start < len(lines):
+        size = 0
+        end = start
+        best_cut = best_rank = None
+        while end < len(lines) and size + len(lines[end]) <= max_chars:
+            if end > start:
+                rank = _cut_rank(lines[end], lines[end - 1])
+                if rank is not None:
+                    # Cuts in the first half would make needlessly small chunks
+                    rank = (size < max_chars // 2, rank)
+                    if best_rank is None or rank <= best_rank:
+                        best_cut, best_rank = end, rank
+            size += len(lines[end])
+            end += 1
+
+        if end == start:
+            # A single line longer than a chunk, e.g. minified code
+            line = lines[start]
+            for offset in range(0, len(line), max_chars):
+                chunks.append((start + 1, start + 1, line[offset : offset + max_chars]))
+            start += 1
+            continue
+        if end < len(lines) and best_cut is not None:
+            end = best_cut
+        chunks.append((start + 1, end, "".join(lines[start:end])))
+        start = end
+    return chunks
+
+
+def chunk_summary_prompt(file_path, chunks, index):
+    first_line, last_line, chunk = chunks[index]
+    return CHUNK_SUMMARY_PROMPT.format(
+        file_path=file_path,
+        part=index + 1,
+        part_count=len(chunks),
+        first_line=first_line,
+        last_line=last_line,
+        chunk=chunk,
+    )
+
+
+def _join_summaries(summaries):
+    return "".join(
+        f"\n----- Part {index + 1} -----\n{summary}\n"
+        for index, summary in enumerate(summaries)
+    )
+
+
+def _bounded(value, limit=MERGE_LISTING_CHARS):
+    return _truncated(str(value), limit)
+
+
+def partial_merge_prompt(file_path, summaries):
+    return PARTIAL_MERGE_PROMPT.format(
+        file_path=file_path, summaries=_join_summaries(summaries)
+    )
+
+
+def merge_summary_prompt(file_path, summaries, dependencies):
+    return MERGE_SUMMARY_PROMPT.format(
+        file_path=file_path,
+        summaries=_join_summaries(summaries),
+        **{key: _bounded(dependencies[key]) for key in _DEPENDENCY_KEYS},
+    )
+
+
+# Rollup prompts, built bottom-up from the file summaries and the rollups of
+# subdirectories
+DIRECTORY_ROLLUP_PROMPT = """
+            You are a code analysis assistant. Below are summaries of the files and
+            subdirectories of the directory {directory}/ in a repository.
+
+            Write a dense summary of the directory:
+            1. Its purpose and responsibilities in 2-3 sentences
+            2. The main modules, components or subpackages and what each does
+            3. The languages, frameworks and libraries it uses
+            4. How it depends on and is used by other parts of the repository
+
+            {children}
+            """
+
+REPOSITORY_ROLLUP_PROMPT = """
+            You are a code analysis assistant. Below are summaries of the top-level files
+            and directories of the repository {repository}.
+
+            Write an overview of the whole repository:
+            1. What the project does, in 2-3 sentences
+            2. The main technologies used: languages, frameworks, libraries, databases and tools
+            3. Its architecture: the main parts, what each is responsible for and how they interact
+            4. Entry points and how the project is built, configured and run
+
+            {children}
+            """
+
+
+def rollup_prompt(directory, children, max_chars, repository=None):
+    """
+    Prompt summarizing a directory from (name, summary) of its children, or the
+    whole repository for the root directory "". Every child gets an equal share
+    of `max_chars`, so the prompt stays bounded however large the directory is
+    """
+    share = max_chars // max(1, len(children))
+    sections = "".join(
+        f"\n----- {name} -----\n{_truncated(summary, share)}\n"
+        for name, summary in children
+    )
+    if not directory:
+        return REPOSITORY_ROLLUP_PROMPT.format(
+            repository=repository or "", children=sections
+        )
+    return DIRECTORY_ROLLUP_PROMPT.format(directory=directory, children=sections)
+
+
+def _truncated(text, limit):
+    return text if len(text) <= limit else text[:limit] + " ... (truncated)"
+
+
+# Every template a file summary can be generated with, hashed into cache keys
+SUMMARY_PROMPTS = (
+    FILE_SUMMARY_PROMPT,
+    BATCH_SUMMARY_PROMPT,
+    BATCH_FILE_SECTION,
+    CHUNK_SUMMARY_PROMPT,
+    PARTIAL_MERGE_PROMPT,
+    MERGE_SUMMARY_PROMPT,
+)
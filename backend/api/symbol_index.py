@@ -0,0 +1,100 @@
+import os
+
+
+class SymbolIndex:
+    """
+    Repository-wide table of function name -> files defining it, used to
+    resolve calls across files in O(1) per call edge. When a name is defined
+    in several files, the files imported by the caller win, then the file
+    closest to the caller in the directory tree.
+    """
+
+    def __init__(self):
+        # Name -> {defining file: None}, an insertion-ordered set
+        self._files_by_name = {}
+        self._names_by_file = {}
+        # Names whose file set belongs to this index alone; the others are
+        # shared with a copy and copied before they are changed
+        self._owned_names = set()
+
+    @classmethod
+    def from_function_dependencies(cls, function_dependencies):
+        index = cls()
+        for file_path, func_info in function_dependencies.items():
+            index.add_file(file_path, func_info["functions"])
+        return index
+
+    def copy(self):
+        """
+        Copy the index in time proportional to the number of names; the file
+        sets are shared until either index changes them
+        """
+        index = SymbolIndex()
+        index._files_by_name = dict(self._files_by_name)
+        index._names_by_file = dict(self._names_by_file)
+        self._owned_names = set()
+        return index
+
+    def _files_to_change(self, name):
+        files = self._files_by_name.get(name)
+        if name not in self._owned_names:
+            files = dict(files or {})
+            self._files_by_name[name] = files
+            self._owned_names.add(name)
+        return files
+
+    def add_file(self, file_path, functions):
+        """Index the functions of a file, replacing what was indexed for it before"""
+        self.remove_file(file_path)
+        names = list(dict.fromkeys(functions))
+        self._names_by_file[file_path] = names
+        for name in names:
+            self._files_to_change(name)[file_path] = None
+
+    def remove_file(self, file_path):
+        for name in self._names_by_file.pop(file_path, ()):
+            files = self._files_to_change(name)
+            del files[file_path]
+            if not files:
+                del self._files_by_name[name]
+                self._owned_names.discard(name)
+
+    def defining_files(self, name):
+        return list(self._files_by_name.get(name, ()))
+
+    def resolve(self, name, caller_file, imported_files=()):
+        """
+        Return the file whose definition of `name` a call from `caller_file`
+        refers to, or None if no indexed file defines it
+        `imported_files` are the repository paths the caller imports
+        """
+        files = self._files_by_name.get(name)
+        if not files:
+            return None
+        if caller_file in files:
+            return caller_file
+        if len(files) == 1:
+            return next(iter(files))
+
+        candidates = [file_path for file_path in files if file_path in imported_files]
+        if len(candidates) == 1:
+            return candidates[0]
+        return min(
+            candidates or files,
+            key=lambda file_path: (
+                -_shared_directory_depth(caller_file, file_path),
+                file_path,
+            ),
+        )
+
+
+def _shared_directory_depth(path, other_path):
+    """Number of leading directories two repository paths have in common"""
+    directories = os.path.dirname(path).split("/")
+    other_directories = os.path.dirname(other_path).split("/")
+    depth = 0
+    for directory, other_directory in zip(directories, other_directories):
+        if directory != other_directory:
+            break
+        depth += 1
+    return depth
@@ -0,0 +1,114 @@
+from bisect import bisect_right
+
+# Summary keys of the symbols tracked for each kind
+SYMBOL_KINDS = {
+    "functions": ("functions_added", "functions_removed"),
+    "classes": ("classes_added", "classes_removed"),
+    "imports": ("imports_added", "imports_removed"),
+}
+
+
+class SymbolTimeline:
+    """
+    Lifetimes of the functions, classes and imports of one file as intervals
+    (symbol, introduced_at, removed_at) over the positions of the file's commit
+    records. removed_at is None while the symbol is still present. Intervals
+    are appended in order of introduction, so their start positions form a
+    sorted array that can be bisected.
+    """
+
+    def __init__(self):
+        self.names = {kind: [] for kind in SYMBOL_KINDS}
+        self.starts = {kind: [] for kind in SYMBOL_KINDS}
+        self.ends = {kind: [] for kind in SYMBOL_KINDS}
+        # Interval index of every symbol that is currently present
+        self.open = {kind: {} for kind in SYMBOL_KINDS}
+
+    def apply(self, position, summary):
+        """
+        Record the change summary of the commit at `position` and return the
+        symbols of each kind that were not present before it
+        """
+        introduced = {}
+        for kind, (added_key, removed_key) in SYMBOL_KINDS.items():
+            names = self.names[kind]
+            starts = self.starts[kind]
+            ends = self.ends[kind]
+            open_intervals = self.open[kind]
+
+            new_symbols = []
+            for name in summary.get(added_key, []):
+                if name not in open_intervals:
+                    open_intervals[name] = len(names)
+                    names.append(name)
+                    starts.append(position)
+                    ends.append(None)
+                    new_symbols.append(name)
+
+            # Removals are applied after additions, so a symbol listed on both
+            # sides of one commit ends up removed
+            for name in summary.get(removed_key, []):
+                index = open_intervals.pop(name, None)
+                if index is not None:
+                    ends[index] = position
+                    if starts[index] == position:
+                        new_symbols.remove(name)
+
+            introduced[kind] = new_symbols
+        return introduced
+
+    def present_at(self, position):
+        """Return the symbols of each kind present after the commit at `position`"""
+        present = {}
+        for kind in SYMBOL_KINDS:
+            # Only intervals that started at or before the position qualify
+            candidates = bisect_right(self.starts[kind], position)
+            ends = self.ends[kind]
+            present[kind] = [
+                self.names[kind][index]
+                for index in range(candidates)
+                if ends[index] is None or ends[index] > position
+            ]
+        return present
+
+    def truncate(self, position):
+        """Forget everything recorded at or after `position`, e.g. before replaying it"""
+        for kind in SYMBOL_KINDS:
+            keep = bisect_right(self.starts[kind], position - 1)
+            del self.names[kind][keep:]
+            del self.starts[kind][keep:]
+            del self.ends[kind][keep:]
+
+            ends = self.ends[kind]
+            for index in range(keep):
+                if ends[index] is not None and ends[index] >= position:
+                    ends[index] = None
+            self.open[kind] = {
+                self.names[kind][index]: index
+                for index in range(keep)
+                if ends[index] is None
+            }
+
+    def to_dict(self):
+        """Compact JSON form: {kind: [[symbol, introduced_at, removed_at], ...]}"""
+        return {
+            kind: [
+                [name, start, end]
+                for name, start, end in zip(
+                    self.names[kind], self.starts[kind], self.ends[kind]
+                )
+            ]
+            for kind in SYMBOL_KINDS
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        timeline = cls()
+        for kind in SYMBOL_KINDS:
+            for name, start, end in data.get(kind, []):
+                if end is None:
+                    timeline.open[kind][name] = len(timeline.names[kind])
+                timeline.names[kind].append(name)
+                timeline.starts[kind].append(start)
+                timeline.ends[kind].append(end)
+        return timeline
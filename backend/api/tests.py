@@ -1,3 +1,1132 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from langchain_core.messages import HumanMessage
+
+from . import graph_rendering
+from .dependency_state import DependencyState
+from .diff_analysis import analyze_diff_content
+from .diff_store import DiffStore, compact_change_summary
+from .directory_rollup import directory_tree, rollup_levels
+from .file_analysis import analyze_file, graph_dependencies, summary_dependencies
+from .file_priority import SummaryReadiness, importance_scores
+from .file_summarizer import FileSummarizer
+from .graph_rendering import (
+    build_function_dependency_graph,
+    ensure_graph_image,
+    submit_graph_render,
+)
+from .history_ingest import (
+    GitHistoryIngester,
+    analyze_commit_shard,
+    filter_existing_objects,
+    list_commits,
+    read_ref_tips,
+    summarize_commits,
+)
+from .history_spill import FileRecordSpill
+from .history_store import HistoryStore
+from .js_extractor import extract_js_module
+from .llm_providers import LLMProvider, ReplayChatModel, ResponseRecording, prompt_key
+from .llm_scheduler import LLMScheduler, TokenBucket
+from .path_filter import PathFilter
+from .python_extractor import extract_python_module
+from .result_cache import PersistentResultCache
+from .snapshot_reader import GitSnapshotReader
+from .summary_prompts import (
+    batch_summary_prompt,
+    parse_batch_summaries,
+    split_structural_chunks,
+)
+from .symbol_index import SymbolIndex
+from .symbol_timeline import SymbolTimeline
+from .utils import GitAnalysisConfig
+
+
+class GitRepoTestCase(SimpleTestCase):
+    """Test case with a scratch git repository built commit by commit"""
+
+    def setUp(self):
+        self.repo_path = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.repo_path, ignore_errors=True)
+        self.git("init", "-q")
+
+    def git(self, *args):
+        return subprocess.run(
+            ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+            cwd=self.repo_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    def write(self, rel_path, content):
+        file_path = self.repo_path / rel_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+
+    def commit(self, message):
+        self.git("add", "-A")
+        self.git("commit", "-q", "-m", message)
+        return self.git("rev-parse", "HEAD").strip()
+
+    def ingest(self, **kwargs):
+        ingester = GitHistoryIngester(self.repo_path, **kwargs)
+        return {commit["commit_hash"]: commit for commit in ingester.iter_commits()}
+
+
+class RenameTests(GitRepoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("pkg/util.py", "def helper():\n    return 1\n")
+        self.write("app.py", "from pkg.util import helper\n")
+        self.first = self.commit("Add helper")
+        self.git("mv", "pkg/util.py", "pkg/helpers.py")
+        self.write("app.py", "from pkg.helpers import helper\n")
+        self.renamed = self.commit("Rename helper module")
+
+    def test_rename_is_a_deletion_and_a_full_add(self):
+        commit = self.ingest()[self.renamed]
+        self.assertIn("pkg/util.py", commit["files_changed"])
+        self.assertIn("pkg/helpers.py", commit["files_changed"])
+        self.assertIsNone(commit["blobs"]["pkg/util.py"])
+        patch = commit["patches"]["pkg/helpers.py"]
+        self.assertIn("new file mode", patch)
+        self.assertIn("+def helper():", patch)
+
+    def test_carried_forward_state_drops_the_rename_source(self):
+        commits = self.ingest()
+        with GitSnapshotReader(self.repo_path) as reader:
+            state = DependencyState(
+                {path: {} for path in reader.snapshot(self.first).paths()}
+            )
+            # The same update _generate_commit_graphs applies to a parent's state
+            commit = commits[self.renamed]
+            state = state.copy()
+            for rel_path in commit["files_changed"]:
+                state.remove(rel_path)
+                if commit["blobs"].get(rel_path) is not None:
+                    state.file_dependencies[rel_path] = {}
+
+            self.assertEqual(
+                set(state.file_dependencies),
+                set(reader.snapshot(self.renamed).paths()),
+            )
+
+
+class SnapshotReaderTests(GitRepoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("docs/read me.txt", "hello\n")
+        self.commit_hash = self.commit("Add a file with spaces in its name")
+
+    def test_reads_paths_with_spaces(self):
+        with GitSnapshotReader(self.repo_path) as reader:
+            self.assertEqual(
+                reader.read_text(f"{self.commit_hash}:docs/read me.txt"), "hello\n"
+            )
+
+    def test_missing_paths_with_spaces_read_as_none(self):
+        with GitSnapshotReader(self.repo_path) as reader:
+            for rel_path in ("docs/no such.txt", "a b"):
+                self.assertIsNone(reader.read_object(f"{self.commit_hash}:{rel_path}"))
+            # The process is still usable afterwards
+            self.assertEqual(
+                reader.read_text(f"{self.commit_hash}:docs/read me.txt"), "hello\n"
+            )
+
+
+class FunctionContextTests(GitRepoTestCase):
+    def change_file(self, rel_path, header):
+        body = "".join(f"    line {index}\n" for index in range(10))
+        self.write(rel_path, f"{header}\n{body}")
+        self.commit(f"Add {rel_path}")
+        self.write(rel_path, f"{header}\n{body.replace('line 8', 'changed')}")
+        return self.commit(f"Change {rel_path}")
+
+    def hunk_header(self, commit_hash, rel_path):
+        patch = self.ingest()[commit_hash]["patches"][rel_path]
+        return next(line for line in patch.splitlines() if line.startswith("@@"))
+
+    def test_builtin_driver_names_the_enclosing_function(self):
+        commit_hash = self.change_file("module.py", "def compute():")
+        self.assertIn("def compute():", self.hunk_header(commit_hash, "module.py"))
+
+    def test_user_attributes_file_keeps_its_diff_drivers(self):
+        attributes_file = self.repo_path / ".git" / "user-attributes"
+        attributes_file.write_text("*.txt diff=sections\n")
+        self.git("config", "core.attributesFile", str(attributes_file))
+        self.git("config", "diff.sections.xfuncname", "^\\[.*\\]$")
+
+        commit_hash = self.change_file("notes.txt", "[intro]")
+        self.assertIn("[intro]", self.hunk_header(commit_hash, "notes.txt"))
+        # The built-in drivers still apply to everything else
+        commit_hash = self.change_file("module.py", "def compute():")
+        self.assertIn("def compute():", self.hunk_header(commit_hash, "module.py"))
+
+
+class PythonCallResolutionTests(SimpleTestCase):
+    def graph(self, files):
+        analyses = {
+            path: analyze_file(path, content) for path, content in files.items()
+        }
+        dependencies = {path: graph_dependencies(a) for path, a in analyses.items()}
+        return build_function_dependency_graph(
+            {
+                path: deps["function_dependencies"]
+                for path, deps in dependencies.items()
+            },
+            {path: deps["file_dependencies"] for path, deps in dependencies.items()},
+        )
+
+    def test_module_calls_keep_their_qualifier(self):
+        module = extract_python_module(
+            "import json\nfrom . import utils\n\n"
+            "def load(text):\n    utils.prepare(text)\n    return json.loads(text)\n"
+        )
+        self.assertEqual(
+            module["function_calls"], {"load": ["utils.prepare", "json.loads"]}
+        )
+
+    def test_module_calls_only_resolve_to_the_module_file(self):
+        graph = self.graph(
+            {
+                "app/main.py": "import json\nfrom . import utils\n\n"
+                "def run(text):\n    utils.prepare(text)\n    return json.loads(text)\n",
+                "app/utils.py": "def prepare(text):\n    return text\n",
+                "app/codec.py": "def loads(text):\n    return text\n\n"
+                "def prepare(text):\n    return text\n",
+            }
+        )
+        self.assertEqual(
+            set(graph.successors("app/main.py:run")), {"app/utils.py:prepare"}
+        )
+
+
+class _Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class _RecordingLLM:
+    """Answers every prompt after `latency` seconds, keeping the prompts in order"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    async def ainvoke(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return _Reply(f"Summary {len(prompt)}")
+
+
+class ImportanceScoresTests(SimpleTestCase):
+    def test_depended_upon_changed_and_entry_point_files_rank_first(self):
+        file_dependencies = {
+            "pkg/core.py": {"file_dependencies": []},
+            "pkg/a.py": {"file_dependencies": ["pkg/core.py", "pkg/core.py"]},
+            "pkg/b.py": {"file_dependencies": ["pkg/core.py", "pkg/missing.py"]},
+            "pkg/c.py": {"file_dependencies": ["pkg/c.py"]},
+            "main.py": {"file_dependencies": []},
+        }
+        scores = importance_scores(file_dependencies, {"pkg/b.py": 5})
+        self.assertEqual(set(scores), set(file_dependencies))
+        ranking = sorted(scores, key=lambda file_path: -scores[file_path])
+        self.assertEqual(ranking[:3], ["main.py", "pkg/core.py", "pkg/b.py"])
+        # Self imports and repeated candidates do not count
+        self.assertEqual(scores["pkg/c.py"], 0.0)
+        self.assertEqual(scores["pkg/a.py"], 0.0)
+
+
+class SummaryReadinessTests(SimpleTestCase):
+    def test_ready_once_when_the_coverage_is_reached(self):
+        # 4 of 10 files came from the cache, 6 have to be summarized
+        readiness = SummaryReadiness(10, 6, 0.6)
+        self.assertEqual(
+            [readiness.complete() for _ in range(6)], [False, True] + [False] * 4
+        )
+        self.assertEqual(readiness.covered, 10)
+
+    def test_not_ready_early_when_the_last_file_reaches_the_coverage(self):
+        readiness = SummaryReadiness(4, 2, 1.0)
+        self.assertEqual([readiness.complete(), readiness.complete()], [False, False])
+
+
+class FileSummarizerSchedulingTests(SimpleTestCase):
+    def test_follow_ups_are_sent_before_less_important_files(self):
+        llm = _RecordingLLM()
+        summarizer = FileSummarizer(llm, LLMScheduler(concurrency=1), chunk_chars=300)
+        dependencies = {
+            key: []
+            for key in (
+                "imports",
+                "functions",
+                "classes",
+                "file_dependencies",
+                "function_calls",
+            )
+        }
+        large = "".join(
+            f"def function_{index}():\n    return {index}\n\n" for index in range(20)
+        )
+        files = [("large.py", large, dependencies)] + [
+            (f"small_{index}.py", "x = 1\n", dependencies) for index in range(3)
+        ]
+        completed = []
+        summarizer.summarize(
+            files, lambda file_path, summary, error: completed.append(file_path)
+        )
+        self.assertEqual(
+            completed, ["large.py", "small_0.py", "small_1.py", "small_2.py"]
+        )
+
+    def test_concurrency_is_capped_across_threads(self):
+        llm = _RecordingLLM(latency=0.02)
+        scheduler = LLMScheduler(concurrency=2)
+        runs = [
+            threading.Thread(
+                target=scheduler.run,
+                args=(
+                    llm,
+                    [(index, f"prompt {index}") for index in range(6)],
+                    lambda *result: None,
+                ),
+            )
+            for _ in range(2)
+        ]
+        for run in runs:
+            run.start()
+        for run in runs:
+            run.join()
+        self.assertEqual(len(llm.prompts), 12)
+        self.assertEqual(llm.max_in_flight, 2)
+
+
+class HistoryIngestTests(GitRepoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("app.py", "def main():\n    return 1\n")
+        self.first = self.commit("Add app")
+        self.write("app.py", "def main():\n    return 2\n")
+        self.write("lib.py", "import os\n")
+        self.second = self.commit("Change app, add lib")
+        self.git("rm", "-q", "lib.py")
+        self.third = self.commit("Remove lib")
+
+    def test_commits_stream_in_chronological_order(self):
+        commits = list(GitHistoryIngester(self.repo_path).iter_commits())
+        self.assertEqual(
+            [commit["commit_hash"] for commit in commits],
+            [self.first, self.second, self.third],
+        )
+        self.assertEqual(
+            list_commits(self.repo_path), [self.first, self.second, self.third]
+        )
+        self.assertEqual(commits[1]["files_changed"], ["app.py", "lib.py"])
+        self.assertIn("+    return 2", commits[1]["patches"]["app.py"])
+        self.assertIsNone(commits[2]["blobs"]["lib.py"])
+
+    def test_resuming_after_the_watermark_only_streams_new_commits(self):
+        tips = read_ref_tips(self.repo_path)
+        self.assertEqual(tips["HEAD"], self.third)
+        self.write("app.py", "def main():\n    return 3\n")
+        fourth = self.commit("Change app again")
+
+        known_tips = filter_existing_objects(self.repo_path, [*tips.values(), "0" * 40])
+        self.assertEqual(set(known_tips), {self.third})
+        commits = self.ingest(revisions=["--all", "--not", *known_tips])
+        self.assertEqual(list(commits), [fourth])
+
+    def test_shards_match_a_single_ingest(self):
+        commit_hashes = list_commits(self.repo_path)
+        single = list(
+            summarize_commits(GitHistoryIngester(self.repo_path).iter_commits())
+        )
+        sharded = analyze_commit_shard(
+            self.repo_path, commit_hashes[:1]
+        ) + analyze_commit_shard(self.repo_path, commit_hashes[1:])
+        self.assertEqual(sharded, single)
+        self.assertEqual(
+            single[1]["change_summaries"]["app.py"]["change_type"], "modification"
+        )
+
+
+class PersistentResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        scratch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch_dir, ignore_errors=True)
+        self.db_path = Path(scratch_dir) / "cache.sqlite3"
+
+    def open_cache(self, **kwargs):
+        cache = PersistentResultCache(self.db_path, **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_hits_and_misses_are_counted(self):
+        cache = self.open_cache()
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", {"functions": ["run"]})
+        self.assertEqual(cache.get("a"), {"functions": ["run"]})
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        cache.reset_stats()
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_entries_survive_reopening(self):
+        cache = PersistentResultCache(self.db_path)
+        cache.put("a", [1, 2])
+        cache.close()
+        self.assertEqual(self.open_cache().get("a"), [1, 2])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.open_cache(max_bytes=100)
+        for key in ("a", "b", "c"):
+            cache.put(key, "x" * 28)
+            time.sleep(0.01)
+        # Reading "a" makes "b" the least recently used entry
+        cache.get("a")
+        time.sleep(0.01)
+        cache.put("d", "x" * 28)
+        self.assertIsNone(cache.get("b"))
+        for key in ("a", "c", "d"):
+            self.assertIsNotNone(cache.get(key))
+        self.assertLessEqual(cache.stats()["size_bytes"], 100)
+
+
+class GraphRenderingTests(SimpleTestCase):
+    def setUp(self):
+        self.graph_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.graph_dir, ignore_errors=True)
+        self.executor = mock.Mock()
+        self.executor.submit.side_effect = lambda *args: Future()
+        patcher = mock.patch.object(
+            graph_rendering, "_get_executor", return_value=self.executor
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rendered_images_are_served_from_disk(self):
+        (self.graph_dir / "file_dependency_abc123.png").write_bytes(b"png")
+        self.assertEqual(
+            ensure_graph_image(self.graph_dir, "file_dependency_abc123.png"),
+            str(self.graph_dir / "file_dependency_abc123.png"),
+        )
+        self.executor.submit.assert_not_called()
+
+    def test_concurrent_requests_share_one_render(self):
+        first = submit_graph_render(self.graph_dir, "file_dependency_abc123.png")
+        second = submit_graph_render(self.graph_dir, "file_dependency_abc123.png")
+        self.assertIs(first, second)
+        other = submit_graph_render(self.graph_dir, "function_dependency_abc123.png")
+        self.assertIsNot(other, first)
+        self.assertEqual(self.executor.submit.call_count, 2)
+
+        # A finished render is not shared with later requests
+        first.set_result("done")
+        other.set_result("done")
+        third = submit_graph_render(self.graph_dir, "file_dependency_abc123.png")
+        self.assertIsNot(third, first)
+        third.set_result("done")
+
+
+class HistoryStoreTests(SimpleTestCase):
+    def setUp(self):
+        scratch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch_dir, ignore_errors=True)
+        self.store = HistoryStore(Path(scratch_dir) / "history.sqlite3")
+        self.addCleanup(self.store.close)
+        commits = [
+            ("c1", "2024-01-01T10:00:00", "ada", ["app.py", "lib.py"]),
+            ("c2", "2024-02-01T10:00:00", "bob", ["app.py"]),
+            ("c3", "2024-03-01T10:00:00", "ada", ["docs.md"]),
+        ]
+        for index, (commit_hash, commit_time, author, files) in enumerate(commits):
+            commit = {
+                "commit_hash": commit_hash,
+                "commit_time": commit_time,
+                "author": author,
+                "commit_message": f"Commit {index}",
+                "files_changed": files,
+            }
+            self.store.add_commit(commit, index)
+            for file_path in files:
+                self.store.add_file_change(
+                    {
+                        "file_name_modified": file_path,
+                        "commit_hash": commit_hash,
+                        "commit_history_index": index,
+                        "commit_time": commit_time,
+                        "change_summary": {
+                            "change_type": "modification",
+                            "lines_added": index + 1,
+                            "lines_removed": 0,
+                            "symbols_changed": [
+                                {
+                                    "symbol": "run",
+                                    "kind": "function",
+                                    "lines_added": index + 1,
+                                    "lines_removed": 0,
+                                }
+                            ],
+                        },
+                    }
+                )
+        self.store.flush()
+
+    def hashes(self, commits):
+        return [commit["commit_hash"] for commit in commits]
+
+    def test_commit_queries(self):
+        self.assertEqual(self.store.commit_count(), 3)
+        self.assertEqual(
+            self.hashes(self.store.iter_commits(batch_size=2)), ["c1", "c2", "c3"]
+        )
+        self.assertEqual(
+            self.store.get_commit("c1")["files_changed"], ["app.py", "lib.py"]
+        )
+        self.assertIsNone(self.store.get_commit("missing"))
+        self.assertEqual(self.hashes(self.store.commits_by_author("ada")), ["c1", "c3"])
+        self.assertEqual(
+            self.hashes(
+                self.store.commits_between("2024-01-15T00:00:00", "2024-03-01T10:00:00")
+            ),
+            ["c2", "c3"],
+        )
+        self.assertEqual(
+            self.hashes(self.store.commits_touching("app.py")), ["c1", "c2"]
+        )
+
+    def test_file_and_symbol_queries(self):
+        self.assertEqual(self.store.file_paths(), ["app.py", "docs.md", "lib.py"])
+        self.assertEqual(
+            self.store.change_counts(), {"app.py": 2, "docs.md": 1, "lib.py": 1}
+        )
+        history = self.store.load_file_history("app.py")
+        self.assertEqual([record["commit_hash"] for record in history], ["c1", "c2"])
+        self.assertEqual(history[1]["change_summary"]["lines_added"], 2)
+        self.assertEqual(
+            [
+                change["commit_hash"]
+                for change in self.store.symbol_history("run", "app.py")
+            ],
+            ["c1", "c2"],
+        )
+        self.assertEqual(len(self.store.symbol_history("run")), 4)
+
+    def test_clear_and_metadata(self):
+        self.store.set_metadata("watermark", {"commit_count": 3})
+        self.assertEqual(self.store.get_metadata("watermark"), {"commit_count": 3})
+        self.store.clear()
+        self.assertEqual(self.store.commit_count(), 0)
+        self.assertIsNone(self.store.get_metadata("watermark"))
+
+
+class FileRecordSpillTests(SimpleTestCase):
+    def test_records_come_out_grouped_by_file_in_chronological_order(self):
+        spill_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spill_root, ignore_errors=True)
+        records = [
+            (
+                file_path,
+                {"commit_time": f"2024-01-{day:02d}", "commit_history_index": day},
+            )
+            for day in (5, 1, 4, 2, 3)
+            for file_path in ("b.py", "a.py")
+        ]
+        with FileRecordSpill(spill_root, max_records=3) as spill:
+            for file_path, record in records:
+                spill.add(file_path, record)
+            # Three full buffers went to disk and one record is still in memory
+            self.assertEqual(len(spill.segment_paths), 3)
+            merged = list(spill.iter_files())
+            spill_dir = spill.spill_dir
+        self.assertFalse(Path(spill_dir).exists())
+
+        self.assertEqual([file_path for file_path, _ in merged], ["a.py", "b.py"])
+        for _, file_records in merged:
+            self.assertEqual(
+                [record["commit_history_index"] for record in file_records],
+                [1, 2, 3, 4, 5],
+            )
+
+
+class DiffAnalysisTests(SimpleTestCase):
+    def test_classifies_changes_and_their_enclosing_symbols(self):
+        summary = analyze_diff_content(
+            "--- a/app.py\n"
+            "+++ b/app.py\n"
+            "@@ -1,6 +1,7 @@ class Service:\n"
+            "-import os\n"
+            "+import sys\n"
+            "     def run(self):\n"
+            "-        return 1\n"
+            "+        return 2\n"
+            "+def added():\n"
+            "+    pass\n"
+        )
+        self.assertEqual(summary["change_type"], "modification")
+        self.assertEqual((summary["lines_added"], summary["lines_removed"]), (4, 2))
+        self.assertEqual(summary["imports_added"], ["sys"])
+        self.assertEqual(summary["imports_removed"], ["os"])
+        self.assertEqual(summary["functions_added"], ["added"])
+        self.assertEqual(summary["functions_modified"], ["run"])
+        self.assertEqual(summary["hunks"][0]["symbol"], "Service")
+        self.assertIn(
+            {"symbol": "run", "kind": "function", "lines_added": 1, "lines_removed": 1},
+            summary["symbols_changed"],
+        )
+
+    def test_pure_additions_and_deletions(self):
+        self.assertEqual(analyze_diff_content("+a\n+b\n")["change_type"], "addition")
+        self.assertEqual(analyze_diff_content("-a\n")["change_type"], "deletion")
+        self.assertEqual(analyze_diff_content("")["change_type"], "unknown")
+
+
+class DiffStoreTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.store = DiffStore(root)
+
+    def test_patches_round_trip_and_are_stored_once(self):
+        diff_ref = self.store.put("+added\n-removed\n")
+        self.assertEqual(self.store.put("+added\n-removed\n"), diff_ref)
+        self.assertIn(diff_ref, self.store)
+        self.assertEqual(self.store.get(diff_ref), "+added\n-removed\n")
+        self.assertIsNone(self.store.get("f" * 64))
+        self.assertIsNone(self.store.get("../not-a-reference"))
+
+    def test_compact_summaries_keep_a_preview(self):
+        patch = "".join(f"+line {index}\n" for index in range(8))
+        summary = compact_change_summary(analyze_diff_content(patch), patch, self.store)
+        self.assertNotIn("additions", summary)
+        self.assertEqual(len(summary["additions_preview"]), 5)
+        self.assertEqual(self.store.get(summary["diff_ref"]), patch)
+
+
+class SymbolTimelineTests(SimpleTestCase):
+    def test_lifetimes_survive_serialization_and_truncation(self):
+        timeline = SymbolTimeline()
+        self.assertEqual(
+            timeline.apply(0, {"functions_added": ["a", "b"]})["functions"], ["a", "b"]
+        )
+        timeline.apply(1, {"functions_removed": ["a"], "classes_added": ["C"]})
+        timeline.apply(2, {"functions_added": ["a"]})
+        self.assertEqual(timeline.present_at(1)["functions"], ["b"])
+        self.assertEqual(sorted(timeline.present_at(2)["functions"]), ["a", "b"])
+
+        restored = SymbolTimeline.from_dict(json.loads(json.dumps(timeline.to_dict())))
+        self.assertEqual(restored.to_dict(), timeline.to_dict())
+
+        restored.truncate(1)
+        self.assertEqual(
+            restored.present_at(5),
+            {"functions": ["a", "b"], "classes": [], "imports": []},
+        )
+        # Replaying after a truncation records the same history again
+        restored.apply(1, {"functions_removed": ["a"], "classes_added": ["C"]})
+        restored.apply(2, {"functions_added": ["a"]})
+        self.assertEqual(restored.to_dict(), timeline.to_dict())
+
+
+class PathFilterTests(GitRepoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write(".gitattributes", "generated/** linguist-generated\n")
+        self.write("src/app.py", "print(1)\n")
+        self.write("generated/api.py", "print(2)\n")
+        self.write("package-lock.json", "{}\n")
+        self.write("web/node_modules/lib/index.js", "1\n")
+        self.commit("Add files")
+
+    def test_excludes_patterns_and_linguist_attributes(self):
+        path_filter = PathFilter(self.repo_path)
+        self.assertFalse(path_filter.excludes("src/app.py"))
+        self.assertTrue(path_filter.excludes("generated/api.py"))
+        self.assertTrue(path_filter.excludes("package-lock.json"))
+        self.assertTrue(path_filter.excludes("web/node_modules/lib/index.js"))
+
+    def test_filtered_paths_are_never_diffed(self):
+        commits = self.ingest(path_filter=PathFilter(self.repo_path))
+        (commit,) = commits.values()
+        self.assertEqual(
+            sorted(commit["files_changed"]), [".gitattributes", "src/app.py"]
+        )
+        report = PathFilter(self.repo_path).report()
+        self.assertEqual(report["skipped_paths"], 3)
+
+    def test_size_threshold(self):
+        path_filter = PathFilter(self.repo_path, max_file_bytes=10)
+        self.assertTrue(path_filter.too_large(11))
+        self.assertFalse(path_filter.too_large(10))
+        self.assertFalse(PathFilter(self.repo_path).too_large(10**9))
+
+
+class JavaScriptExtractorTests(SimpleTestCase):
+    def test_calls_are_attributed_to_the_innermost_function(self):
+        module = extract_js_module(
+            'import { helper } from "./util";\n'
+            "export function run(x) { return helper(x) + local(x); }\n"
+            "function local(y) { const f = () => run(y); return y; }\n"
+            "class Widget { render() { return this.draw(); } draw() { return local(1); } }\n"
+        )
+        self.assertEqual(
+            module["functions"], ["run", "local", "f", "Widget.render", "Widget.draw"]
+        )
+        self.assertEqual(module["classes"], ["Widget"])
+        self.assertEqual(module["function_calls"]["run"], ["helper", "local"])
+        self.assertEqual(module["function_calls"]["f"], ["run"])
+        self.assertEqual(module["function_calls"]["Widget.render"], ["Widget.draw"])
+        self.assertEqual(module["called_by"]["local"], ["run", "Widget.draw"])
+
+    def test_strings_and_comments_are_not_code(self):
+        module = extract_js_module(
+            "function a() { /* b() */ return 'c()'; }\nfunction b() {}\nfunction c() {}\n"
+        )
+        self.assertEqual(module["function_calls"], {})
+
+
+class SymbolIndexTests(SimpleTestCase):
+    def test_resolution_prefers_the_caller_its_imports_then_its_directory(self):
+        index = SymbolIndex.from_function_dependencies(
+            {
+                "a/main.py": {"functions": ["run", "parse"]},
+                "a/util.py": {"functions": ["load"]},
+                "b/util.py": {"functions": ["load"]},
+                "lib/io.py": {"functions": ["load", "save"]},
+            }
+        )
+        self.assertEqual(index.resolve("parse", "b/util.py"), "a/main.py")
+        self.assertEqual(index.resolve("load", "lib/io.py"), "lib/io.py")
+        self.assertEqual(
+            index.resolve("load", "a/main.py", imported_files=["b/util.py"]),
+            "b/util.py",
+        )
+        self.assertEqual(index.resolve("load", "a/main.py"), "a/util.py")
+        self.assertIsNone(index.resolve("missing", "a/main.py"))
+
+        index.remove_file("a/util.py")
+        self.assertEqual(index.defining_files("load"), ["b/util.py", "lib/io.py"])
+        index.add_file("lib/io.py", ["save"])
+        self.assertEqual(index.defining_files("load"), ["b/util.py"])
+
+    def test_dependency_state_copies_keep_their_own_index(self):
+        def functions(*names):
+            return {"functions": list(names), "function_calls": {}, "called_by": {}}
+
+        parent = DependencyState()
+        parent.set_function_dependencies("a.py", functions("load", "run"))
+        parent.set_function_dependencies("b.py", functions("load"))
+
+        child = parent.copy()
+        child.remove("a.py")
+        child.set_function_dependencies("c.py", functions("run"))
+        self.assertEqual(parent.symbol_index.defining_files("load"), ["a.py", "b.py"])
+        self.assertEqual(parent.symbol_index.defining_files("run"), ["a.py"])
+        self.assertEqual(child.symbol_index.defining_files("load"), ["b.py"])
+        self.assertEqual(child.symbol_index.defining_files("run"), ["c.py"])
+
+        # The kept index resolves calls like one built from the maps
+        rebuilt = SymbolIndex.from_function_dependencies(child.function_dependencies)
+        for name in ("load", "run"):
+            self.assertEqual(
+                child.symbol_index.defining_files(name), rebuilt.defining_files(name)
+            )
+
+
+class _FlakyLLM:
+    """Fails its first call with a rate limit error, then echoes the prompt"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED. Please retry in 0.01s")
+        return _Reply(prompt.upper())
+
+
+class LLMSchedulerTests(SimpleTestCase):
+    def test_token_bucket_reservations_go_into_debt(self):
+        now = [0.0]
+        bucket = TokenBucket(60, clock=lambda: now[0])
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertEqual(bucket.reserve(2), 2.0)
+        now[0] = 3.0
+        self.assertEqual(bucket.reserve(1), 0.0)
+        bucket.drain()
+        self.assertEqual(bucket.reserve(1), 1.0)
+        self.assertEqual(TokenBucket(0).reserve(10**6), 0.0)
+
+    def test_token_bucket_is_shared_between_threads(self):
+        bucket = TokenBucket(10, period=10.0, clock=lambda: 0.0)
+        waits = []
+        threads = [
+            threading.Thread(target=lambda: waits.append(bucket.reserve(1)))
+            for _ in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(waits), [0.0] * 10 + [float(n) for n in range(1, 11)])
+
+    def test_rate_limited_calls_are_retried(self):
+        scheduler = LLMScheduler(concurrency=2, base_delay=0.01)
+        llm = _FlakyLLM()
+        results = {}
+        scheduler.run(
+            llm,
+            [("a", "first"), ("b", "second")],
+            lambda key, text, error: results.update({key: (text, error)}),
+        )
+        self.assertEqual(results, {"a": ("FIRST", None), "b": ("SECOND", None)})
+        self.assertEqual((llm.calls, scheduler.retries), (3, 1))
+
+    def test_other_errors_are_reported(self):
+        class BrokenLLM:
+            async def ainvoke(self, prompt):
+                raise ValueError("bad request")
+
+        results = {}
+        LLMScheduler().run(
+            BrokenLLM(),
+            [("a", "prompt")],
+            lambda key, text, error: results.update({key: (text, error)}),
+        )
+        self.assertIsNone(results["a"][0])
+        self.assertIsInstance(results["a"][1], ValueError)
+
+
+class AnalysisServiceTestCase(GitRepoTestCase):
+    """
+    Test case with a GitAnalysisService on the scratch repository, answering
+    with the fake LLM provider and keeping its outputs and caches in a
+    scratch directory
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Creating a configuration clears the app's own output directories
+        with mock.patch.object(
+            GitAnalysisConfig, "_create_directories"
+        ), mock.patch.dict(os.environ, {"LLM_PROVIDER": "fake"}):
+            from .git_analysis_service import GitAnalysisService
+
+            self.service = GitAnalysisService()
+
+        work_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        config = self.service.config
+        config.repos_dir = work_dir / "cloned_repos"
+        config.summaries_dir = work_dir / "summaries"
+        config.git_history_dir = work_dir / "git_file_history_output"
+        config.vector_db_dir = work_dir / "faiss_repo_knowledge"
+        config.cache_dir = work_dir / "cache"
+        config.diff_store_dir = config.cache_dir / "diff_store"
+        for directory in (
+            config.summaries_dir,
+            config.git_history_dir,
+            config.vector_db_dir,
+            config.cache_dir,
+        ):
+            directory.mkdir(parents=True)
+        self.service.state.state_file = work_dir / "project_state.json"
+        self.service.state.update_repo("repo", str(self.repo_path))
+
+    def summarize(self):
+        # Like a new analysis run, which reads every file again
+        self.service.file_index = {}
+        success, message = self.service.summarize_repository_files()
+        self.assertTrue(success, message)
+        return message
+
+
+class SummaryCacheTests(AnalysisServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("pkg/a.py", "def a():\n    return 1\n")
+        self.write("pkg/b.py", "from pkg.a import a\n")
+        self.write("main.py", "print(1)\n")
+        self.commit("Add files")
+
+    def test_unchanged_files_reuse_their_summaries(self):
+        self.assertIn("0 of 3 summaries reused", self.summarize())
+        summaries = dict(self.service.file_summaries)
+        self.assertIn("3 of 3 summaries reused", self.summarize())
+        self.assertEqual(self.service.file_summaries, summaries)
+
+    def test_changed_content_or_model_is_summarized_again(self):
+        self.summarize()
+        self.write("pkg/a.py", "def a():\n    return 2\n")
+        self.assertIn("2 of 3 summaries reused", self.summarize())
+        self.service.llm_provider = LLMProvider("fake", model="another-model")
+        self.assertIn("0 of 3 summaries reused", self.summarize())
+
+
+class _ScriptedLLM:
+    """Answers every prompt with `reply(prompt)`, keeping the prompts in order"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return _Reply(self.reply(prompt))
+
+
+def _no_dependencies():
+    return summary_dependencies(analyze_file("", ""))
+
+
+class BatchSummaryTests(SimpleTestCase):
+    def test_batch_replies_are_parsed_per_file(self):
+        reply = '```json\n{"a.py": "Summary of a", "b.py": "  ", "c.py": 3}\n```'
+        self.assertEqual(
+            parse_batch_summaries(reply, ["a.py", "b.py", "c.py", "d.py"]),
+            {"a.py": "Summary of a"},
+        )
+        self.assertEqual(
+            parse_batch_summaries('Sure! {"a.py": "A"} Hope this helps', ["a.py"]),
+            {"a.py": "A"},
+        )
+        self.assertEqual(parse_batch_summaries("not json", ["a.py"]), {})
+
+    def summarize(self, llm):
+        summarizer = FileSummarizer(
+            llm,
+            LLMScheduler(concurrency=1),
+            batch_tokens=1000,
+            batch_file_tokens=500,
+            batch_max_files=8,
+        )
+        files = [
+            (file_path, "x = 1\n", _no_dependencies())
+            for file_path in ("a.py", "b.py", "c.py")
+        ]
+        summaries = {}
+        summarizer.summarize(
+            files,
+            lambda file_path, summary, error: summaries.update({file_path: summary}),
+        )
+        return summaries
+
+    def test_files_missing_from_a_batch_reply_are_summarized_alone(self):
+        def reply(prompt):
+            if "Respond with a single JSON object" in prompt:
+                return '{"a.py": "Summary of a", "b.py": ""}'
+            return "Single summary"
+
+        llm = _ScriptedLLM(reply)
+        self.assertEqual(
+            self.summarize(llm),
+            {
+                "a.py": "Summary of a",
+                "b.py": "Single summary",
+                "c.py": "Single summary",
+            },
+        )
+        self.assertEqual(len(llm.prompts), 3)
+
+    def test_unparsable_batch_replies_fall_back_to_single_files(self):
+        llm = _ScriptedLLM(
+            lambda prompt: (
+                "Sorry, I can not do that"
+                if "Respond with a single JSON object" in prompt
+                else "Single summary"
+            )
+        )
+        self.assertEqual(set(self.summarize(llm).values()), {"Single summary"})
+        self.assertEqual(len(llm.prompts), 4)
+
+
+class ChunkedSummaryTests(SimpleTestCase):
+    def test_chunks_are_cut_between_definitions(self):
+        functions = [
+            f"def function_{index}():\n"
+            + "    value = 1\n" * 5
+            + "    return value\n\n"
+            for index in range(6)
+        ]
+        content = "".join(functions)
+        chunks = split_structural_chunks(content, 300)
+        self.assertEqual("".join(text for _, _, text in chunks), content)
+        for first_line, last_line, text in chunks:
+            self.assertLessEqual(len(text), 300)
+            self.assertTrue(text.startswith("def "))
+            self.assertEqual(last_line - first_line + 1, len(text.splitlines()))
+
+    def test_long_lines_are_split(self):
+        chunks = split_structural_chunks("x" * 250, 100)
+        self.assertEqual([len(text) for _, _, text in chunks], [100, 100, 50])
+
+    def summarize(self, llm, content):
+        summarizer = FileSummarizer(llm, LLMScheduler(concurrency=2), chunk_chars=300)
+        results = []
+        summarizer.summarize(
+            [("large.py", content, _no_dependencies())],
+            lambda *result: results.append(result),
+        )
+        return results
+
+    def test_chunk_summaries_are_merged_level_by_level(self):
+        content = "".join(
+            f"def function_{index}():\n    return {index}\n\n" for index in range(40)
+        )
+
+        def reply(prompt):
+            part = re.search(r"Below is part (\d+) of", prompt)
+            if part:
+                # Long part summaries do not fit one merge prompt
+                return f"Part {part.group(1)} " + "x" * 100
+            if "Combine them into one summary of those parts" in prompt:
+                return "Merged parts"
+            return "Whole file"
+
+        llm = _ScriptedLLM(reply)
+        self.assertEqual(
+            self.summarize(llm, content), [("large.py", "Whole file", None)]
+        )
+        chunk_prompts = [prompt for prompt in llm.prompts if "Below is part" in prompt]
+        self.assertEqual(len(chunk_prompts), len(split_structural_chunks(content, 300)))
+        self.assertIn("Merged parts", llm.prompts[-1])
+        self.assertNotIn("x" * 100, llm.prompts[-1])
+
+    def test_a_failed_chunk_fails_the_file_once(self):
+        class BrokenLLM:
+            async def ainvoke(self, prompt):
+                raise ValueError("bad request")
+
+        content = "".join(f"def f{index}():\n    pass\n\n" for index in range(40))
+        results = self.summarize(BrokenLLM(), content)
+        self.assertEqual([result[:2] for result in results], [("large.py", None)])
+        self.assertIsInstance(results[0][2], ValueError)
+
+
+class DirectoryRollupTests(AnalysisServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("pkg/a.py", "def a():\n    return 1\n")
+        self.write("pkg/b.py", "from pkg.a import a\n")
+        self.write("lib/c.py", "def c():\n    return 3\n")
+        self.write("main.py", "print(1)\n")
+        self.commit("Add files")
+
+    def test_children_are_summarized_before_their_parents(self):
+        tree = directory_tree(["pkg/sub/a.py", "pkg/b.py", "main.py"])
+        self.assertEqual(
+            tree["pkg"], {"files": ["pkg/b.py"], "directories": ["pkg/sub"]}
+        )
+        self.assertEqual(tree[""]["directories"], ["pkg"])
+        self.assertEqual(rollup_levels(tree), [["pkg/sub"], ["pkg"], [""]])
+
+    def test_unchanged_directories_reuse_their_rollups(self):
+        self.summarize()
+        success, message = self.service.summarize_directories()
+        self.assertTrue(success, message)
+        self.assertIn("Built 3 directory summaries (0 unchanged", message)
+        self.assertIn("(3 unchanged", self.service.summarize_directories()[1])
+
+        # Only pkg/ and the repository overview depend on the changed file
+        self.write("pkg/a.py", "def a():\n    return 2\n")
+        self.summarize()
+        self.assertIn("(1 unchanged", self.service.summarize_directories()[1])
+        with open(
+            self.service.config.summaries_dir / "directory_summaries.json"
+        ) as file:
+            self.assertEqual(list(json.load(file)), ["", "lib", "pkg"])
+
+
+class LLMProviderTests(SimpleTestCase):
+    def setUp(self):
+        scratch_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch_dir, ignore_errors=True)
+        self.recording_file = Path(scratch_dir) / "recording.jsonl"
+
+    def test_fake_replies_are_deterministic_and_answer_batches(self):
+        llm = LLMProvider("fake").chat_model()
+        prompt = batch_summary_prompt(
+            [
+                (path, "print(1)\n", summary_dependencies(analyze_file(path, "")))
+                for path in ("a.py", "b.py")
+            ]
+        )
+        reply = llm.invoke(prompt).content
+        self.assertEqual(reply, llm.invoke(prompt).content)
+        self.assertEqual(
+            set(parse_batch_summaries(reply, ["a.py", "b.py"])), {"a.py", "b.py"}
+        )
+        self.assertEqual(asyncio.run(llm.ainvoke(prompt)).content, reply)
+
+    def test_replay_answers_recorded_requests_only(self):
+        recording = ResponseRecording(self.recording_file)
+        messages = [HumanMessage(content="What does app.py do?")]
+        recording.put(prompt_key("model", 0.0, messages), "It runs the app", 1.5)
+
+        # The recording is read back from disk by a new run
+        replay = LLMProvider(
+            "replay",
+            model="model",
+            recording_file=self.recording_file,
+            replay_latency=0,
+        )
+        llm = replay.chat_model()
+        self.assertIsInstance(llm, ReplayChatModel)
+        self.assertEqual(llm.invoke(messages).content, "It runs the app")
+        with self.assertRaises(LookupError):
+            llm.invoke("Something never recorded")
+        self.assertEqual((replay.recording.hits, replay.recording.misses), (1, 1))
+
+    def test_unknown_providers_are_rejected(self):
+        with self.assertRaises(ValueError):
+            LLMProvider("openai")
+
+
+class OversizedGraphFileTests(AnalysisServiceTestCase):
+    def dependencies(self, index, commit_hash):
+        graph_dir = (
+            self.service.config.git_history_dir
+            / "graphs"
+            / f"{index}_commit_{commit_hash[:8]}_graphs"
+        )
+        with open(graph_dir / f"dependencies_{commit_hash[:8]}.json") as file:
+            return json.load(file)["file_dependencies"]
+
+    def test_oversized_versions_are_left_out_and_counted(self):
+        self.service.config.history_max_file_bytes = 200
+        self.write("app.py", "from lib import grow\n")
+        self.write("lib.py", "def grow():\n    return 1\n")
+        self.write("huge.py", "x = 1\n" * 100)
+        first = self.commit("Add files")
+        self.write("lib.py", "def grow():\n    return 1\n" + "# padding\n" * 30)
+        second = self.commit("Grow lib.py past the size limit")
+
+        success, message = self.service.analyze_git_history()
+        self.assertTrue(success, message)
+        self.assertIn("2 files had versions above 200 bytes", message)
+        self.assertEqual(set(self.dependencies(1, first)), {"app.py", "lib.py"})
+        # The carried-forward state drops lib.py instead of keeping its old version
+        self.assertEqual(set(self.dependencies(2, second)), {"app.py"})
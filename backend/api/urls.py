@@ -9,4 +9,5 @@ urlpatterns = [
     path("graph-folders/", views.list_graph_folders, name="graph_folders"),
     path("graph-folders/<str:folder_name>/", views.get_graph_folder_details, name="graph_folder_details"),
     path("graph-file/<str:folder>/<str:filename>", views.serve_graph_file, name="serve_graph_file"),
+    path("patch/<str:diff_ref>/", views.get_patch, name="get_patch"),
 ]
\ No newline at end of file
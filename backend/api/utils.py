@@ -28,6 +28,98 @@ class GitAnalysisConfig:
         self.summaries_dir = self.base_dir / "summaries"
         self.git_history_dir = self.base_dir / "git_file_history_output"
         self.vector_db_dir = self.base_dir / "faiss_repo_knowledge"
+        # Persistent caches; never wiped on startup
+        self.cache_dir = self.base_dir / "cache"
+        # Compressed patch bodies referenced by the history's change summaries
+        self.diff_store_dir = self.cache_dir / "diff_store"
+
+        # Keep cloned repositories and history output between runs so a
+        # re-analysis only has to process commits added since the last one
+        self.incremental_history = (
+            os.getenv("INCREMENTAL_HISTORY", "true").lower() == "true"
+        )
+
+        # Also write the full history as repo_history.json next to the SQLite history store
+        self.export_history_json = (
+            os.getenv("EXPORT_HISTORY_JSON", "true").lower() == "true"
+        )
+
+        # Paths left out of history analysis, as comma-separated gitignore patterns;
+        # unset uses path_filter.DEFAULT_EXCLUDE_PATTERNS (lock files, build output,
+        # vendored code), an empty value disables pattern filtering
+        exclude_patterns = os.getenv("HISTORY_EXCLUDE_PATTERNS")
+        self.history_exclude_patterns = (
+            [pattern for pattern in exclude_patterns.split(",") if pattern.strip()]
+            if exclude_patterns is not None
+            else None
+        )
+        # Also skip files marked linguist-generated or linguist-vendored in .gitattributes
+        self.history_linguist_attributes = (
+            os.getenv("HISTORY_LINGUIST_ATTRIBUTES", "true").lower() == "true"
+        )
+        # File versions larger than this are not diffed or parsed for dependencies
+        # (0 = no limit); working tree files above it are still summarized in chunks
+        self.history_max_file_bytes = int(
+            os.getenv("HISTORY_MAX_FILE_BYTES", "1000000")
+        )
+
+        # Per-file history records held in memory before they are spilled to disk
+        self.history_max_records = int(os.getenv("HISTORY_MAX_RECORDS", "50000"))
+
+        # Worker processes used to analyze commit shards in parallel (1 = sequential)
+        self.history_workers = int(os.getenv("HISTORY_WORKERS", "1"))
+        self.history_shard_size = int(os.getenv("HISTORY_SHARD_SIZE", "250"))
+
+        # Dependency states of recent commits kept so children only re-extract changed files
+        self.dependency_state_cache_size = int(
+            os.getenv("DEPENDENCY_STATE_CACHE_SIZE", "32")
+        )
+
+        # Size budget of the blob-keyed dependency extraction cache
+        self.dependency_cache_max_mb = int(os.getenv("DEPENDENCY_CACHE_MAX_MB", "256"))
+        # Size budget of the LLM file summary cache, least recently used first out
+        self.summary_cache_max_mb = int(os.getenv("SUMMARY_CACHE_MAX_MB", "256"))
+
+        # Graph images are rendered on demand by a pool of worker processes;
+        # optionally the images of the last N commits are rendered eagerly
+        self.graph_render_workers = int(os.getenv("GRAPH_RENDER_WORKERS", "2"))
+        self.graph_prerender_last_n = int(os.getenv("GRAPH_PRERENDER_LAST_N", "0"))
+
+        # File summaries are requested concurrently within these provider budgets
+        # (0 = unlimited); rate limited calls are retried up to LLM_MAX_RETRIES times
+        self.llm_concurrency = int(os.getenv("LLM_CONCURRENCY", "8"))
+        self.llm_requests_per_minute = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+        self.llm_tokens_per_minute = int(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+        # Expected tokens per response, counted against the tokens per minute budget
+        self.llm_output_tokens = int(os.getenv("LLM_OUTPUT_TOKENS", "1024"))
+        # Files of up to SUMMARY_BATCH_FILE_TOKENS are summarized several per request,
+        # up to SUMMARY_BATCH_TOKENS of file content per prompt (0 = no batching)
+        self.summary_batch_tokens = int(os.getenv("SUMMARY_BATCH_TOKENS", "6000"))
+        self.summary_batch_file_tokens = int(
+            os.getenv("SUMMARY_BATCH_FILE_TOKENS", "1000")
+        )
+        self.summary_batch_max_files = int(os.getenv("SUMMARY_BATCH_MAX_FILES", "8"))
+        # Files with more characters than this are summarized in chunks of at most
+        # this size whose summaries are then merged, so prompts stay bounded
+        self.summary_chunk_chars = int(os.getenv("SUMMARY_CHUNK_CHARS", "100000"))
+        # Fraction of files that must be summarized before a first vector index is
+        # published; the rest are summarized meanwhile and the index rebuilt (1 = off)
+        self.summary_ready_coverage = float(os.getenv("SUMMARY_READY_COVERAGE", "0.5"))
+
+        # Backend of every LLM call: "google", "fake" (deterministic offline replies
+        # after LLM_FAKE_LATENCY seconds), "record" (google, saving each reply to
+        # LLM_RECORDING_FILE) or "replay" (recorded replies only, after their recorded
+        # latency unless LLM_REPLAY_LATENCY gives one in seconds)
+        self.llm_provider = os.getenv("LLM_PROVIDER", "google").lower()
+        self.llm_recording_file = Path(
+            os.getenv("LLM_RECORDING_FILE", str(self.cache_dir / "llm_recording.jsonl"))
+        )
+        self.llm_fake_latency = float(os.getenv("LLM_FAKE_LATENCY", "0"))
+        replay_latency = os.getenv("LLM_REPLAY_LATENCY", "recorded")
+        self.llm_replay_latency = (
+            None if replay_latency == "recorded" else float(replay_latency)
+        )
 
         # Create directories if they don't exist
         self._create_directories()
@@ -38,13 +130,13 @@ class GitAnalysisConfig:
 
     def _create_directories(self):
         """Create necessary directories if they don't exist"""
-        if self.repos_dir.exists():
+        if self.repos_dir.exists() and not self.incremental_history:
             shutil.rmtree(self.repos_dir, ignore_errors=True)
 
         if self.summaries_dir.exists():
             shutil.rmtree(self.summaries_dir, ignore_errors=True)
 
-        if self.git_history_dir.exists():
+        if self.git_history_dir.exists() and not self.incremental_history:
             shutil.rmtree(self.git_history_dir, ignore_errors=True)
 
         if self.vector_db_dir.exists():
@@ -54,9 +146,10 @@ class GitAnalysisConfig:
         self.summaries_dir.mkdir(exist_ok=True)
         self.git_history_dir.mkdir(exist_ok=True)
         self.vector_db_dir.mkdir(exist_ok=True)
+        self.cache_dir.mkdir(exist_ok=True)
 
         graph_folder = self.git_history_dir / "graphs"
-        if graph_folder.exists():
+        if graph_folder.exists() and not self.incremental_history:
             shutil.rmtree(graph_folder, ignore_errors=True)
         graph_folder.mkdir(exist_ok=True)
 
@@ -73,6 +166,7 @@ class GitProjectState:
         self.current_repo_name = None
         self.current_repo_path = None
         self.analysis_complete = False
+        self.early_index_ready = False
         self.vector_db_loaded = False
         self.state_file = Path(__file__).resolve().parent.parent / "project_state.json"
 
@@ -84,6 +178,7 @@ class GitProjectState:
         self.current_repo_name = repo_name
         self.current_repo_path = repo_path
         self.analysis_complete = False
+        self.early_index_ready = False
         self.vector_db_loaded = False
         self.save_state()
 
@@ -92,6 +187,16 @@ class GitProjectState:
         self.analysis_complete = True
         self.save_state()
 
+    def mark_early_index_ready(self):
+        """Mark that an index of the most important files is published"""
+        self.early_index_ready = True
+        self.save_state()
+
+    @property
+    def index_ready(self):
+        """Whether any index, early or final, can answer questions"""
+        return self.analysis_complete or self.early_index_ready
+
     def mark_vector_db_loaded(self):
         """Mark that the vector database is loaded"""
         self.vector_db_loaded = True
@@ -103,6 +208,7 @@ class GitProjectState:
             "current_repo_name": self.current_repo_name,
             "current_repo_path": self.current_repo_path,
             "analysis_complete": self.analysis_complete,
+            "early_index_ready": self.early_index_ready,
             "vector_db_loaded": self.vector_db_loaded,
         }
 
@@ -119,6 +225,7 @@ class GitProjectState:
                 self.current_repo_name = state_data.get("current_repo_name")
                 self.current_repo_path = state_data.get("current_repo_path")
                 self.analysis_complete = state_data.get("analysis_complete", False)
+                self.early_index_ready = state_data.get("early_index_ready", False)
                 self.vector_db_loaded = state_data.get("vector_db_loaded", False)
 
                 logger.info(f"Loaded project state: {self.current_repo_name}")
@@ -206,3 +313,15 @@ def count_files_in_directory(directory, skip_binary=True):
             if not skip_binary or not is_binary_file(file_path):
                 count += 1
     return count
+
+
+def write_text_atomic(file_path, text):
+    """
+    Write a text file under a temporary name and move it into place, so a
+    reader running meanwhile sees the old or the new file, never a partial one
+    """
+    file_path = Path(file_path)
+    temp_path = file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temp_path, file_path)
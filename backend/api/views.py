@@ -17,6 +17,7 @@ import re
 
 # Import our services
 from .git_analysis_service import GitAnalysisService
+from .graph_rendering import ensure_graph_image, graph_image_names, is_graph_image
 from .utils import extract_github_url
 
 # Set up logging
@@ -54,8 +55,9 @@ conversation = ConversationChain(
     prompt=chat_prompt,
 )
 
-# Global retrieval chain
+# Global retrieval chain, and the index generation it was built on
 retrieval_chain = None
+retrieval_chain_generation = None
 
 # Flag to indicate if repository knowledge has been requested
 repo_knowledge_requested = False
@@ -63,13 +65,19 @@ repo_knowledge_requested = False
 
 def initialize_retrieval_chain_wrapper():
     """Initialize retrieval chain and assign it to the global variable"""
-    global retrieval_chain
-
-    # Only initialize if not already initialized
-    if retrieval_chain is None:
+    global retrieval_chain, retrieval_chain_generation
+
+    # Only initialize if not already initialized on the latest index, which
+    # the analysis workflow may replace after its response has ended
+    if (
+        retrieval_chain is None
+        or retrieval_chain_generation != git_service.index_generation
+    ):
+        generation = git_service.index_generation
         success, chain_or_error = git_service.initialize_retrieval_chain()
         if success:
             retrieval_chain = chain_or_error
+            retrieval_chain_generation = generation
             logger.info("Retrieval chain initialized and assigned to global variable")
             return True
         else:
@@ -99,19 +107,27 @@ def chat_with_llm(request):
     if is_analysis_intent and github_url:
         # Run the analysis workflow if intent is detected
         def workflow_generator_wrapper():
+            global retrieval_chain, repo_knowledge_requested
             workflow_generator = git_service.run_analysis_workflow(github_url)
+            chain_generation = git_service.index_generation
 
             # Yield all the updates from the original generator
             for update in workflow_generator():
                 yield update
 
-            # After workflow completes, initialize the retrieval chain
-            if git_service.state.analysis_complete:
+                # Set up retrieval as soon as a vector database is published,
+                # and again when the workflow replaces an early one
+                if (
+                    not git_service.state.index_ready
+                    or git_service.index_generation == chain_generation
+                ):
+                    continue
+                chain_generation = git_service.index_generation
+                retrieval_chain = None
                 yield "Setting up retrieval system...\n"
                 if initialize_retrieval_chain_wrapper():
                     yield "Retrieval system is ready! You can now ask questions about the repository.\n"
                     # Mark that repository knowledge is now available and requested
-                    global repo_knowledge_requested
                     repo_knowledge_requested = True
                 else:
                     yield "Failed to initialize retrieval system. Please try again.\n"
@@ -128,8 +144,12 @@ def chat_with_llm(request):
     def stream_response():
         global retrieval_chain, repo_knowledge_requested
 
-        # Check if this query potentially needs repository knowledge
-        if git_service.state.vector_db_loaded:
+        # Check if this query potentially needs repository knowledge; the
+        # workflow may have published an index after its response ended
+        index_available = (
+            git_service.state.vector_db_loaded or git_service.state.index_ready
+        )
+        if index_available:
             # Check if this is a first request for repository knowledge
             if not repo_knowledge_requested:
                 # This is the first query that might need repository knowledge
@@ -176,11 +196,10 @@ def chat_with_llm(request):
                         initialize_retrieval_chain_wrapper()
 
         # Decision logic for which chain to use
-        if repo_knowledge_requested and git_service.state.vector_db_loaded:
-            # Repository knowledge was requested previously, use RAG for all future queries
-            if retrieval_chain is None:
-                # Ensure retrieval chain is initialized
-                initialize_retrieval_chain_wrapper()
+        if repo_knowledge_requested and index_available:
+            # Repository knowledge was requested previously, use RAG for all future
+            # queries; ensure retrieval chain is initialized on the latest index
+            initialize_retrieval_chain_wrapper()
 
             if retrieval_chain:
                 # Use RAG-based answering
@@ -240,6 +259,7 @@ def repository_status(request):
         {
             "current_repo": git_service.state.current_repo_name,
             "analysis_complete": git_service.state.analysis_complete,
+            "early_index_ready": git_service.state.early_index_ready,
             "vector_db_loaded": git_service.state.vector_db_loaded,
             "retrieval_chain_active": retrieval_chain is not None,
             "repo_knowledge_requested": repo_knowledge_requested,
@@ -284,7 +304,7 @@ def reset_retrieval_chain(request):
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def list_graph_folders(request):
-    base_path = "/Users/mehulvarshney/Documents/College/Sem 4/IntroToLLM/project/backend/git_file_history_output/graphs"
+    base_path = str(git_service.config.git_history_dir / "graphs")
     try:
         folders = [
             f
@@ -302,7 +322,7 @@ def list_graph_folders(request):
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_graph_folder_details(request, folder_name):
-    base_path = "/Users/mehulvarshney/Documents/College/Sem 4/IntroToLLM/project/backend/git_file_history_output/graphs"
+    base_path = str(git_service.config.git_history_dir / "graphs")
     folder_path = os.path.join(base_path, folder_name)
     
     try:
@@ -320,8 +340,13 @@ def get_graph_folder_details(request, folder_name):
                     file_image = file
                 elif "function" in file.lower() or "call" in file.lower():
                     functional_image = file
-            elif file == "dependencies.json":
+            elif file.startswith("dependencies_") and file.endswith(".json"):
                 dependencies_file = file
+
+        # Images are rendered lazily, so report the names serve_graph_file can produce
+        if dependencies_file:
+            short_hash = dependencies_file[len("dependencies_") : -len(".json")]
+            file_image, functional_image = graph_image_names(short_hash)
         
         # Load dependencies if available
         dependencies = {}
@@ -346,14 +371,37 @@ def get_graph_folder_details(request, folder_name):
 @authentication_classes([JWTAuthentication])
 @permission_classes([IsAuthenticated])
 def serve_graph_file(request, folder, filename):
-    base_path = "/Users/mehulvarshney/Documents/College/Sem 4/IntroToLLM/project/backend/git_file_history_output/graphs"
+    base_path = str(git_service.config.git_history_dir / "graphs")
     file_path = os.path.join(base_path, folder, filename)
     
     try:
         if not os.path.exists(file_path):
-            return JsonResponse({"error": "File not found"}, status=404)
+            if not is_graph_image(filename) or not os.path.isdir(os.path.dirname(file_path)):
+                return JsonResponse({"error": "File not found"}, status=404)
+
+            # Render the graph image on first request and keep it on disk
+            file_path = ensure_graph_image(
+                os.path.dirname(file_path),
+                filename,
+                max_workers=git_service.config.graph_render_workers,
+            )
         
         return FileResponse(open(file_path, 'rb'))
     except Exception as e:
         logger.error(f"Failed to serve graph file: {str(e)}")
-        return JsonResponse({"error": f"Failed to serve file: {str(e)}"}, status=500)
\ No newline at end of file
+        return JsonResponse({"error": f"Failed to serve file: {str(e)}"}, status=500)
+
+
+# Serve the full patch behind a change summary's diff_ref
+@api_view(["GET"])
+@authentication_classes([JWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_patch(request, diff_ref):
+    try:
+        patch = git_service.load_patch(diff_ref)
+        if patch is None:
+            return JsonResponse({"error": "Patch not found"}, status=404)
+        return JsonResponse({"diff_ref": diff_ref, "patch": patch})
+    except Exception as e:
+        logger.error(f"Failed to load patch: {str(e)}")
+        return JsonResponse({"error": f"Failed to load patch: {str(e)}"}, status=500)
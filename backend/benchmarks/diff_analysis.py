@@ -0,0 +1,175 @@
+"""
+Microbenchmark the single-pass diff classifier against the regex-based
+_analyze_diff_content it replaced.
+
+Usage (from the backend directory):
+    python -m benchmarks.diff_analysis /path/to/repo [--max-commits N] [--repeat R]
+
+The patches of the repository's history are collected once with the streaming
+ingester, then both implementations summarize every patch R times. The script
+reports throughput and how many summaries differ. Hunks and symbols are new,
+so they are ignored; functions_modified may gain functions edited in their body.
+
+The old patterns let whitespace match newlines, so a bare "+" or "-" line
+followed by a definition counted that definition as added or removed even on
+a context line. Summaries that differ only that way are reported as legacy
+false positives: they match the old implementation with the patterns confined
+to one line. Any other difference is reported as a regression.
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.diff_analysis import analyze_diff_content  # noqa: E402
+from api.history_ingest import GitHistoryIngester  # noqa: E402
+
+# Whitespace of the legacy patterns confined to one line
+ONE_LINE_WHITESPACE = r"[ \t]*"
+
+
+def legacy_analyze_diff_content(diff_text, whitespace=r"\s*"):
+    """
+    The previous implementation: a line loop plus six multiline regex scans
+    With whitespace=ONE_LINE_WHITESPACE the patterns no longer match across lines
+    """
+    summary = {
+        "lines_added": 0,
+        "lines_removed": 0,
+        "additions": [],
+        "deletions": [],
+        "modifications": [],
+        "functions_added": [],
+        "functions_modified": [],
+        "functions_removed": [],
+        "change_type": "unknown",
+    }
+
+    function_pattern = re.compile(
+        rf"^[\+\-]{whitespace}def\s+([a-zA-Z0-9_]+){whitespace}\(", re.MULTILINE
+    )
+    class_pattern = re.compile(
+        rf"^[\+\-]{whitespace}class\s+([a-zA-Z0-9_]+)", re.MULTILINE
+    )
+    import_pattern = re.compile(
+        rf"^[\+\-]{whitespace}(?:import|from)\s+([^\s]+)", re.MULTILINE
+    )
+
+    for line in diff_text.split("\n"):
+        if line.startswith("+") and not line.startswith("+++"):
+            summary["lines_added"] += 1
+            summary["additions"].append(line[1:].strip())
+        elif line.startswith("-") and not line.startswith("---"):
+            summary["lines_removed"] += 1
+            summary["deletions"].append(line[1:].strip())
+
+    def matches(pattern, sign):
+        return [
+            m.group(1)
+            for m in pattern.finditer(diff_text)
+            if m.group(0).startswith(sign)
+        ]
+
+    added_functions = matches(function_pattern, "+")
+    removed_functions = matches(function_pattern, "-")
+    modified_functions = set(added_functions) & set(removed_functions)
+    summary["functions_added"] = list(set(added_functions) - modified_functions)
+    summary["functions_removed"] = list(set(removed_functions) - modified_functions)
+    summary["functions_modified"] = list(modified_functions)
+
+    if summary["lines_added"] > 0 and summary["lines_removed"] == 0:
+        summary["change_type"] = "addition"
+    elif summary["lines_added"] == 0 and summary["lines_removed"] > 0:
+        summary["change_type"] = "deletion"
+    elif summary["lines_added"] > 0 and summary["lines_removed"] > 0:
+        summary["change_type"] = "modification"
+
+    summary["classes_added"] = matches(class_pattern, "+")
+    summary["classes_removed"] = matches(class_pattern, "-")
+    summary["imports_added"] = matches(import_pattern, "+")
+    summary["imports_removed"] = matches(import_pattern, "-")
+    return summary
+
+
+def collect_patches(repo_path, max_commits=None):
+    patches = []
+    for i, commit in enumerate(GitHistoryIngester(repo_path).iter_commits()):
+        if max_commits is not None and i >= max_commits:
+            break
+        patches.extend(
+            commit["patches"].get(path, "") for path in commit["files_changed"]
+        )
+    return patches
+
+
+def comparable(summary):
+    """Drop the new fields and make the set-derived function lists order-free"""
+    summary = {
+        key: value
+        for key, value in summary.items()
+        if key not in ("hunks", "symbols_changed", "functions_modified")
+    }
+    for key in ("functions_added", "functions_removed"):
+        summary[key] = sorted(summary[key])
+    return summary
+
+
+def same_summary(old, new):
+    return comparable(old) == comparable(new) and set(old["functions_modified"]) <= set(
+        new["functions_modified"]
+    )
+
+
+def run(name, func, patches, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        summaries = [func(diff_text) for diff_text in patches]
+    elapsed = time.perf_counter() - start
+    megabytes = sum(len(diff_text) for diff_text in patches) * repeat / 1024 / 1024
+    print(
+        f"{name:<12} diffs={len(patches) * repeat:<8} wall={elapsed:.3f}s "
+        f"throughput={megabytes / elapsed:.1f} MB/s"
+    )
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("repo_path")
+    parser.add_argument("--max-commits", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    patches = collect_patches(args.repo_path, args.max_commits)
+    legacy = run("legacy", legacy_analyze_diff_content, patches, args.repeat)
+    single_pass = run("single-pass", analyze_diff_content, patches, args.repeat)
+
+    differing = [
+        index
+        for index, (old, new) in enumerate(zip(legacy, single_pass))
+        if not same_summary(old, new)
+    ]
+    regressions = [
+        index
+        for index in differing
+        if not same_summary(
+            legacy_analyze_diff_content(patches[index], whitespace=ONE_LINE_WHITESPACE),
+            single_pass[index],
+        )
+    ]
+    print(f"summaries with differing output: {len(differing)}")
+    print(
+        f"  legacy false positives (definitions matched across lines): "
+        f"{len(differing) - len(regressions)}"
+    )
+    print(f"  regressions: {len(regressions)}")
+    for index in regressions[:5]:
+        print(f"  patch #{index}: {patches[index].splitlines()[0]}")
+
+
+if __name__ == "__main__":
+    main()
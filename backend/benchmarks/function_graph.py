@@ -0,0 +1,132 @@
+"""
+Benchmark building the function call graph with the symbol index against the
+per-edge scan over every file it replaced.
+
+Usage (from the backend directory):
+    python -m benchmarks.function_graph [dependencies.json] [--files N] [--functions F]
+
+Without a path, a synthetic snapshot of N files with F functions each is
+generated. Every function calls a local function and two functions of other
+files, and some names are defined in several files. Otherwise the file and
+function dependencies of a commit's dependencies_<hash>.json are used. The
+legacy builder scans every file's function list for each cross-file edge.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.graph_rendering import build_function_dependency_graph  # noqa: E402
+
+
+def legacy_build_function_dependency_graph(function_dependencies):
+    """The previous implementation: first file whose function list has the name"""
+    import networkx as nx
+
+    G = nx.DiGraph()
+    all_functions = {}
+    for file_path, func_info in function_dependencies.items():
+        for func_name in func_info["functions"]:
+            node_id = f"{file_path}:{func_name}"
+            G.add_node(node_id, function=func_name, file=file_path)
+            all_functions[node_id] = func_name
+
+    for file_path, func_info in function_dependencies.items():
+        for caller, callees in func_info["function_calls"].items():
+            caller_id = f"{file_path}:{caller}"
+            for callee in callees:
+                callee_id = f"{file_path}:{callee}"
+                if callee_id in all_functions:
+                    G.add_edge(caller_id, callee_id)
+                else:
+                    for other_file, other_info in function_dependencies.items():
+                        if (
+                            other_file != file_path
+                            and callee in other_info["functions"]
+                        ):
+                            G.add_edge(caller_id, f"{other_file}:{callee}")
+                            break
+    return G
+
+
+def synthetic_snapshot(file_count, function_count, seed=0):
+    rng = random.Random(seed)
+    paths = [f"pkg{index % 20}/module_{index}.py" for index in range(file_count)]
+    # A few generic names such as "setup_3" are defined in many files
+    names = {
+        path: [f"{path.split('/')[1][:-3]}_f{index}" for index in range(function_count)]
+        + [f"setup_{rng.randrange(5)}"]
+        for path in paths
+    }
+
+    function_dependencies = {}
+    file_dependencies = {}
+    for path in paths:
+        imported = rng.sample(paths, min(3, file_count))
+        calls = {}
+        for name in names[path]:
+            callees = [rng.choice(names[path])]
+            for other in imported[:2]:
+                callees.append(rng.choice(names[other]))
+            calls[name] = [callee for callee in callees if callee != name]
+        function_dependencies[path] = {
+            "functions": names[path],
+            "function_calls": calls,
+            "called_by": {},
+        }
+        file_dependencies[path] = {
+            "imports": imported,
+            "imported_by": [],
+            "references": [],
+        }
+    return function_dependencies, file_dependencies
+
+
+def run(name, func, *args):
+    start = time.perf_counter()
+    graph = func(*args)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<8} nodes={graph.number_of_nodes():<8} edges={graph.number_of_edges():<8} "
+        f"wall={elapsed:.3f}s"
+    )
+    return graph
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("dependencies_json", nargs="?")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--functions", type=int, default=30)
+    args = parser.parse_args()
+
+    if args.dependencies_json:
+        with open(args.dependencies_json, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        function_dependencies = data["function_dependencies"]
+        file_dependencies = data["file_dependencies"]
+    else:
+        function_dependencies, file_dependencies = synthetic_snapshot(
+            args.files, args.functions
+        )
+
+    legacy = run(
+        "legacy", legacy_build_function_dependency_graph, function_dependencies
+    )
+    indexed = run(
+        "indexed",
+        build_function_dependency_graph,
+        function_dependencies,
+        file_dependencies,
+    )
+    moved = len(set(legacy.edges) - set(indexed.edges))
+    print(f"edges resolved to a different file than before: {moved}")
+
+
+if __name__ == "__main__":
+    main()
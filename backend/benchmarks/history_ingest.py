@@ -0,0 +1,125 @@
+"""
+Benchmark the streaming history ingester against the per-commit diff loop
+that analyze_git_history used before.
+
+Usage (from the backend directory):
+    python -m benchmarks.history_ingest /path/to/repo [--max-commits N]
+
+Both variants produce the changed files and per-file patches of every commit;
+the script reports wall time, forked subprocesses and whether the outputs match.
+A renamed file is a full add of its target in both; the ingester also lists the
+deletion of the source, which the loop's name-only diff left out.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.history_ingest import GitHistoryIngester  # noqa: E402
+
+
+class SubprocessCounter:
+    """Count every process forked while the context is active"""
+
+    def __init__(self):
+        self.count = 0
+        self._original = None
+
+    def __enter__(self):
+        self._original = subprocess.Popen._execute_child
+        counter = self
+
+        def counting_execute_child(popen_self, *args, **kwargs):
+            counter.count += 1
+            return counter._original(popen_self, *args, **kwargs)
+
+        subprocess.Popen._execute_child = counting_execute_child
+        return self
+
+    def __exit__(self, *exc_info):
+        subprocess.Popen._execute_child = self._original
+
+
+def legacy_history(repo_path, max_commits=None):
+    """The original loop: one name-only diff per commit plus one diff per file"""
+    from git import Repo
+
+    repo = Repo(repo_path)
+    null_tree = repo.git.hash_object("-t", "tree", "/dev/null")
+    history = {}
+    for commit in list(repo.iter_commits("--all", reverse=True))[:max_commits]:
+        base = commit.parents[0].hexsha if commit.parents else null_tree
+        files_changed = repo.git.diff(base, commit.hexsha, name_only=True).splitlines()
+        patches = {
+            file_path: repo.git.diff(base, commit.hexsha, "--", file_path)
+            for file_path in files_changed
+        }
+        history[commit.hexsha] = (files_changed, patches)
+    return history
+
+
+def streaming_history(repo_path, max_commits=None):
+    """The single-process ingester, with the plain hunk headers the loop produced"""
+    history = {}
+    ingester = GitHistoryIngester(repo_path, function_context=False)
+    for i, commit in enumerate(ingester.iter_commits()):
+        if max_commits is not None and i >= max_commits:
+            break
+        history[commit["commit_hash"]] = (commit["files_changed"], commit["patches"])
+    return history
+
+
+def run(name, func, repo_path, max_commits):
+    with SubprocessCounter() as counter:
+        start = time.perf_counter()
+        history = func(repo_path, max_commits)
+        elapsed = time.perf_counter() - start
+    files = sum(len(files_changed) for files_changed, _ in history.values())
+    print(
+        f"{name:<10} commits={len(history):<7} files={files:<8} "
+        f"subprocesses={counter.count:<8} wall={elapsed:.2f}s"
+    )
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("repo_path")
+    parser.add_argument("--max-commits", type=int, default=None)
+    args = parser.parse_args()
+
+    legacy = run("legacy", legacy_history, args.repo_path, args.max_commits)
+    streaming = run("streaming", streaming_history, args.repo_path, args.max_commits)
+
+    # Compare file lists and patch text for the commits both variants saw
+    mismatched = []
+    rename_sources = 0
+    for commit_hash, (files_changed, patches) in streaming.items():
+        if commit_hash not in legacy:
+            continue
+        legacy_files, legacy_patches = legacy[commit_hash]
+        # The loop's name-only diff folded renames into their target, while the
+        # ingester also lists the deletion of the source
+        extra = set(files_changed) - set(legacy_files)
+        if all("\ndeleted file mode" in patches.get(path, "") for path in extra):
+            rename_sources += len(extra)
+        else:
+            mismatched.append(commit_hash)
+            continue
+        if set(legacy_files) - set(files_changed) or any(
+            patches.get(path, "") != legacy_patches.get(path, "")
+            for path in legacy_files
+        ):
+            mismatched.append(commit_hash)
+    print(f"deleted rename sources only the ingester lists: {rename_sources}")
+    print(f"commits with differing output: {len(mismatched)}")
+    for commit_hash in mismatched[:10]:
+        print(f"  {commit_hash}")
+
+
+if __name__ == "__main__":
+    main()
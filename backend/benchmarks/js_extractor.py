@@ -0,0 +1,136 @@
+"""
+Benchmark the single-pass JS/TS extractor against the pairwise regex search it
+replaced.
+
+Usage (from the backend directory):
+    python -m benchmarks.js_extractor [paths ...] [--functions N] [--repeat R]
+
+Without paths a synthetic React component file with N arrow functions is
+generated; otherwise every .js/.jsx/.ts/.tsx file below the given paths is
+extracted. The legacy extractor searches the whole file once per (function,
+other function) pair, so its cost grows with N² times the file length.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.js_extractor import extract_js_module  # noqa: E402
+
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx")
+
+
+def legacy_extract_functions(content):
+    """The previous implementation: five definition regexes and pairwise call searches"""
+    function_info = {"functions": [], "function_calls": {}, "called_by": {}}
+    function_patterns = [
+        re.compile(r"function\s+([a-zA-Z0-9_$]+)\s*\(", re.MULTILINE),
+        re.compile(
+            r"(?:const|let|var)\s+([a-zA-Z0-9_$]+)\s*=\s*(?:async\s*)?\([^)]*\)\s*=>",
+            re.MULTILINE,
+        ),
+        re.compile(
+            r"(?:const|let|var)\s+([a-zA-Z0-9_$]+)\s*=\s*function", re.MULTILINE
+        ),
+        re.compile(r"([a-zA-Z0-9_$]+)\s*:\s*function", re.MULTILINE),
+        re.compile(r"([a-zA-Z0-9_$]+)\([^)]*\)\s*{", re.MULTILINE),
+    ]
+    functions = []
+    for pattern in function_patterns:
+        functions.extend(m.group(1) for m in pattern.finditer(content))
+    functions = list(set(functions))
+    function_info["functions"] = functions
+
+    for func_name in functions:
+        calls = []
+        for other_func in functions:
+            if other_func != func_name and re.search(
+                r"\b" + re.escape(other_func) + r"\s*\(", content
+            ):
+                calls.append(other_func)
+                function_info["called_by"].setdefault(other_func, []).append(func_name)
+        if calls:
+            function_info["function_calls"][func_name] = calls
+    return function_info
+
+
+def synthetic_component(function_count, seed=0):
+    """A React component file whose arrow function handlers call each other"""
+    rng = random.Random(seed)
+    lines = [
+        "import React, { useState, useEffect } from 'react';",
+        "import { fetchItems } from './api';",
+        "",
+        "export default function Dashboard({ items }) {",
+        "  const [state, setState] = useState({});",
+    ]
+    for index in range(function_count):
+        callees = rng.sample(range(function_count), min(2, function_count))
+        lines.append(f"  const handler{index} = async (event) => {{")
+        lines.append(f"    // update `state` for item {index}")
+        lines.append(f"    const value = `${{event.target.value}}-{index}`;")
+        for callee in callees:
+            lines.append(f"    if (value.length > {callee}) handler{callee}(event);")
+        lines.append("    setState({ ...state, value });")
+        lines.append("  };")
+    lines.append("  useEffect(() => { fetchItems().then(setState); }, []);")
+    lines.append("  return <div onClick={handler0}>{items.length}</div>;")
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def edge_count(function_info):
+    return sum(len(callees) for callees in function_info["function_calls"].values())
+
+
+def run(name, func, contents, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(content) for content in contents]
+    elapsed = time.perf_counter() - start
+    kilobytes = sum(len(content) for content in contents) / 1024
+    print(
+        f"{name:<8} files={len(contents):<6} size={kilobytes:.0f} KB "
+        f"wall={elapsed / repeat:.3f}s per pass "
+        f"functions={sum(len(result['functions']) for result in results)} "
+        f"call_edges={sum(edge_count(result) for result in results)}"
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--functions", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.paths:
+        contents = []
+        for path in map(Path, args.paths):
+            files = (
+                [path]
+                if path.is_file()
+                else sorted(
+                    file
+                    for file in path.rglob("*")
+                    if file.suffix in JS_EXTENSIONS and file.is_file()
+                )
+            )
+            contents.extend(
+                file.read_text(encoding="utf-8", errors="ignore") for file in files
+            )
+    else:
+        contents = [synthetic_component(args.functions)]
+
+    run("legacy", legacy_extract_functions, contents, args.repeat)
+    run("lexer", extract_js_module, contents, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark concurrent, rate limited summarization against a local fake LLM
+server, compared with the sequential loop it replaced.
+
+Usage (from the backend directory):
+    python -m benchmarks.llm_scheduler [--files N] [--latency S] [--server-rpm R]
+        [--concurrency C] [--rpm R] [--tpm T] [--skip-legacy]
+
+The server answers every prompt after `latency` seconds and rejects requests
+beyond `server-rpm` per minute with a 429 carrying a retryDelay hint, like the
+Gemini API. The legacy loop waits 1.5 s after every call and 35 s (scaled by
+--legacy-backoff) after a 429.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.llm_scheduler import LLMScheduler  # noqa: E402
+
+
+def make_server(latency, requests_per_minute):
+    recent = deque()
+    lock = threading.Lock()
+    stats = {"requests": 0, "rejected": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            prompt = json.loads(body)["prompt"]
+            with lock:
+                now = time.monotonic()
+                stats["requests"] += 1
+                while recent and now - recent[0] > 60:
+                    recent.popleft()
+                limited = len(recent) >= requests_per_minute
+                if limited:
+                    stats["rejected"] += 1
+                    retry_delay = 60 - (now - recent[0])
+                else:
+                    recent.append(now)
+
+            if limited:
+                reply = {"error": {"code": 429, "retryDelay": f"{retry_delay:.1f}s"}}
+                status = 429
+            else:
+                time.sleep(latency)
+                reply = {"text": f"Summary of a {len(prompt)} character prompt"}
+                status = 200
+            payload = json.dumps(reply).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+class FakeServerLLM:
+    """Minimal chat model client for the fake server"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def invoke(self, prompt):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"prompt": prompt}).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return SimpleNamespace(content=json.load(response)["text"])
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"{e.code} {e.read().decode()}") from None
+
+
+def synthetic_prompts(file_count, size=4000):
+    return [(f"src/module_{index}.py", "x" * size) for index in range(file_count)]
+
+
+def run_legacy(llm, prompts, backoff_scale):
+    for _, prompt in prompts:
+        for _ in range(3):
+            try:
+                llm.invoke(prompt)
+                break
+            except Exception as e:
+                if "429" not in str(e):
+                    raise
+                time.sleep(35 * backoff_scale)
+        time.sleep(1.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--server-rpm", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=120)
+    parser.add_argument("--tpm", type=int, default=1000000)
+    parser.add_argument("--legacy-backoff", type=float, default=1.0)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    prompts = synthetic_prompts(args.files)
+
+    names = ["scheduler"] if args.skip_legacy else ["legacy", "scheduler"]
+    for name in names:
+        # A fresh server per run, so both start with an empty rate limit window
+        server, stats = make_server(args.latency, args.server_rpm)
+        llm = FakeServerLLM(f"http://127.0.0.1:{server.server_port}/generate")
+        start = time.perf_counter()
+        if name == "legacy":
+            run_legacy(llm, prompts, args.legacy_backoff)
+            retries = stats["rejected"]
+        else:
+            scheduler = LLMScheduler(
+                concurrency=args.concurrency,
+                requests_per_minute=args.rpm,
+                tokens_per_minute=args.tpm,
+            )
+            failed = []
+            scheduler.run(
+                llm,
+                prompts,
+                lambda key, text, error: error is not None and failed.append(key),
+            )
+            retries = scheduler.retries
+            if failed:
+                print(f"{len(failed)} prompts failed")
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        print(
+            f"{name:<10} files={len(prompts):<6} wall={elapsed:.2f}s "
+            f"files/min={len(prompts) / elapsed * 60:.0f} "
+            f"server_requests={stats['requests']} rejected={stats['rejected']} "
+            f"retries={retries}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark the ast-based Python extractor against the per-function regex scans
+it replaced.
+
+Usage (from the backend directory):
+    python -m benchmarks.python_extractor [paths ...] [--functions N] [--repeat R]
+
+Without paths a synthetic module with N top-level functions (each calling a few
+others) and as many methods is generated; otherwise every .py file below the
+given paths is extracted. The legacy extractor compiles a body regex per
+function and searches each body once per other function, so its cost grows
+quadratically with the number of functions in a file.
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.python_extractor import extract_python_module  # noqa: E402
+
+
+def legacy_extract_functions(content):
+    """The previous implementation: top-level defs and regex call detection"""
+    function_info = {"functions": [], "function_calls": {}, "called_by": {}}
+    function_pattern = re.compile(r"^def\s+([a-zA-Z0-9_]+)\s*\([^)]*\):", re.MULTILINE)
+    functions = [m.group(1) for m in function_pattern.finditer(content)]
+    function_info["functions"] = functions
+
+    for func_name in functions:
+        func_pattern = re.compile(
+            r"def\s+" + re.escape(func_name) + r"\s*\([^)]*\):\s*(.*?)(?=\n\S|$)",
+            re.DOTALL,
+        )
+        func_matches = func_pattern.findall(content)
+        if func_matches:
+            func_body = func_matches[0]
+            calls = []
+            for other_func in functions:
+                if other_func != func_name and re.search(
+                    r"\b" + re.escape(other_func) + r"\s*\(", func_body
+                ):
+                    calls.append(other_func)
+                    function_info["called_by"].setdefault(other_func, []).append(
+                        func_name
+                    )
+            if calls:
+                function_info["function_calls"][func_name] = calls
+    return function_info
+
+
+def synthetic_module(function_count, seed=0):
+    """A module with top-level functions and a class whose methods call them"""
+    rng = random.Random(seed)
+    lines = ["import os", "from collections import defaultdict", ""]
+    for index in range(function_count):
+        callees = rng.sample(range(function_count), min(3, function_count))
+        lines.append(f"def function_{index}(value):")
+        lines.append("    total = value")
+        for callee in callees:
+            lines.append(f"    total += function_{callee}(value - 1) if value else 0")
+        lines.append("    return total")
+        lines.append("")
+
+    lines.append("class Service:")
+    for index in range(function_count):
+        lines.append(f"    def method_{index}(self):")
+        lines.append(f"        return self.method_{(index + 1) % function_count}()")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def edge_count(function_info):
+    return sum(len(callees) for callees in function_info["function_calls"].values())
+
+
+def run(name, func, contents, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(content) for content in contents]
+    elapsed = time.perf_counter() - start
+    kilobytes = sum(len(content) for content in contents) / 1024
+    print(
+        f"{name:<8} files={len(contents):<6} size={kilobytes:.0f} KB "
+        f"wall={elapsed / repeat:.3f}s per pass "
+        f"functions={sum(len(result['functions']) for result in results)} "
+        f"call_edges={sum(edge_count(result) for result in results)}"
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("--functions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.paths:
+        contents = []
+        for path in map(Path, args.paths):
+            files = [path] if path.is_file() else sorted(path.rglob("*.py"))
+            contents.extend(
+                file.read_text(encoding="utf-8", errors="ignore") for file in files
+            )
+    else:
+        contents = [synthetic_module(args.functions)]
+
+    run("legacy", legacy_extract_functions, contents, args.repeat)
+    results = run("ast", extract_python_module, contents, args.repeat)
+    fallbacks = sum(not result["parsed"] for result in results)
+    print(f"files handled by the regex fallback: {fallbacks}")
+
+
+if __name__ == "__main__":
+    main()
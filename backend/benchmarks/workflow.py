@@ -0,0 +1,131 @@
+"""
+Time the whole analysis workflow, from intent detection to chat, without network.
+
+Usage (from the backend directory):
+    python -m benchmarks.workflow /path/to/repo [--provider P] [--latency S]
+        [--recording FILE] [--question Q ...] [--workdir DIR]
+
+The repository is cloned into a scratch directory, which also holds every
+output and cache of the run, so runs start cold. Like starting the server,
+creating the service clears the app's summaries and vector database.
+
+--provider fake answers every LLM call with a deterministic reply after
+--latency seconds. --provider record calls Gemini and saves every reply to
+--recording, and --provider replay answers the same calls from that file with
+their recorded latency (or --latency), so a recorded run can be repeated and
+timed offline. The embedding model of the vector database step has to be in
+the local Hugging Face cache.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def isolate(service, workdir):
+    """Point every output and cache directory of the service into `workdir`"""
+    config = service.config
+    config.repos_dir = workdir / "cloned_repos"
+    config.summaries_dir = workdir / "summaries"
+    config.git_history_dir = workdir / "git_file_history_output"
+    config.vector_db_dir = workdir / "faiss_repo_knowledge"
+    config.cache_dir = workdir / "cache"
+    config.diff_store_dir = config.cache_dir / "diff_store"
+    for directory in (
+        config.repos_dir,
+        config.summaries_dir,
+        config.git_history_dir / "graphs",
+        config.vector_db_dir,
+        config.cache_dir,
+    ):
+        directory.mkdir(parents=True, exist_ok=True)
+    service.state.state_file = workdir / "project_state.json"
+
+
+def timed(label, function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    print(f"{label:<28} {time.perf_counter() - start:8.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("repo_path")
+    parser.add_argument(
+        "--provider", choices=("fake", "record", "replay"), default="fake"
+    )
+    parser.add_argument("--latency", type=float, default=None)
+    parser.add_argument("--recording", default=None)
+    parser.add_argument("--question", action="append", default=[])
+    parser.add_argument("--workdir", default=None)
+    args = parser.parse_args()
+
+    # The service reads its configuration from the environment when created
+    os.environ["LLM_PROVIDER"] = args.provider
+    if args.recording:
+        os.environ["LLM_RECORDING_FILE"] = str(Path(args.recording).resolve())
+    if args.latency is not None:
+        os.environ["LLM_FAKE_LATENCY"] = str(args.latency)
+        os.environ["LLM_REPLAY_LATENCY"] = str(args.latency)
+    from api.git_analysis_service import GitAnalysisService
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="workflow-benchmark-"))
+    service = GitAnalysisService()
+    isolate(service, workdir)
+
+    # The workflow only clones URLs; a local clone named like the URL is
+    # picked up as an already cloned repository instead
+    repo_name = Path(args.repo_path).resolve().name
+    repo_url = f"https://github.com/benchmark/{repo_name}"
+    if not (service.config.repos_dir / repo_name).exists():
+        subprocess.run(
+            ["git", "clone", "-q", args.repo_path, repo_name],
+            cwd=service.config.repos_dir,
+            check=True,
+        )
+
+    print(f"provider={args.provider} workdir={workdir}")
+    total = time.perf_counter()
+    timed(
+        "intent detection",
+        service.detect_analysis_intent,
+        f"Please analyze {repo_url}",
+    )
+
+    # Every progress line with the time since the workflow started
+    start = time.perf_counter()
+    for update in service.run_analysis_workflow(repo_url)():
+        for line in update.strip().splitlines():
+            print(f"{time.perf_counter() - start:8.2f}s  {line}")
+    print(f"{'analysis workflow':<28} {time.perf_counter() - start:8.2f}s")
+
+    if args.question and service.state.analysis_complete:
+        success, chain = timed(
+            "retrieval chain setup", service.initialize_retrieval_chain
+        )
+        if not success:
+            print(chain)
+        else:
+            for question in args.question:
+                timed(
+                    f"question {question[:17]!r}", chain.invoke, {"question": question}
+                )
+
+    recording = service.llm_provider.recording
+    if recording is not None:
+        print(
+            f"recording: {recording.hits} replayed, {recording.misses} missing, "
+            f"{recording.recorded} recorded ({recording.path})"
+        )
+    print(f"{'total':<28} {time.perf_counter() - total:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()